@@ -0,0 +1,115 @@
+"""
+Calendrier d'activité d'un utilisateur (sans accès aux données).
+
+Une ligne Activite_Utilisateur par utilisateur :
+- "Debut"          : premier jour actif (date ISO)
+- "Jours"          : nombre d'observations par jour depuis Debut (Jours[i] = Debut + i jours) ;
+                     le dernier élément est toujours le dernier jour actif
+- "Dernier_Jour"   : Debut + len(Jours) - 1
+- "Serie_Courante" : jours actifs consécutifs se terminant à Dernier_Jour
+- "Serie_Max"      : plus longue série de jours actifs
+
+La ligne est mise à jour par trigger à chaque insertion d'Observations (sql/005) :
+la série en cours et le record se lisent sans parcourir l'historique, et les compteurs d'une
+fenêtre de dates sont une tranche du tableau. Partagé par l'équivalent SQLite (storage.py)
+et le client factice des benchmarks ; la version plpgsql applique les mêmes règles.
+"""
+
+import json
+from datetime import date, timedelta
+
+import numpy as np
+
+
+def _jour(valeur) -> date:
+    return valeur if isinstance(valeur, date) else date.fromisoformat(str(valeur)[:10])
+
+
+def jours(activite) -> list:
+    """Compteurs journaliers de la ligne (tableau Postgres ou texte JSON côté SQLite)."""
+    valeur = (activite or {}).get("Jours") or []
+    return json.loads(valeur) if isinstance(valeur, str) else list(valeur)
+
+
+def series(compteurs) -> np.ndarray:
+    """Série en cours à chaque jour (0 les jours inactifs), sans boucle Python."""
+    actifs = np.asarray(compteurs) > 0
+    rang = np.arange(actifs.size)
+    dernier_inactif = np.maximum.accumulate(np.where(actifs, -1, rang))
+    return np.where(actifs, rang - dernier_inactif, 0)
+
+
+def ajouter(activite, jour, nb: int) -> dict:
+    """Ligne Activite_Utilisateur après `nb` observations le `jour` (activite None : première session)."""
+    jour = _jour(jour)
+    if not activite:
+        return {"Debut": jour.isoformat(), "Jours": [nb], "Dernier_Jour": jour.isoformat(),
+                "Serie_Courante": 1, "Serie_Max": 1}
+
+    compteurs = jours(activite)
+    debut = _jour(activite["Debut"])
+    dernier = _jour(activite["Dernier_Jour"])
+    courante, record = activite["Serie_Courante"], activite["Serie_Max"]
+    if jour < debut:
+        compteurs = [0] * (debut - jour).days + compteurs
+        debut = jour
+    i = (jour - debut).days
+    if i >= len(compteurs):
+        compteurs += [0] * (i + 1 - len(compteurs))
+    deja_actif = compteurs[i] > 0
+    compteurs[i] += nb
+
+    if jour == dernier + timedelta(days=1):
+        courante += 1
+        record = max(record, courante)
+    elif jour > dernier:
+        courante = 1
+    elif not deja_actif:
+        # Jour passé (session enregistrée en retard) : recalcul complet, rare
+        par_jour = series(compteurs)
+        courante, record = int(par_jour[-1]), int(par_jour.max())
+    return {"Debut": debut.isoformat(), "Jours": compteurs,
+            "Dernier_Jour": (debut + timedelta(days=len(compteurs) - 1)).isoformat(),
+            "Serie_Courante": courante, "Serie_Max": record}
+
+
+def reconstruire(par_jour: dict) -> dict:
+    """Ligne Activite_Utilisateur depuis {jour: nb d'observations} (reconstruction hors ligne)."""
+    actifs = {_jour(j): nb for j, nb in par_jour.items() if nb > 0}
+    if not actifs:
+        return None
+    debut, fin = min(actifs), max(actifs)
+    compteurs = [0] * ((fin - debut).days + 1)
+    for j, nb in actifs.items():
+        compteurs[(j - debut).days] = nb
+    par_jour_series = series(compteurs)
+    return {"Debut": debut.isoformat(), "Jours": compteurs, "Dernier_Jour": fin.isoformat(),
+            "Serie_Courante": int(par_jour_series[-1]), "Serie_Max": int(par_jour_series.max())}
+
+
+def serie_actuelle(activite, aujourd_hui=None) -> int:
+    """Série en cours : elle tient tant que le dernier jour actif est aujourd'hui ou hier."""
+    if not activite or not activite.get("Dernier_Jour"):
+        return 0
+    aujourd_hui = aujourd_hui or date.today()
+    return activite["Serie_Courante"] if (aujourd_hui - _jour(activite["Dernier_Jour"])).days <= 1 else 0
+
+
+def fenetre(activite, debut, fin):
+    """(compteurs, séries) pour chaque jour de [debut, fin] ; les séries tiennent compte des jours avant `debut`."""
+    debut, fin = _jour(debut), _jour(fin)
+    n = max((fin - debut).days + 1, 0)
+    compteurs, serie = np.zeros(n, dtype=np.int64), np.zeros(n, dtype=np.int64)
+    tableau = np.asarray(jours(activite), dtype=np.int64)
+    if tableau.size == 0 or n == 0:
+        return compteurs, serie
+    origine = _jour(activite["Debut"])
+    par_jour = series(tableau)
+    # Positions de la fenêtre dans le tableau, bornées à ce qui existe
+    a = max((debut - origine).days, 0)
+    b = min((fin - origine).days + 1, tableau.size)
+    if a < b:
+        decalage = (origine - debut).days + a
+        compteurs[decalage:decalage + b - a] = tableau[a:b]
+        serie[decalage:decalage + b - a] = par_jour[a:b]
+    return compteurs, serie
@@ -0,0 +1,82 @@
+"""
+Jetons de session signés et cache de sessions côté serveur (sans accès aux données ni à Streamlit).
+
+Jeton : "<user_id>.<expiration>.<id de session>.<signature>", signature HMAC-SHA256 du reste avec
+le secret du serveur. Un jeton n'est accepté que si sa signature est valide, qu'il n'a pas expiré
+et que sa session existe encore dans le SessionStore (déconnexion = suppression de la session).
+Le SessionStore garde l'utilisateur complet : restaurer une session après un rechargement de la
+page est une lecture de dictionnaire, sans requête ni hachage.
+"""
+
+import base64
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+SESSION_TTL = 7 * 24 * 3600     # secondes de validité d'un jeton
+SESSION_MAX = 10_000            # sessions conservées par process (les plus anciennes sont évincées)
+
+
+def _signature(message: str, secret: bytes) -> str:
+    digest = hmac.new(secret, message.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+def sign_session_token(user_id: int, secret: bytes, ttl: int = SESSION_TTL, now=None):
+    """Nouveau jeton pour user_id : retourne (jeton, id de session, expiration)."""
+    expires = int((now or time.time()) + ttl)
+    session_id = secrets.token_urlsafe(16)
+    message = f"{int(user_id)}.{expires}.{session_id}"
+    return f"{message}.{_signature(message, secret)}", session_id, expires
+
+
+def verify_session_token(token: str, secret: bytes, now=None):
+    """(user_id, id de session) si le jeton est authentique et non expiré, sinon None."""
+    try:
+        user_id, expires, session_id, signature = token.split(".")
+        message = f"{user_id}.{expires}.{session_id}"
+        if not hmac.compare_digest(signature, _signature(message, secret)):
+            return None
+        if int(expires) < (now or time.time()):
+            return None
+        return int(user_id), session_id
+    except (AttributeError, ValueError):
+        return None
+
+
+class SessionStore:
+    """Sessions ouvertes : id de session -> (user_id, expiration, utilisateur). Accès O(1), thread-safe."""
+
+    def __init__(self, max_sessions: int = SESSION_MAX):
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()
+        self._max = max_sessions
+
+    def open(self, session_id: str, user_id: int, expires: int, user: dict):
+        with self._lock:
+            self._sessions[session_id] = (user_id, expires, dict(user))
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self._max:
+                self._sessions.popitem(last=False)
+
+    def get(self, session_id: str, user_id: int, now=None):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            owner, expires, user = entry
+            if owner != user_id or expires < (now or time.time()):
+                self._sessions.pop(session_id, None)
+                return None
+            self._sessions.move_to_end(session_id)
+            return dict(user)
+
+    def close(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self):
+        return len(self._sessions)
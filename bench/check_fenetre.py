@@ -0,0 +1,190 @@
+"""
+Vérification de la fenêtre glissante de réussite (progression.py, sql/007) et de la chaîne de
+niveaux (sql/008) sur des historiques aléatoires.
+
+1. Règles pures : après chaque état ajouté (et chaque décision qui rouvre la fenêtre),
+   fenetre_taux(fenêtre) == taux_reussite(états depuis la décision, critere) et Serie_Bonnes
+   == bonnes réponses consécutives en fin d'historique.
+2. De bout en bout : des sessions aléatoires passent par enregistrer_entrainement (SQLite et
+   client factice), avec ou sans mode saut, sur un catalogue inséré dans le désordre (ids et
+   Niveau non alignés) ; chaque décision est comparée à une relecture des observations
+   postérieures à Derniere_Observation_Id, niveaux triés par Niveau.
+
+    python -m bench.check_fenetre
+    python -m bench.check_fenetre --histories 2000 --sessions 40 --seed 7
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench.fake_supabase import FakeSupabase                      # noqa: E402
+from progression import (decider_evolution, fenetre_ajouter, fenetre_courante, fenetre_taux,  # noqa: E402
+                         taux_reussite)
+from storage import SQLiteClient                                  # noqa: E402
+
+TYPES = ("Addition", "Soustraction", "Multiplication")
+SAUTS = (1, 3)                  # saut_max : niveau par niveau, puis mode saut
+
+
+def serie_finale(etats):
+    """Bonnes réponses consécutives en fin d'historique."""
+    n = 0
+    for etat in reversed(etats):
+        if etat != "VRAI":
+            break
+        n += 1
+    return n
+
+
+# --------------------- RÈGLES PURES ---------------------
+
+def check_regles(rng: random.Random, histories: int):
+    echecs = []
+    for h in range(histories):
+        critere = rng.randint(1, 25)
+        p_vrai = rng.random()
+        stockee, depuis, etats = None, 0, []
+        for n in range(rng.randint(1, 200)):
+            # Relecture depuis le stockage (copie) à chaque pas, comme entre deux sessions
+            fenetre = fenetre_courante(stockee, critere, depuis)
+            etat = "VRAI" if rng.random() < p_vrai else "FAUX"
+            fenetre_ajouter(fenetre, etat)
+            etats.append(etat)
+            attendu = taux_reussite(etats, critere)
+            if fenetre_taux(fenetre) != attendu:
+                echecs.append(f"historique {h}, état {n} : {fenetre_taux(fenetre)} au lieu de {attendu}")
+                break
+            if fenetre["Serie_Bonnes"] != serie_finale(etats):
+                echecs.append(f"historique {h}, état {n} : série {fenetre['Serie_Bonnes']} au lieu de {serie_finale(etats)}")
+                break
+            stockee = fenetre
+            if attendu is not None and rng.random() < 0.5:        # décision : la fenêtre est rouverte
+                depuis, etats = depuis + n + 1, []
+    return echecs
+
+
+# --------------------- BOUT EN BOUT ---------------------
+
+def catalogue(rng: random.Random):
+    lignes = [{"Niveau": n, "Type_Operation": t, "Critere": rng.randint(3, 15),
+               "Operateur1_Min": 0, "Operateur1_Max": 10, "Operateur2_Min": 0, "Operateur2_Max": 10}
+              for t in TYPES for n in range(1, 6)]
+    rng.shuffle(lignes)                                   # ids attribués dans le désordre des niveaux
+    return lignes
+
+
+def decision_reference(position, observations_utilisateur, parcours, saut_max):
+    """Relecture des observations postérieures à la dernière décision ; niveaux du type triés par Niveau."""
+    parcours_id = position["Parcours_Id"]
+    etats = [o["Etat"] for o in sorted(observations_utilisateur, key=lambda o: o["id"])
+             if o["Parcours_Id"] == parcours_id and o["id"] > (position["Derniere_Observation_Id"] or 0)]
+    critere = next(p["Critere"] for p in parcours if p["id"] == parcours_id)
+    taux = taux_reussite(etats, critere)
+    if taux is None:
+        return None, None, parcours_id
+    evolution = decider_evolution(taux)
+    niveaux = sorted((p for p in parcours if p["Type_Operation"] == position["Type_Operation"]),
+                     key=lambda p: (p["Niveau"], p["id"]))
+    ids = [p["id"] for p in niveaux]
+    rang = ids.index(parcours_id)
+    if evolution == "progression":
+        rang += max(1, min(saut_max, serie_finale(etats) // critere))
+    elif evolution == "régression":
+        rang -= 1
+    return taux, evolution, ids[min(max(rang, 0), len(ids) - 1)]
+
+
+def session_aleatoire(rng: random.Random, p_vrai: float):
+    return {t: [{"Operation": "1 + 1", "Etat": "VRAI" if rng.random() < p_vrai else "FAUX", "Score": 1,
+                 "Temps_Seconds": 3, "Marge_Erreur": 0} for _ in range(rng.randint(0, 12))]
+            for t in TYPES}
+
+
+def check_stockage(nom, client, lire, rng: random.Random, users: int, sessions: int):
+    """lire(table, user_id) -> lignes ; compare chaque décision à decision_reference."""
+    client.table("Parcours").insert(catalogue(rng)).execute()
+    parcours = client.table("Parcours").select("*").execute().data
+    echecs = []
+    for u in range(users):
+        user_id = client.table("Users").insert({"name": f"u{u}", "email": f"u{u}@x", "password_hash": "x"}).execute().data[0]["id"]
+        client.table("Suivi_Parcours").insert([
+            {"Users_Id": user_id, "Parcours_Id": min((p for p in parcours if p["Type_Operation"] == t),
+                                                     key=lambda p: p["Niveau"])["id"],
+             "Date": "2026-01-01", "Taux_Reussite": 0, "Type_Evolution": "initialisation", "Derniere_Observation_Id": None}
+            for t in TYPES
+        ]).execute()
+        p_vrai = rng.choice([0.3, 0.7, 0.97, 1.0])
+        saut_max = SAUTS[u % len(SAUTS)]
+        for s in range(sessions):
+            payload = session_aleatoire(rng, p_vrai)
+            positions = {p["Type_Operation"]: p for p in lire("Position_Actuelle", user_id)}
+            resultat = client.rpc("enregistrer_entrainement", {
+                "p_user_id": user_id, "p_cle": f"{nom}-{u}-{s}", "p_date": "2026-01-02", "p_heure": "10:00",
+                "p_observations": payload, "p_saut_max": saut_max,
+            }).execute().data
+            observations = lire("Observations", user_id)
+            for t, detail in resultat["types"].items():
+                attendu = decision_reference(positions[t], observations, parcours, saut_max)
+                obtenu = (detail["taux"], detail["evolution"], detail["nouveau_parcours_id"])
+                if obtenu != attendu:
+                    echecs.append(f"{nom} : utilisateur {u}, session {s}, {t} : {obtenu} au lieu de {attendu}")
+    return echecs
+
+
+def check_sqlite(rng, users, sessions):
+    path = os.path.join(tempfile.mkdtemp(prefix="check-fenetre-"), "check.db")
+    client = SQLiteClient(path)
+
+    def lire(table, user_id):
+        if table == "Observations":
+            return [dict(r) for r in client._conn.execute(
+                'SELECT o.* FROM "Observations" o JOIN "Entrainement" e ON e."id" = o."Entrainement_Id" '
+                'WHERE e."Users_Id" = ?', [user_id])]
+        return client.table(table).select("*").eq("Users_Id", user_id).execute().data
+
+    try:
+        return check_stockage("sqlite", client, lire, rng, users, sessions)
+    finally:
+        client.close()
+
+
+def check_fake(rng, users, sessions):
+    db = FakeSupabase()
+
+    def lire(table, user_id):
+        if table == "Observations":
+            ids = {e["id"] for e in db.scan("Entrainement", {"Users_Id": user_id})}
+            return [o for o in db.tables["Observations"] if o["Entrainement_Id"] in ids]
+        return db.table(table).select("*").eq("Users_Id", user_id).execute().data
+
+    return check_stockage("factice", db, lire, rng, users, sessions)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--histories", type=int, default=1000, help="historiques aléatoires (règles pures)")
+    parser.add_argument("--users", type=int, default=20, help="utilisateurs par stockage (bout en bout)")
+    parser.add_argument("--sessions", type=int, default=25, help="sessions par utilisateur")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    echecs = []
+    for nom, check in (("règles", lambda rng: check_regles(rng, args.histories)),
+                       ("sqlite", lambda rng: check_sqlite(rng, args.users, args.sessions)),
+                       ("factice", lambda rng: check_fake(rng, args.users, args.sessions))):
+        resultats = check(random.Random(args.seed))
+        print(f"{nom:<8} {'OK' if not resultats else f'{len(resultats)} écart(s)'}")
+        echecs += resultats
+    for echec in echecs[:20]:
+        print(f"ÉCHEC : {echec}")
+    return 1 if echecs else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,427 @@
+"""
+Client Supabase factice, en mémoire, pour les benchmarks (cf. bench/pages.py).
+
+Implémente le sous-ensemble du query builder utilisé par l'app
+(select/eq/ilike/gt/lt/in_/order/limit/insert/execute, rpc) sur des tables Python,
+avec l'équivalent des triggers, de la vue Classement et des fonctions serveur de sql/001-007.
+Chaque execute() compte pour un aller-retour (FakeSupabase.round_trips).
+"""
+
+import copy
+import itertools
+import re
+import threading
+from collections import defaultdict
+from datetime import datetime
+
+import activite
+from progression import (chaine_niveaux, decider_evolution, fenetre_ajouter, fenetre_courante, fenetre_taux,
+                         niveaux_franchis, parcours_cible)
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeQuery:
+    def __init__(self, db, table):
+        self._db = db
+        self._table = table
+        self._columns = None
+        self._filters = []        # (colonne, prédicat)
+        self._eq = {}             # colonne -> valeur (servi par index)
+        self._order = []
+        self._limit = None
+        self._insert = None
+
+    # --- construction ---
+
+    def select(self, *columns, **_options):
+        names = [c.strip() for spec in columns for c in spec.split(",") if c.strip()]
+        self._columns = None if not names or names == ["*"] else names
+        return self
+
+    def eq(self, column, value):
+        self._eq[column] = value
+        return self
+
+    def gt(self, column, value):
+        self._filters.append((column, lambda v: v is not None and v > value))
+        return self
+
+    def lt(self, column, value):
+        self._filters.append((column, lambda v: v is not None and v < value))
+        return self
+
+    def in_(self, column, values):
+        values = set(values)
+        self._filters.append((column, lambda v: v in values))
+        return self
+
+    def ilike(self, column, pattern):
+        regex = re.compile("^" + ".*".join(re.escape(part) for part in str(pattern).split("%")) + "$", re.I)
+        self._filters.append((column, lambda v: v is not None and regex.match(str(v)) is not None))
+        return self
+
+    def order(self, column, desc=False, nullsfirst=None, **_options):
+        self._order.append((column, desc, desc if nullsfirst is None else nullsfirst))
+        return self
+
+    def limit(self, size):
+        self._limit = size
+        return self
+
+    def insert(self, rows, **_options):
+        self._insert = rows
+        return self
+
+    # --- exécution ---
+
+    def execute(self):
+        with self._db.lock:
+            self._db.round_trips += 1
+            self._db.calls.append(self._table)
+            if self._insert is not None:
+                rows = self._insert if isinstance(self._insert, list) else [self._insert]
+                return FakeResponse(copy.deepcopy(self._db.insert(self._table, rows)))
+            return FakeResponse(self._select())
+
+    def _select(self):
+        rows = self._db.scan(self._table, self._eq)
+        rows = [r for r in rows if all(predicate(r.get(c)) for c, predicate in self._filters)]
+        for column, desc, nulls_first in reversed(self._order):
+            present = sorted((r for r in rows if r.get(column) is not None), key=lambda r: r[column], reverse=desc)
+            missing = [r for r in rows if r.get(column) is None]
+            rows = missing + present if nulls_first else present + missing
+        if self._limit is not None:
+            rows = rows[:self._limit]
+        if self._columns:
+            return [{c: r.get(c) for c in self._columns} for r in rows]
+        return copy.deepcopy(rows)
+
+
+class FakeRPC:
+    def __init__(self, db, name, params):
+        self._db = db
+        self._name = name
+        self._params = params or {}
+
+    def execute(self):
+        function = getattr(self._db, f"_rpc_{self._name}", None)
+        if function is None:
+            raise NotImplementedError(f"RPC {self._name} non simulée")
+        with self._db.lock:
+            self._db.round_trips += 1
+            self._db.calls.append(f"rpc:{self._name}")
+            return FakeResponse(function(**self._params))
+
+
+class FakeSupabase:
+    """Tables en mémoire + index par égalité (construits à la demande, maintenus à l'insertion)."""
+
+    VIEWS = ("Classement",)
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.tables = defaultdict(list)
+        self._ids = defaultdict(lambda: itertools.count(1))
+        self._indexes = {}        # (table, colonne) -> {valeur: [lignes]}
+        self.round_trips = 0
+        self.calls = []
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def rpc(self, name, params=None, **_options):
+        return FakeRPC(self, name, params)
+
+    def reset_counters(self):
+        with self.lock:
+            self.round_trips = 0
+            self.calls = []
+
+    # --- stockage ---
+
+    def _index(self, table, column):
+        key = (table, column)
+        if key not in self._indexes:
+            index = defaultdict(list)
+            for row in self.tables[table]:
+                index[row.get(column)].append(row)
+            self._indexes[key] = index
+        return self._indexes[key]
+
+    def scan(self, table, equalities):
+        if table in self.VIEWS:
+            rows = getattr(self, f"_view_{table}")()
+            return [r for r in rows if all(r.get(c) == v for c, v in equalities.items())]
+        if not equalities:
+            return self.tables[table]
+        (column, value), *others = equalities.items()
+        rows = self._index(table, column).get(value, [])
+        return [r for r in rows if all(r.get(c) == v for c, v in others)]
+
+    def load(self, table, rows):
+        """Chargement en masse (seed), sans triggers : ids fournis ou attribués."""
+        with self.lock:
+            for row in rows:
+                self._store(table, dict(row))
+
+    def _store(self, table, row):
+        if "id" not in row and table not in ("Position_Actuelle", "Score_Utilisateur", "Score_Type_Utilisateur",
+                                             "Enregistrement_Session", "Activite_Utilisateur",
+                                             "Cumul_Quotidien", "Fenetre_Reussite"):
+            row["id"] = next(self._ids[table])
+        elif "id" in row:
+            self._ids[table] = itertools.count(max(row["id"] + 1, next(self._ids[table])))
+        self.tables[table].append(row)
+        for (t, column), index in self._indexes.items():
+            if t == table:
+                index[row.get(column)].append(row)
+        return row
+
+    def insert(self, table, rows):
+        inserted = []
+        for row in rows:
+            row = self._store(table, dict(row))
+            trigger = getattr(self, f"_after_insert_{table}", None)
+            if trigger:
+                trigger(row)
+            inserted.append(row)
+        trigger = getattr(self, f"_after_statement_{table}", None)
+        if trigger and inserted:
+            trigger(inserted)
+        return inserted
+
+    def _one(self, table, **equalities):
+        rows = self.scan(table, equalities)
+        return rows[0] if rows else None
+
+    # --- triggers (sql/001-003, 005, 006) ---
+
+    def _after_insert_Users(self, row):
+        self._store("Score_Utilisateur", {"Users_Id": row["id"], "Score_Total": 0, "Nb_Observations": 0})
+
+    def _after_insert_Suivi_Parcours(self, row):
+        type_op = self._one("Parcours", id=row["Parcours_Id"])["Type_Operation"]
+        position = {
+            "Users_Id": row["Users_Id"], "Type_Operation": type_op, "Parcours_Id": row["Parcours_Id"],
+            "Suivi_Id": row["id"], "Derniere_Observation_Id": row.get("Derniere_Observation_Id"),
+            "Date": row.get("Date"),
+        }
+        existing = self._one("Position_Actuelle", Users_Id=row["Users_Id"], Type_Operation=type_op)
+        if existing:
+            existing.update(position)
+        else:
+            self._store("Position_Actuelle", position)
+
+    def _after_insert_Observations(self, row):
+        entrainement = self._one("Entrainement", id=row["Entrainement_Id"])
+        user_id = entrainement["Users_Id"]
+        score = row.get("Score") or 0
+        self._cumuler(entrainement, row)
+        total = self._one("Score_Utilisateur", Users_Id=user_id)
+        if total is None:
+            total = self._store("Score_Utilisateur", {"Users_Id": user_id, "Score_Total": 0, "Nb_Observations": 0})
+        total["Score_Total"] += score
+        total["Nb_Observations"] += 1
+        if row.get("Parcours_Id") is not None:
+            type_op = self._one("Parcours", id=row["Parcours_Id"])["Type_Operation"]
+            par_type = self._one("Score_Type_Utilisateur", Users_Id=user_id, Type_Operation=type_op)
+            if par_type is None:
+                par_type = self._store("Score_Type_Utilisateur", {"Users_Id": user_id, "Type_Operation": type_op,
+                                                                  "Score_Total": 0, "Nb_Observations": 0})
+            par_type["Score_Total"] += score
+            par_type["Nb_Observations"] += 1
+
+    def _after_statement_Observations(self, rows):
+        # trg_activite_utilisateur (sql/005) : une mise à jour par (utilisateur, jour) de l'INSERT
+        par_jour = defaultdict(int)
+        for row in rows:
+            entrainement = self._one("Entrainement", id=row["Entrainement_Id"])
+            if entrainement.get("Date") is not None:
+                par_jour[(entrainement["Users_Id"], entrainement["Date"])] += 1
+        for (user_id, jour), nb in sorted(par_jour.items()):
+            self._maj_activite_utilisateur(user_id, jour, nb)
+
+    def _cumuler(self, entrainement, row):
+        if entrainement.get("Date") is None:
+            return
+        parcours = self._one("Parcours", id=row["Parcours_Id"]) if row.get("Parcours_Id") is not None else None
+        cle = {"Users_Id": entrainement["Users_Id"], "Type_Operation": (parcours or {}).get("Type_Operation") or "Inconnu",
+               "Parcours_Id": row.get("Parcours_Id") or 0, "Jour": entrainement["Date"]}
+        cumul = self._one("Cumul_Quotidien", **cle)
+        if cumul is None:
+            cumul = self._store("Cumul_Quotidien", {**cle, "Nb_Observations": 0, "Nb_Bonnes": 0, "Score_Total": 0,
+                                                    "Temps_Total": 0, "Marge_Total": 0})
+        cumul["Maj"] = datetime.now().isoformat()
+        cumul["Nb_Observations"] += 1
+        cumul["Nb_Bonnes"] += row.get("Etat") == "VRAI"
+        cumul["Score_Total"] += row.get("Score") or 0
+        cumul["Temps_Total"] += row.get("Temps_Seconds") or 0
+        cumul["Marge_Total"] += row.get("Marge_Erreur") or 0
+
+    # --- vues ---
+
+    def _view_Classement(self):
+        return [
+            {"Users_Id": s["Users_Id"], "name": user["name"], "Score_Total": s["Score_Total"],
+             "Nb_Observations": s["Nb_Observations"]}
+            for s in self.tables["Score_Utilisateur"]
+            if (user := self._one("Users", id=s["Users_Id"]))
+        ]
+
+    # --- fonctions serveur (sql/002-005, 007) ---
+
+    def _scores_attendus(self):
+        """({Users_Id: [score, nb]}, {(Users_Id, Type_Operation): [score, nb]}) recalculés depuis les Observations."""
+        par_utilisateur = {u["id"]: [0, 0] for u in self.tables["Users"]}
+        par_type = defaultdict(lambda: [0, 0])
+        users = {e["id"]: e["Users_Id"] for e in self.tables["Entrainement"]}
+        types = {p["id"]: p["Type_Operation"] for p in self.tables["Parcours"]}
+        for o in self.tables["Observations"]:
+            user_id, score = users[o["Entrainement_Id"]], o.get("Score") or 0
+            cumuls = [par_utilisateur.setdefault(user_id, [0, 0])]
+            if o.get("Parcours_Id") is not None:
+                cumuls.append(par_type[(user_id, types[o["Parcours_Id"]])])
+            for cumul in cumuls:
+                cumul[0] += score
+                cumul[1] += 1
+        return par_utilisateur, dict(par_type)
+
+    def _corriger_compteur(self, table, cle, attendu):
+        """Aligne une ligne de compteur sur (score, nb) attendus ; True si elle a changé."""
+        ligne = self._one(table, **cle)
+        if ligne is None:
+            self._store(table, {**cle, "Score_Total": attendu[0], "Nb_Observations": attendu[1]})
+            return True
+        if (ligne["Score_Total"], ligne["Nb_Observations"]) == tuple(attendu):
+            return False
+        ligne.update(Score_Total=attendu[0], Nb_Observations=attendu[1])
+        return True
+
+    def _rpc_reconcilier_scores_utilisateurs(self):
+        par_utilisateur, _ = self._scores_attendus()
+        return sum(self._corriger_compteur("Score_Utilisateur", {"Users_Id": user_id}, attendu)
+                   for user_id, attendu in par_utilisateur.items())
+
+    def _rpc_verifier_scores_par_type(self):
+        _, attendus = self._scores_attendus()
+        ecarts = []
+        for c in self.tables["Score_Type_Utilisateur"]:
+            attendu = attendus.get((c["Users_Id"], c["Type_Operation"]))
+            if attendu is None or (c["Score_Total"], c["Nb_Observations"]) != tuple(attendu):
+                ecarts.append({"Users_Id": c["Users_Id"], "Type_Operation": c["Type_Operation"],
+                               "Score_Compteur": c["Score_Total"], "Score_Attendu": attendu[0] if attendu else None})
+        presents = {(c["Users_Id"], c["Type_Operation"]) for c in self.tables["Score_Type_Utilisateur"]}
+        ecarts += [{"Users_Id": u, "Type_Operation": t, "Score_Compteur": None, "Score_Attendu": attendu[0]}
+                   for (u, t), attendu in attendus.items() if (u, t) not in presents]
+        return ecarts
+
+    def _rpc_reconcilier_scores_par_type(self):
+        _, attendus = self._scores_attendus()
+        corriges = sum(self._corriger_compteur("Score_Type_Utilisateur", {"Users_Id": u, "Type_Operation": t}, attendu)
+                       for (u, t), attendu in attendus.items())
+        gardes = [c for c in self.tables["Score_Type_Utilisateur"] if (c["Users_Id"], c["Type_Operation"]) in attendus]
+        corriges += len(self.tables["Score_Type_Utilisateur"]) - len(gardes)
+        self.tables["Score_Type_Utilisateur"] = gardes
+        self._indexes = {k: v for k, v in self._indexes.items() if k[0] != "Score_Type_Utilisateur"}
+        return corriges
+
+    def _maj_activite_utilisateur(self, user_id, jour, nb):
+        if nb <= 0:
+            return
+        ligne = self._one("Activite_Utilisateur", Users_Id=user_id)
+        if ligne:
+            ligne.update(activite.ajouter(ligne, jour, nb))
+        else:
+            self._store("Activite_Utilisateur", {"Users_Id": user_id, **activite.ajouter(None, jour, nb)})
+
+    def _rpc_reconstruire_activite_utilisateurs(self):
+        par_utilisateur = defaultdict(lambda: defaultdict(int))
+        dates = {e["id"]: (e["Users_Id"], e["Date"]) for e in self.tables["Entrainement"]}
+        for o in self.tables["Observations"]:
+            user_id, jour = dates[o["Entrainement_Id"]]
+            par_utilisateur[user_id][jour] += 1
+        self.tables["Activite_Utilisateur"] = []
+        self._indexes = {k: v for k, v in self._indexes.items() if k[0] != "Activite_Utilisateur"}
+        for user_id, par_jour in par_utilisateur.items():
+            self._store("Activite_Utilisateur", {"Users_Id": user_id, **activite.reconstruire(par_jour)})
+        return len(par_utilisateur)
+
+    def _rpc_reconstruire_cumuls_quotidiens(self):
+        self.tables["Cumul_Quotidien"] = []
+        self._indexes = {k: v for k, v in self._indexes.items() if k[0] != "Cumul_Quotidien"}
+        for row in self.tables["Observations"]:
+            self._cumuler(self._one("Entrainement", id=row["Entrainement_Id"]), row)
+        return len(self.tables["Cumul_Quotidien"])
+
+    def _maj_fenetre_reussite(self, user_id, parcours_id, critere, depuis, etats):
+        ligne = self._one("Fenetre_Reussite", Users_Id=user_id, Parcours_Id=parcours_id)
+        fenetre = fenetre_courante(ligne, critere, depuis)
+        for etat in etats:
+            fenetre_ajouter(fenetre, etat)
+        if ligne:
+            ligne.update(fenetre)
+        else:
+            self._store("Fenetre_Reussite", {"Users_Id": user_id, "Parcours_Id": parcours_id, **fenetre})
+        return fenetre
+
+    def _rpc_reconstruire_fenetres_reussite(self):
+        self.tables["Fenetre_Reussite"] = []
+        self._indexes = {k: v for k, v in self._indexes.items() if k[0] != "Fenetre_Reussite"}
+        for pos in self.tables["Position_Actuelle"]:
+            depuis = pos["Derniere_Observation_Id"] or 0
+            mes_entrainements = [e["id"] for e in self.scan("Entrainement", {"Users_Id": pos["Users_Id"]})]
+            etats = [o["Etat"] for o in sorted(
+                (o for eid in mes_entrainements for o in self.scan("Observations", {"Entrainement_Id": eid})
+                 if o["Parcours_Id"] == pos["Parcours_Id"] and o["id"] > depuis), key=lambda o: o["id"])]
+            critere = self._one("Parcours", id=pos["Parcours_Id"])["Critere"]
+            self._maj_fenetre_reussite(pos["Users_Id"], pos["Parcours_Id"], critere, depuis, etats)
+        return len(self.tables["Position_Actuelle"])
+
+    def _rpc_enregistrer_entrainement(self, p_user_id, p_cle, p_date, p_heure, p_observations, p_saut_max=1):
+        deja = self._one("Enregistrement_Session", Cle=p_cle)
+        if deja:
+            return copy.deepcopy(deja["Resultat"])
+        types, avertissements = {}, []
+        for type_op, rows in p_observations.items():
+            if not rows:
+                continue
+            position = self._one("Position_Actuelle", Users_Id=p_user_id, Type_Operation=type_op)
+            if not position:
+                avertissements.append(f"Aucun Parcours_Id trouvé pour {type_op}, entraînement non créé pour ce type.")
+                continue
+            parcours_id = position["Parcours_Id"]
+            dernier = position["Derniere_Observation_Id"] or 0
+            entrainement = self.insert("Entrainement", [{
+                "Users_Id": p_user_id, "Date": p_date, "Time": p_heure, "Volume": len(rows), "Parcours_Id": parcours_id,
+            }])[0]
+            observations = self.insert("Observations", [
+                {"Correction": "NON", **row, "Entrainement_Id": entrainement["id"], "Parcours_Id": parcours_id}
+                for row in rows
+            ])
+            observation_ids = [o["id"] for o in observations]
+
+            critere = self._one("Parcours", id=parcours_id)["Critere"]
+            fenetre = self._maj_fenetre_reussite(p_user_id, parcours_id, critere, dernier, [o["Etat"] for o in observations])
+            taux = fenetre_taux(fenetre)
+            evolution, cible = None, parcours_id
+            if taux is not None:
+                evolution = decider_evolution(taux)
+                chaine = chaine_niveaux(self.scan("Parcours", {"Type_Operation": type_op}))
+                cible = parcours_cible(evolution, parcours_id, chaine.get(type_op),
+                                       niveaux_franchis(fenetre, p_saut_max or 1))
+                self.insert("Suivi_Parcours", [{
+                    "Users_Id": p_user_id, "Parcours_Id": cible, "Date": p_date, "Taux_Reussite": taux,
+                    "Type_Evolution": evolution, "Derniere_Observation_Id": observation_ids[-1],
+                }])
+            types[type_op] = {
+                "entrainement_id": entrainement["id"], "observation_ids": observation_ids,
+                "parcours_id": parcours_id, "evolution": evolution, "taux": taux, "nouveau_parcours_id": cible,
+            }
+        resultat = {"cle": p_cle, "types": types, "avertissements": avertissements}
+        self._store("Enregistrement_Session", {"Cle": p_cle, "Users_Id": p_user_id, "Resultat": resultat,
+                                               "Cree": datetime.now().isoformat()})
+        return copy.deepcopy(resultat)
@@ -0,0 +1,202 @@
+"""
+Benchmark des pages sur le client Supabase factice (bench/fake_supabase.py), via streamlit.testing.
+
+Pour chaque volume d'utilisateurs, rejoue home_page, training_lobby_page, progression_page,
+classement_page et l'enregistrement d'une session (log_responses_to_supabase -> job en
+arrière-plan), et rapporte allers-retours et durée, lus dans les traces (cf. tracing.py).
+Échoue (code 1) si une page dépasse son seuil d'allers-retours (bench/thresholds.json),
+au premier passage (« cold » : caches vides) comme au rerun (« warm »), ou si l'un de ces
+nombres varie avec le volume (requête par utilisateur, N+1).
+
+    python -m bench.pages                      # 1, 1 000 et 100 000 utilisateurs
+    python -m bench.pages --users 1 1000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import streamlit as st                                   # noqa: E402
+import supabase as supabase_module                       # noqa: E402
+from streamlit.testing.v1 import AppTest                 # noqa: E402
+
+from bench.fake_supabase import FakeSupabase             # noqa: E402
+
+APP = os.path.join(ROOT, "calcul_pixel.py")
+THRESHOLDS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "thresholds.json")
+PAGES = ("home", "training_lobby", "progression", "classement")
+TYPES = ("Addition", "Soustraction", "Multiplication")
+NIVEAUX = 5
+SESSIONS_UTILISATEUR = 5     # historique de l'utilisateur mesuré
+QUESTIONS_PAR_TYPE = 10
+
+
+# --------------------- DONNÉES ---------------------
+
+def seed(db: FakeSupabase, nb_users: int, rng: random.Random):
+    """Catalogue, nb_users utilisateurs (scores cumulés) et un historique complet pour l'utilisateur 1."""
+    db.load("Parcours", [
+        {"id": i * NIVEAUX + n, "Niveau": n, "Type_Operation": t, "Critere": 10,
+         "Operateur1_Min": 0, "Operateur1_Max": 10 * n, "Operateur2_Min": 0, "Operateur2_Max": 10 * n}
+        for i, t in enumerate(TYPES) for n in range(1, NIVEAUX + 1)
+    ])
+    db.load("Users", ({"id": u, "name": f"Joueur {u}", "email": f"joueur{u}@example.com", "password_hash": "x"}
+                      for u in range(1, nb_users + 1)))
+    db.load("Score_Utilisateur", ({"Users_Id": u, "Score_Total": rng.randint(0, 5000), "Nb_Observations": 0}
+                                  for u in range(2, nb_users + 1)))
+    db.load("Score_Utilisateur", [{"Users_Id": 1, "Score_Total": 0, "Nb_Observations": 0}])
+
+    db.insert("Suivi_Parcours", [
+        {"Users_Id": 1, "Parcours_Id": i * NIVEAUX + 1, "Date": "2026-01-01", "Taux_Reussite": 0,
+         "Type_Evolution": "initialisation", "Derniere_Observation_Id": None}
+        for i in range(len(TYPES))
+    ])
+    for s in range(SESSIONS_UTILISATEUR):
+        db._rpc_enregistrer_entrainement(1, f"seed-{s}", f"2026-01-{s + 1:02d}", "10:00", {
+            t: [{"Operation": "1 + 1", "Etat": "VRAI" if rng.random() < 0.8 else "FAUX", "Score": 1,
+                 "Temps_Seconds": rng.randint(1, 9), "Marge_Erreur": 0} for _ in range(QUESTIONS_PAR_TYPE)]
+            for t in TYPES
+        })
+    db.reset_counters()
+
+
+def session_answers(rng: random.Random):
+    answers = []
+    for t, symbol in zip(TYPES, "+-*"):
+        for _ in range(QUESTIONS_PAR_TYPE):
+            a, b = rng.randint(0, 10), rng.randint(0, 10)
+            ok = rng.random() < 0.8
+            answers.append({"question": f"{a} {symbol} {b}", "user_answer": "0", "correct_answer": 0,
+                            "is_correct": ok, "corrected": False, "elapsed": 3, "error_margin": 0 if ok else 2,
+                            "type_operation": t})
+    return answers
+
+
+# --------------------- MESURE ---------------------
+
+def read_traces(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def new_app(trace_file):
+    at = AppTest.from_file(APP, default_timeout=300)
+    at.secrets["SUPABASE_URL"] = "http://fake-supabase.local"
+    at.secrets["SUPABASE_KEY"] = "fake"
+    at.secrets["TRACE_FILE"] = trace_file
+    at.secrets["QUIZ_RUNNER"] = "classic"
+    at.session_state["user"] = {"id": 1, "name": "Joueur 1", "email": "joueur1@example.com"}
+    at.session_state["user_id"] = 1
+    return at
+
+
+def run_page(at, page, trace_file):
+    """Rerun de `page` : (allers-retours, ms) de la trace rerun:<page>."""
+    at.session_state["page"] = page
+    before = len(read_traces(trace_file))
+    at.run()
+    if at.exception:
+        raise RuntimeError(f"{page} : {[e.value for e in at.exception]}")
+    trace = next(t for t in read_traces(trace_file)[before:] if t["name"] == f"rerun:{page}")
+    return trace["round_trips"], trace["ms"]
+
+
+def wait_for_trace(trace_file, name, start, timeout=60.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        found = [t for t in read_traces(trace_file)[start:] if t["name"] == name]
+        if found:
+            return found[-1]
+        time.sleep(0.05)
+    raise TimeoutError(f"trace {name} absente")
+
+
+def run_submission(at, trace_file, rng):
+    """Session terminée -> retour à l'accueil : mesure le job d'enregistrement (log_responses_to_supabase)."""
+    at.session_state["page"] = "result"
+    at.session_state["answers"] = session_answers(rng)
+    at.session_state["submission_key"] = f"bench-{rng.random()}"
+    at.session_state["responses_logged"] = False
+    start = len(read_traces(trace_file))
+    at.run()
+    wait_for_trace(trace_file, "prefetch", start)
+    start = len(read_traces(trace_file))
+    next(b for b in at.button if b.label == "Retour à l'accueil").click().run()
+    trace = wait_for_trace(trace_file, "submission", start)
+    return trace["round_trips"], trace["ms"]
+
+
+def bench_scale(nb_users, trace_file):
+    rng = random.Random(nb_users)
+    db = FakeSupabase()
+    t0 = time.perf_counter()
+    seed(db, nb_users, rng)
+    seed_s = time.perf_counter() - t0
+
+    supabase_module.create_client = lambda *args, **kwargs: db
+    st.cache_data.clear()
+    st.cache_resource.clear()
+
+    at = new_app(trace_file)
+    results = {}
+    for page in PAGES:
+        cold = run_page(at, page, trace_file)
+        warm = run_page(at, page, trace_file)
+        results[page] = {"cold": cold, "warm": warm}
+    cold = run_submission(at, trace_file, rng)
+    warm = run_submission(at, trace_file, rng)
+    results["submission"] = {"cold": cold, "warm": warm}
+    return results, seed_s
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 1_000, 100_000])
+    args = parser.parse_args(argv)
+
+    with open(THRESHOLDS, encoding="utf-8") as f:
+        thresholds = json.load(f)
+
+    trace_file = os.path.join(tempfile.mkdtemp(prefix="bench-pages-"), "traces.jsonl")
+    failures = []
+    by_scale = {}
+    print(f"{'utilisateurs':>12} {'étape':<16} {'a/r à froid':>11} {'seuil':>6} {'a/r':>5} {'seuil':>6} "
+          f"{'ms à froid':>11} {'ms':>9}")
+    for nb_users in args.users:
+        results, seed_s = bench_scale(nb_users, trace_file)
+        by_scale[nb_users] = results
+        for step, r in results.items():
+            (cold_rt, cold_ms), (warm_rt, warm_ms) = r["cold"], r["warm"]
+            limits = thresholds.get(step, {})
+            print(f"{nb_users:>12} {step:<16} {cold_rt:>11} {limits.get('cold', '-'):>6} "
+                  f"{warm_rt:>5} {limits.get('warm', '-'):>6} {cold_ms:>11.1f} {warm_ms:>9.1f}")
+            for run, label in (("cold", "à froid"), ("warm", "au rerun")):
+                limit = limits.get(run)
+                if limit is not None and r[run][0] > limit:
+                    failures.append(f"{step} à {nb_users} utilisateurs : {r[run][0]} allers-retours {label} (seuil {limit})")
+        print(f"{nb_users:>12} {'(données)':<16} {'':>11} {'':>6} {'':>5} {'':>6} {seed_s * 1000:>11.1f}")
+
+    reference = by_scale[args.users[0]]
+    for nb_users, results in by_scale.items():
+        for step, r in results.items():
+            for run, label in (("cold", "à froid"), ("warm", "au rerun")):
+                if r[run][0] != reference[step][run][0]:
+                    failures.append(f"{step} : {reference[step][run][0]} allers-retours {label} à {args.users[0]} "
+                                    f"utilisateurs, {r[run][0]} à {nb_users} (dépend du volume)")
+
+    for failure in failures:
+        print(f"ÉCHEC : {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,263 @@
+"""
+Générateur de charge synthétique : utilisateurs avec des mois d'historique.
+
+Pour chaque utilisateur : jours d'activité sur `days` jours, sessions de 3 types, Observations
+(Etat selon l'écart entre son niveau réel et la difficulté du Parcours, Temps_Seconds log-normal,
+Marge_Erreur géométrique en cas d'erreur) et chaîne Suivi_Parcours calculée avec les règles de
+progression.py, comme enregistrer_entrainement. Les lignes sont produites utilisateur par
+utilisateur et écrites par lots (jamais tout l'historique en mémoire), dans :
+
+- une base SQLite au schéma de l'app (storage.SQLiteClient, migrations appliquées ; les triggers
+  maintiennent Position_Actuelle, les scores, les cumuls et le calendrier d'activité), ou
+- le client Supabase factice en mémoire (bench/fake_supabase.py).
+
+Les lignes sont écrites directement dans les tables, sans passer par enregistrer_entrainement :
+les fenêtres de réussite (Fenetre_Reussite, sql/007) sont reconstruites en fin de génération.
+
+    python -m bench.workload sqlite charge.db --users 1000 --days 120
+    python -m bench.workload memory --users 100 --days 30
+"""
+
+import argparse
+import sys
+import time
+from collections import deque
+from datetime import date, timedelta
+
+import bcrypt
+import numpy as np
+
+from progression import chaine_niveaux, decider_evolution, parcours_cible, premier_niveau, taux_reussite
+from storage import SQLiteClient
+
+TYPES = ("Addition", "Soustraction", "Multiplication")
+SYMBOLES = {"Addition": "+", "Soustraction": "-", "Multiplication": "*"}
+NIVEAUX_PAR_TYPE = {"Addition": 14, "Soustraction": 14, "Multiplication": 12}   # 40 niveaux
+MOT_DE_PASSE = "synthetique"          # mot de passe de tous les utilisateurs générés
+ORDRE_ECRITURE = ("Users", "Entrainement", "Observations", "Suivi_Parcours")
+RECONSTRUCTIONS = ("reconstruire_fenetres_reussite",)
+
+
+def catalogue_synthetique():
+    """40 niveaux : bornes d'opérandes croissantes par type."""
+    rows = []
+    for type_op in TYPES:
+        for niveau in range(1, NIVEAUX_PAR_TYPE[type_op] + 1):
+            borne = 5 * niveau if type_op != "Multiplication" else niveau + 1
+            rows.append({"Niveau": niveau, "Type_Operation": type_op, "Critere": 10,
+                         "Operateur1_Min": 0, "Operateur1_Max": borne,
+                         "Operateur2_Min": 0, "Operateur2_Max": borne})
+    return rows
+
+
+# --------------------- ÉCRITURE PAR LOTS ---------------------
+
+class SQLiteWriter:
+    """Écrit dans une base SQLite de l'app ; un lot = une transaction, executemany par table."""
+
+    def __init__(self, path: str, batch_size: int = 20_000):
+        self.client = SQLiteClient(path)
+        self.conn = self.client._conn
+        self.batch_size = batch_size
+
+    def next_id(self, table: str) -> int:
+        return (self.conn.execute(f'SELECT MAX("id") FROM "{table}"').fetchone()[0] or 0) + 1
+
+    def parcours(self):
+        rows = [dict(r) for r in self.conn.execute(
+            'SELECT * FROM "Parcours" WHERE "Type_Operation" IS NOT NULL ORDER BY "id"')]
+        if not rows:
+            self.write({"Parcours": catalogue_synthetique()})
+            rows = [dict(r) for r in self.conn.execute('SELECT * FROM "Parcours" ORDER BY "id"')]
+        return rows
+
+    def write(self, buffers: dict):
+        with self.client._lock:
+            self.conn.execute("BEGIN")
+            try:
+                for table in ("Parcours",) + ORDRE_ECRITURE:
+                    rows = buffers.get(table)
+                    if not rows:
+                        continue
+                    columns = list(rows[0])
+                    sql = (f'INSERT INTO "{table}" ({", ".join(chr(34) + c + chr(34) for c in columns)}) '
+                           f'VALUES ({", ".join(":" + c for c in columns)})')
+                    self.conn.executemany(sql, rows)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def finalize(self):
+        for rpc in RECONSTRUCTIONS:
+            self.client.rpc(rpc).execute()
+
+    def close(self):
+        self.client.close()
+
+
+class MemoryWriter:
+    """Écrit dans le client Supabase factice (triggers simulés à l'insertion)."""
+
+    def __init__(self, db=None, batch_size: int = 20_000):
+        from bench.fake_supabase import FakeSupabase
+        self.db = db if db is not None else FakeSupabase()
+        self.batch_size = batch_size
+
+    def next_id(self, table: str) -> int:
+        return max((r["id"] for r in self.db.tables[table]), default=0) + 1
+
+    def parcours(self):
+        rows = [r for r in self.db.tables["Parcours"] if r.get("Type_Operation")]
+        if not rows:
+            self.write({"Parcours": catalogue_synthetique()})
+            rows = list(self.db.tables["Parcours"])
+        return sorted(rows, key=lambda r: r["id"])
+
+    def write(self, buffers: dict):
+        with self.db.lock:
+            for table in ("Parcours",) + ORDRE_ECRITURE:
+                if buffers.get(table):
+                    self.db.insert(table, buffers[table])
+
+    def finalize(self):
+        with self.db.lock:
+            for rpc in RECONSTRUCTIONS:
+                getattr(self.db, f"_rpc_{rpc}")()
+
+    def close(self):
+        pass
+
+
+# --------------------- GÉNÉRATION ---------------------
+
+def generate(writer, users: int, days: int, seed: int = 0, end: date = None, progress=None):
+    """
+    Génère `users` utilisateurs avec jusqu'à `days` jours d'historique (se terminant à `end`).
+    Retourne le nombre de lignes écrites par table.
+    """
+    rng = np.random.default_rng(seed)
+    end = end or date.today()
+    catalogue = writer.parcours()
+    chaines = chaine_niveaux(catalogue)
+    par_id = {p["id"]: p for p in catalogue}
+
+    password_hash = bcrypt.hashpw(MOT_DE_PASSE.encode(), bcrypt.gensalt(4)).decode()   # un seul hachage
+    next_ids = {table: writer.next_id(table) for table in ORDRE_ECRITURE}
+    buffers = {table: [] for table in ORDRE_ECRITURE}
+    counts = dict.fromkeys(ORDRE_ECRITURE, 0)
+
+    def add(table, row):
+        row["id"] = next_ids[table]
+        next_ids[table] += 1
+        buffers[table].append(row)
+        counts[table] += 1
+        return row["id"]
+
+    def flush():
+        if any(buffers.values()):
+            writer.write(buffers)
+            for rows in buffers.values():
+                rows.clear()
+
+    for n in range(users):
+        user_id = add("Users", {"name": f"Synthétique {next_ids['Users']}",
+                                "email": f"synthetique{next_ids['Users']}@example.com",
+                                "password_hash": password_hash})
+        profondeur = int(rng.integers(max(1, days // 4), days + 1))      # ancienneté du compte
+        assiduite = float(rng.beta(2, 3))                                 # part des jours actifs
+        aptitude = {t: float(rng.normal(0, 1.5)) for t in TYPES}          # niveau réel de départ
+        vitesse = float(rng.lognormal(0, 0.3))                            # facteur de temps de réponse
+        debut = end - timedelta(days=profondeur - 1)
+
+        parcours_actuel, etats_depuis = {}, {}
+        for t in TYPES:
+            parcours_actuel[t] = premier_niveau(chaines.get(t))
+            etats_depuis[t] = deque(maxlen=par_id[parcours_actuel[t]]["Critere"])
+            add("Suivi_Parcours", {"Users_Id": user_id, "Parcours_Id": parcours_actuel[t], "Date": debut.isoformat(),
+                                   "Taux_Reussite": 0, "Type_Evolution": "initialisation",
+                                   "Derniere_Observation_Id": None})
+
+        jours_actifs = np.flatnonzero(rng.random(profondeur) < assiduite)
+        for jour in jours_actifs:
+            jour_date = (debut + timedelta(days=int(jour))).isoformat()
+            for _ in range(int(rng.integers(1, 3))):                      # 1 ou 2 sessions ce jour-là
+                heure = f"{int(rng.integers(7, 22)):02d}:{int(rng.integers(0, 60)):02d}"
+                volume = int(rng.choice([5, 10, 20]))
+                for t in TYPES:
+                    parcours = par_id[parcours_actuel[t]]
+                    niveau = chaines[t]["rang"][parcours["id"]]
+                    aptitude[t] += 0.02                                   # on progresse en s'entraînant
+                    p_reussite = 1 / (1 + np.exp(-(aptitude[t] - 0.35 * niveau + 1.5)))
+
+                    entrainement_id = add("Entrainement", {"Users_Id": user_id, "Date": jour_date, "Time": heure,
+                                                           "Volume": volume, "Parcours_Id": parcours["id"]})
+                    a = rng.integers(parcours["Operateur1_Min"], parcours["Operateur1_Max"], endpoint=True, size=volume)
+                    b = rng.integers(parcours["Operateur2_Min"], parcours["Operateur2_Max"], endpoint=True, size=volume)
+                    if t == "Soustraction":
+                        a, b = np.maximum(a, b), np.minimum(a, b)
+                    justes = rng.random(volume) < p_reussite
+                    temps = np.clip(rng.lognormal(np.log(3 + niveau) + np.log(vitesse), 0.5, volume), 1, 120)
+                    marges = np.where(justes, 0, rng.geometric(0.35, volume))
+                    corrections = ~justes & (rng.random(volume) < 0.5)
+
+                    derniere = None
+                    for i in range(volume):
+                        etat = "VRAI" if justes[i] else "FAUX"
+                        derniere = add("Observations", {
+                            "Entrainement_Id": entrainement_id, "Parcours_Id": parcours["id"],
+                            "Operateur_Un": int(a[i]), "Operateur_Deux": int(b[i]),
+                            "Operation": f"{a[i]} {SYMBOLES[t]} {b[i]}", "Etat": etat,
+                            "Correction": "OUI" if corrections[i] else "NON", "Score": 1 if justes[i] else -1,
+                            "Temps_Seconds": int(temps[i]), "Marge_Erreur": int(marges[i]),
+                        })
+                        etats_depuis[t].append(etat)
+
+                    # Progression : mêmes règles qu'enregistrer_entrainement (sql/004)
+                    taux = taux_reussite(list(etats_depuis[t]), parcours["Critere"])
+                    if taux is not None:
+                        evolution = decider_evolution(taux)
+                        parcours_actuel[t] = parcours_cible(evolution, parcours["id"], chaines[t])
+                        add("Suivi_Parcours", {"Users_Id": user_id, "Parcours_Id": parcours_actuel[t],
+                                               "Date": jour_date, "Taux_Reussite": taux,
+                                               "Type_Evolution": evolution, "Derniere_Observation_Id": derniere})
+                        etats_depuis[t] = deque(maxlen=par_id[parcours_actuel[t]]["Critere"])
+
+            if len(buffers["Observations"]) >= writer.batch_size:
+                flush()
+        if progress and (n + 1) % progress == 0:
+            print(f"  {n + 1} utilisateurs, {counts['Observations']} observations", flush=True)
+    flush()
+    writer.finalize()
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Générateur de charge synthétique")
+    parser.add_argument("target", choices=["sqlite", "memory"])
+    parser.add_argument("path", nargs="?", help="fichier SQLite (cible sqlite)")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--days", type=int, default=90, help="profondeur maximale d'historique, en jours")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch", type=int, default=20_000, help="observations par lot écrit")
+    args = parser.parse_args(argv)
+
+    if args.target == "sqlite":
+        if not args.path:
+            parser.error("cible sqlite : chemin du fichier requis")
+        writer = SQLiteWriter(args.path, args.batch)
+    else:
+        writer = MemoryWriter(batch_size=args.batch)
+
+    start = time.perf_counter()
+    counts = generate(writer, args.users, args.days, args.seed, progress=max(1, args.users // 10))
+    elapsed = time.perf_counter() - start
+    writer.close()
+    total = sum(counts.values())
+    print(", ".join(f"{table} : {n}" for table, n in counts.items()))
+    print(f"{total} lignes en {elapsed:.1f} s ({total / elapsed:,.0f} lignes/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,13 @@
 import streamlit as st
 import json
+import logging
 import os
-import random
+import threading
+import secrets
+import uuid
 import bcrypt
 import hashlib
+import io
 import time
 import pandas as pd
 from PIL import Image
@@ -11,7 +15,19 @@ import numpy as np
 from openai import OpenAI
 from dotenv import load_dotenv
 from datetime import datetime
-from supabase import create_client
+from concurrent.futures import ThreadPoolExecutor
+from supabase import ClientOptions, create_client
+from storage import SQLiteClient
+from auth import SessionStore, sign_session_token, verify_session_token
+from tracing import TracedClient, configure_trace_file, run_in_context, set_slow_query_ms, trace_root, traced, traced_job
+from clients import OPENAI_TIMEOUT, check_health, create_http_client, pool_metrics
+import activite
+from progression import (SAUT_MAX, chaine_niveaux, cle_niveau, decider_evolution, fenetre_ajouter, fenetre_courante,
+                         fenetre_taux, niveaux_franchis, parcours_cible)
+from quiz_runner import quiz_runner
+from questions import TYPES_OPERATION, bornes_parcours, generer_questions, nb_questions, nouvelle_graine, question
+
+logger = logging.getLogger("calcul_pixel")
 
 # --- 🔹 Initialisation de la session ---
 if "page" not in st.session_state:
@@ -23,22 +39,83 @@ if "user_id" not in st.session_state:
 if "user" not in st.session_state:
     st.session_state.user = None  # Dictionnaire utilisateur complet
 
-# --- 🔹 Lecture de l'user_id depuis l'URL avec la nouvelle API ---
-params = st.query_params  # ✅ Pas de parenthèses
-if "user_id" in params:
-    try:
-        st.session_state.user_id = int(params["user_id"])
-    except ValueError:
-        st.session_state.user_id = None
-
-# --- 🔹 Connexion Supabase ---
-supabase_url = st.secrets["SUPABASE_URL"]
-supabase_key = st.secrets["SUPABASE_KEY"]
-supabase = create_client(supabase_url, supabase_key)
-
-# --- 🔹 OpenAI ---
+# --- 🔹 Connexion stockage ---
+# Supabase par défaut ; STORAGE_BACKEND = "sqlite" et SQLITE_PATH dans les secrets pour un stockage local
+# (même interface de requêtes, cf. storage.py). La variable reste nommée `supabase`.
+# Les clients sont créés une fois par process (cache_resource) et partagent un pool de
+# connexions keep-alive (cf. clients.py) : pas de nouvelle poignée de main TLS à chaque rerun.
 load_dotenv()
-client = OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
+
+@st.cache_resource
+def get_sqlite_client(path: str):
+    return SQLiteClient(path)
+
+@st.cache_resource
+def get_supabase_client(url: str, key: str):
+    http = create_http_client()
+    return create_client(url, key, options=ClientOptions(httpx_client=http)), http
+
+@st.cache_resource
+def get_openai_client(api_key: str):
+    http = create_http_client(timeout=OPENAI_TIMEOUT, trace_kind="openai")
+    return OpenAI(api_key=api_key, http_client=http, timeout=OPENAI_TIMEOUT, max_retries=2), http
+
+def get_storage():
+    if st.secrets.get("STORAGE_BACKEND", "supabase") == "sqlite":
+        # Chemin explicite obligatoire : la migration réécrit la base (cf. storage.py), jamais monstro.db par défaut
+        return get_sqlite_client(st.secrets["SQLITE_PATH"])
+    return get_supabase_client(st.secrets["SUPABASE_URL"], st.secrets["SUPABASE_KEY"])[0]
+
+def get_openai():
+    """Client OpenAI partagé, créé au premier usage (la clé n'est requise que si on s'en sert)."""
+    return get_openai_client(st.secrets["OPENAI_API_KEY"])[0]
+
+def client_pool_metrics():
+    """Connexions HTTP par service : requêtes, connexions créées, en cours / au repos, taux de réutilisation."""
+    metrics = {}
+    if st.secrets.get("STORAGE_BACKEND", "supabase") != "sqlite":
+        metrics["supabase"] = pool_metrics(get_supabase_client(st.secrets["SUPABASE_URL"], st.secrets["SUPABASE_KEY"])[1])
+    if "OPENAI_API_KEY" in st.secrets:
+        metrics["openai"] = pool_metrics(get_openai_client(st.secrets["OPENAI_API_KEY"])[1])
+    return metrics
+
+def _reset_http_client(factory, *args):
+    """Ferme le pool HTTP du client en cache puis l'évince : il est recréé au prochain usage."""
+    _client, http = factory(*args)
+    http.close()
+    factory.clear()
+
+@st.cache_data(ttl=60, show_spinner=False)
+def check_clients_health(include_openai: bool = False):
+    """
+    Sonde les services (au plus une fois par minute) ; un client en échec est recréé au prochain usage.
+    OpenAI n'est sondé qu'à la demande (overlay de dev) : appel externe inutile sur la page de connexion.
+    """
+    results = [check_health("storage", lambda: supabase.table("Parcours").select("id").limit(1).execute())]
+    if include_openai and "OPENAI_API_KEY" in st.secrets:
+        results.append(check_health("openai", lambda: get_openai().models.list()))
+    for r in results:
+        if not r["ok"]:
+            logger.warning("Service %s indisponible : %s", r["service"], r["error"])
+            if r["service"] == "openai":
+                _reset_http_client(get_openai_client, st.secrets["OPENAI_API_KEY"])
+            elif st.secrets.get("STORAGE_BACKEND", "supabase") != "sqlite":
+                _reset_http_client(get_supabase_client, st.secrets["SUPABASE_URL"], st.secrets["SUPABASE_KEY"])
+    return results
+
+supabase = TracedClient(get_storage())   # chaque .execute() / rpc est un span "query" (cf. tracing.py)
+
+# --- 🔹 Traces ---
+# Une trace par rerun (page, requêtes, HTTP, rendus) écrite en JSON lines dans TRACE_FILE ;
+# requêtes plus lentes que SLOW_QUERY_MS signalées dans les logs ; DEV_OVERLAY = true affiche
+# la trace dans la barre latérale.
+@st.cache_resource
+def _configure_tracing(path: str, slow_query_ms: float):
+    if path:
+        configure_trace_file(path)
+    set_slow_query_ms(slow_query_ms)
+
+_configure_tracing(st.secrets.get("TRACE_FILE", "logs/traces.jsonl"), float(st.secrets.get("SLOW_QUERY_MS", 300)))
 
 # --- 🔹 Réinitialisation d'un nouvel entraînement ---
 
@@ -46,15 +123,39 @@ def start_new_training():
     """Réinitialise l'état de session pour un nouvel entraînement"""
     st.session_state.responses_logged = False
     st.session_state.answers = []
+    st.session_state.submission_key = uuid.uuid4().hex  # clé d'idempotence de l'enregistrement
     st.session_state.page = "mental_calc"  # Page d'entraînement
 
 # --------------------- UTILISATEURS ---------------------
 
+AUTH_WORKERS = 2   # hachages bcrypt simultanés par process (le reste attend dans la file)
+
+@st.cache_resource
+def _auth_pool():
+    """bcrypt hors du thread du script : une rafale de connexions ne bloque pas les autres sessions."""
+    return ThreadPoolExecutor(max_workers=AUTH_WORKERS, thread_name_prefix="pixel-auth")
+
+@st.cache_resource
+def _session_store():
+    return SessionStore()
+
+@st.cache_resource
+def _session_secret() -> bytes:
+    """SESSION_SECRET des secrets ; à défaut un secret par process (sessions perdues au redémarrage)."""
+    configured = st.secrets.get("SESSION_SECRET")
+    return configured.encode() if configured else secrets.token_bytes(32)
+
+def hash_password(password: str) -> str:
+    return _auth_pool().submit(lambda: bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")).result()
+
+def check_password(password: str, password_hash: str) -> bool:
+    return _auth_pool().submit(bcrypt.checkpw, password.encode(), password_hash.encode()).result()
+
 def authenticate_user(email: str, password: str):
-    """Vérifie l'email et le mot de passe de l'utilisateur dans Supabase."""
+    """Vérifie l'email et le mot de passe de l'utilisateur dans Supabase (sans renvoyer le hash)."""
     user_data = (
         supabase.table("Users")
-        .select("id, email, password_hash")
+        .select("id, name, email, password_hash")
 
         .eq("email", email)
         .execute()
@@ -67,14 +168,51 @@ def authenticate_user(email: str, password: str):
     user = user_data[0]
 
     # Vérification du hash bcrypt
-    if bcrypt.checkpw(password.encode(), user["password_hash"].encode()):
+    if check_password(password, user.pop("password_hash")):
         return user
 
     return None  # Mot de passe incorrect
 
+def open_session(user: dict):
+    """Connecte l'utilisateur : session serveur + jeton signé dans l'URL (survit au rechargement)."""
+    token, session_id, expires = sign_session_token(user["id"], _session_secret())
+    _session_store().open(session_id, user["id"], expires, user)
+    st.session_state.user = user
+    st.session_state.user_id = user["id"]
+    st.session_state.session_id = session_id
+    st.query_params.pop("user_id", None)
+    st.query_params["session"] = token
+
+def restore_session():
+    """Après un rechargement : utilisateur complet retrouvé depuis le jeton, sans requête ni hachage."""
+    token = st.query_params.get("session")
+    verified = verify_session_token(token, _session_secret()) if token else None
+    user = _session_store().get(verified[1], verified[0]) if verified else None
+    if user is None:
+        if token:
+            st.query_params.pop("session", None)   # jeton falsifié, expiré ou session fermée
+        return False
+    st.session_state.user = user
+    st.session_state.user_id = user["id"]
+    st.session_state.session_id = verified[1]
+    if st.session_state.page in ("login", "signup"):
+        st.session_state.page = "home"
+    return True
+
+def close_session():
+    session_id = st.session_state.get("session_id")
+    if session_id:
+        _session_store().close(session_id)
+    st.query_params.pop("session", None)
+
+@traced("page")
 def login_page():
     st.title("🔐 Connexion à Pixel")
 
+    for service in check_clients_health():
+        if not service["ok"] and service["service"] == "storage":
+            st.warning("⚠️ Le service de données ne répond pas, réessayez dans un instant.")
+
     email = st.text_input("Email")
     password = st.text_input("Mot de passe", type="password")
 
@@ -83,9 +221,7 @@ def login_page():
         if st.button("Connexion", use_container_width=True):
             user = authenticate_user(email, password)
             if user:
-                st.session_state.user = user
-                st.session_state.user_id = user["id"]
-                st.query_params["user_id"] = str(user["id"])
+                open_session(user)
                 st.session_state.page = "home"
                 st.rerun()
             else:
@@ -99,6 +235,7 @@ def login_page():
     # Optionnel : lien texte
     st.caption("Pas encore de compte ? Cliquez sur **Créer un compte** pour vous inscrire.")
 
+@traced("page")
 def signup_page():
     st.title("Créer un compte")
 
@@ -119,7 +256,7 @@ def signup_page():
             return
 
         # 🔹 Hachage sécurisé du mot de passe
-        hashed_password = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+        hashed_password = hash_password(password)
 
         # 🔹 Créer l'utilisateur dans Supabase
         response = supabase.table("Users").insert({
@@ -129,6 +266,11 @@ def signup_page():
         }).execute()
 
         if response.data:
+            # Suivis initiaux dès l'inscription ; en cas d'échec, l'accueil les complétera
+            try:
+                provision_initial_suivi(response.data[0]["id"])
+            except Exception:
+                logger.warning("Suivis initiaux non créés à l'inscription", exc_info=True)
             st.success("Compte créé avec succès 🎉")
             st.session_state.page = "login"
             st.rerun()
@@ -151,195 +293,432 @@ def save_user(name, email, password):
         "password_hash": password
     }).execute()
 
-# --------------------- STATS & CLASSEMENT ---------------------
-
-def ensure_initial_suivi(user_id: int):
+# --------------------- CATALOGUE PARCOURS ---------------------
+
+PARCOURS_CACHE_TTL = 600  # secondes : la table Parcours ne change quasiment jamais
+TYPE_SYMBOLS = {"Addition": "+", "Soustraction": "-", "Multiplication": "*"}
+
+@st.cache_resource
+def _parcours_catalog_version():
+    """Compteur partagé par tout le process : l'incrémenter invalide le catalogue."""
+    return {"version": 0}
+
+@st.cache_data(ttl=PARCOURS_CACHE_TTL, show_spinner=False)
+def _load_parcours_catalog(version: int):
+    rows = supabase.table("Parcours").select("*").execute().data or []
+    by_type = {}
+    for p in rows:
+        by_type.setdefault(p.get("Type_Operation"), []).append(p)
+    for levels in by_type.values():
+        levels.sort(key=cle_niveau)
+    catalog = {
+        "version": version,
+        "by_id": {p["id"]: p for p in rows},
+        "by_type": by_type,                                # chaque liste triée par Niveau
+        "ordered": sorted(rows, key=cle_niveau),
+        "chaines": chaine_niveaux(rows),                   # {type: chaîne de niveaux}, cf. progression.py
+    }
+    # Niveau de départ des 3 types, fallbacks de get_parcours_levels résolus une fois ici
+    catalog["premiers"] = {t: p for t in TYPES_OPERATION if (p := get_first_parcours(t, catalog))}
+    return catalog
+
+def get_parcours_catalog():
     """
-    S'assure qu'il existe une ligne de Suivi_Parcours pour chacun des 3 types :
-    Addition, Soustraction, Multiplication. Si absente, on insère le Niveau 1.
+    Catalogue Parcours chargé une seule fois par process (TTL + version) :
+    - by_id   : {id: ligne Parcours}
+    - by_type : {Type_Operation: [lignes triées par Niveau]}
+    - ordered : toutes les lignes triées par Niveau
+    - chaines : {Type_Operation: chaîne de niveaux} (suivant / précédent en O(1))
+    - premiers: {type canonique: premier Parcours} pour Addition, Soustraction, Multiplication
     """
-    types = ["Addition", "Soustraction", "Multiplication"]
-    today = datetime.now().strftime("%Y-%m-%d")
+    return _load_parcours_catalog(_parcours_catalog_version()["version"])
 
-    # Récupère des suivis récents pour l'utilisateur
-    suivis = (
-        supabase.table("Suivi_Parcours")
-        .select("id, Parcours_Id")
-        .eq("Users_Id", user_id)
-        .order("id", desc=True)
-        .limit(100)
-        .execute()
-        .data or []
-    )
+def invalidate_parcours_catalog():
+    """À appeler après toute modification de la table Parcours."""
+    _parcours_catalog_version()["version"] += 1
 
-    deja = set()
-    for s in suivis:
-        p = (
-            supabase.table("Parcours")
-            .select("id, Type_Operation")
-            .eq("id", s["Parcours_Id"])
-            .limit(1)
-            .execute()
-            .data
-        )
-        if p:
-            deja.add(p[0]["Type_Operation"])
+def get_parcours(parcours_id, catalog=None):
+    """Ligne Parcours par id (ou None), sans aller-retour réseau."""
+    catalog = catalog or get_parcours_catalog()
+    return catalog["by_id"].get(parcours_id)
 
-    for type_op in types:
-        if type_op in deja:
-            continue
+def get_parcours_type(parcours_id, catalog=None):
+    p = get_parcours(parcours_id, catalog)
+    return p.get("Type_Operation") if p else None
 
-        # Essai strict par valeur canonique
-        first_parcours = (
-            supabase.table("Parcours")
-            .select("id")
-            .eq("Type_Operation", type_op)   # "Addition" / "Soustraction" / "Multiplication"
-            .order("Niveau")
-            .limit(1)
-            .execute()
-            .data
-        )
+def get_parcours_levels(type_operation: str, catalog=None):
+    """
+    Niveaux d'un type triés par Niveau. Reprend les anciens fallbacks :
+    valeur exacte, puis casse/espaces, puis symbole historique (+, -, *).
+    """
+    catalog = catalog or get_parcours_catalog()
+    by_type = catalog["by_type"]
+    if by_type.get(type_operation):
+        return by_type[type_operation]
 
-        # Fallback 1 : casse/espaces (ilike)
-        if not first_parcours:
-            try:
-                first_parcours = (
-                    supabase.table("Parcours")
-                    .select("id")
-                    .ilike("Type_Operation", type_op)  # ilike est tolérant
-                    .order("Niveau")
-                    .limit(1)
-                    .execute()
-                    .data
-                )
-            except Exception:
-                pass
-
-        # Fallback 2 : symboles historiques
-        if not first_parcours:
-            symbol_map = {"Addition": "+", "Soustraction": "-", "Multiplication": "*"}
-            symbol = symbol_map[type_op]
-            first_parcours = (
-                supabase.table("Parcours")
-                .select("id")
-                .eq("Type_Operation", symbol)
-                .order("Niveau")
-                .limit(1)
-                .execute()
-                .data
-            )
+    wanted = type_operation.strip().lower()
+    for t, levels in by_type.items():
+        if isinstance(t, str) and t.strip().lower() == wanted:
+            return levels
 
-        # Fallback 3 : pas de colonne/valeur Niveau -> ordre par id
-        if not first_parcours:
-            first_parcours = (
-                supabase.table("Parcours")
-                .select("id")
-                .ilike("Type_Operation", type_op)
-                .order("id")
-                .limit(1)
-                .execute()
-                .data
-            )
+    symbol = TYPE_SYMBOLS.get(type_operation)
+    return by_type.get(symbol, []) if symbol else []
 
-        if not first_parcours:
-            st.error(f"❌ Aucun Parcours disponible pour {type_op}. Vérifie Type_Operation/Niveau.")
-            continue
+def get_first_parcours(type_operation: str, catalog=None):
+    levels = get_parcours_levels(type_operation, catalog)
+    return levels[0] if levels else None
 
+def get_saut_max() -> int:
+    """
+    Mode saut de niveaux (SAUT_NIVEAUX_MAX dans les secrets) : une progression franchit jusqu'à
+    ce nombre de niveaux si la série de bonnes réponses couvre plusieurs fenêtres. 1 par défaut.
+    """
+    return max(1, int(st.secrets.get("SAUT_NIVEAUX_MAX", SAUT_MAX)))
+
+# --------------------- ACCÈS DONNÉES (PAGINÉ) ---------------------
+
+PAGE_SIZE = 1000        # ne doit pas dépasser le max-rows de PostgREST (1000 par défaut)
+IN_CHUNK_SIZE = 200     # ids par filtre .in_() : garde des URLs courtes
+FETCH_WORKERS = 4       # chunks récupérés en parallèle
+
+# Etat / Correction restent en texte (object) : l'historique contient d'autres valeurs que VRAI/FAUX, OUI/NON.
+OBSERVATION_DTYPES = {
+    "id": "int64",
+    "Entrainement_Id": "int64",
+    "Parcours_Id": "Int64",               # nullable : observations non typées
+    "Score": "float32",                   # REAL dans l'historique (0.5, 1.0), parfois NULL
+    "Temps_Seconds": "float32",
+    "Marge_Erreur": "float32",
+    "Operateur_Un": "Int64",
+    "Operateur_Deux": "Int64",
+}
+
+def _rows_to_frame(rows, columns, dtypes):
+    """Convertit une page de dicts en colonnes typées (la liste de dicts est libérée aussitôt)."""
+    frame = pd.DataFrame.from_records(rows, columns=columns)
+    types = {c: t for c, t in dtypes.items() if c in frame.columns}
+    for c, t in types.items():
+        if pd.api.types.is_float_dtype(pd.api.types.pandas_dtype(t)):
+            frame[c] = pd.to_numeric(frame[c], errors="coerce")      # valeurs non numériques -> NaN
+    return frame.astype(types)
+
+def fetch_keyset(build_query, columns, dtypes=None, after=None):
+    """
+    Pagination par clé sur `id` : build_query() renvoie un builder déjà filtré,
+    on enchaîne .gt("id", dernier_id).order("id").limit(PAGE_SIZE) jusqu'à épuisement.
+    `after` : ne lire que les lignes d'id supérieur (rafraîchissement incrémental).
+    Retourne un DataFrame typé trié par id.
+    """
+    columns = ["id"] + [c for c in columns if c != "id"]
+    dtypes = dtypes or {}
+    frames, last_id = [], after
+    while True:
+        query = build_query()
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        rows = query.order("id").limit(PAGE_SIZE).execute().data or []
+        if rows:
+            last_id = rows[-1]["id"]
+            frames.append(_rows_to_frame(rows, columns, dtypes))
+        if len(rows) < PAGE_SIZE:
+            break
+    if not frames:
+        return _rows_to_frame([], columns, dtypes)
+    return pd.concat(frames, ignore_index=True)
 
-        parcours_id = first_parcours[0]["id"]
-        supabase.table("Suivi_Parcours").insert({
-            "Users_Id": user_id,
-            "Parcours_Id": parcours_id,
-            "Date": today,
-            "Taux_Reussite": 0,
-            "Type_Evolution": "initialisation",
-            "Derniere_Observation_Id": None
-        }).execute()
+def fetch_in_chunks(table, columns, in_column, values, dtypes=None, after=None):
+    """
+    Équivalent de .select(columns).in_(in_column, values) sans limite de taille :
+    ids découpés en chunks (IN_CHUNK_SIZE), chunks paginés par clé et récupérés en parallèle.
+    """
+    values = list(dict.fromkeys(values))
+    chunks = [values[i:i + IN_CHUNK_SIZE] for i in range(0, len(values), IN_CHUNK_SIZE)]
+    select = ", ".join(["id"] + [c for c in columns if c != "id"])
 
-        st.write(f"[DEBUG] Suivi initial créé pour {type_op} (Parcours {parcours_id})")
+    def fetch_chunk(chunk):
+        return fetch_keyset(lambda: supabase.table(table).select(select).in_(in_column, chunk), columns, dtypes, after)
 
-def get_position_actuelle(user_id: int, type_operation: str):
+    if len(chunks) <= 1:
+        frames = [fetch_chunk(chunk) for chunk in chunks]
+    else:
+        with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+            frames = list(pool.map(run_in_context(fetch_chunk), chunks))
+    if not frames:
+        return _rows_to_frame([], ["id"] + [c for c in columns if c != "id"], dtypes or {})
+    return pd.concat(frames, ignore_index=True).sort_values("id", ignore_index=True)
+
+def fetch_observations(entrainement_ids, columns, after=None):
+    """Observations des entraînements donnés (d'id > after), en colonnes typées (cf. OBSERVATION_DTYPES)."""
+    return fetch_in_chunks("Observations", columns, "Entrainement_Id", entrainement_ids, OBSERVATION_DTYPES, after)
+
+# --------------------- HISTORIQUE EN CACHE (SESSION) ---------------------
+
+HISTORIQUE_COLONNES = ["Entrainement_Id", "Etat", "Score", "Temps_Seconds", "Marge_Erreur", "Parcours_Id", "Operation"]
+HISTORIQUE_VERIFICATION_TTL = 30  # secondes entre deux lectures de la version serveur de l'historique
+CUMUL_COLONNES = ["Type_Operation", "Parcours_Id", "Jour", "Nb_Observations", "Nb_Bonnes",
+                  "Score_Total", "Temps_Total", "Marge_Total"]
+CUMUL_DTYPES = {"Parcours_Id": "int64", "Nb_Observations": "int64", "Nb_Bonnes": "int64",
+                "Score_Total": "float64", "Temps_Total": "float64", "Marge_Total": "float64"}
+
+def fetch_par_jour(build_query, columns, dtypes=None, after=None):
     """
-    Retourne la ligne Parcours correspondant AU DERNIER suivi de l'utilisateur
-    pour le type demandé (Addition / Soustraction / Multiplication).
-    Si aucun suivi pour ce type, retourne None.
+    Pagination par jour pour les tables sans id (Cumul_Quotidien) : .gt("Jour", dernier_jour)
+    .order("Jour").limit(PAGE_SIZE). Le dernier jour d'une page pleine est relu en entier à la
+    page suivante (un utilisateur a bien moins de PAGE_SIZE lignes par jour).
     """
-    # On récupère quelques suivis récents et on filtre par type côté Python
-    last_suivi = (
-        supabase.table("Suivi_Parcours")
-        .select("id, Parcours_Id")
+    frames, last_day = [], after
+    while True:
+        query = build_query()
+        if last_day is not None:
+            query = query.gt("Jour", last_day)
+        rows = query.order("Jour").limit(PAGE_SIZE).execute().data or []
+        if len(rows) < PAGE_SIZE:
+            frames.append(_rows_to_frame(rows, columns, dtypes or {}))
+            break
+        complete = [r for r in rows if r["Jour"] != rows[-1]["Jour"]]
+        if not complete:
+            raise RuntimeError(f"Plus de {PAGE_SIZE} lignes pour le jour {rows[-1]['Jour']}")
+        frames.append(_rows_to_frame(complete, columns, dtypes or {}))
+        last_day = complete[-1]["Jour"]
+    return pd.concat(frames, ignore_index=True)
+
+def _refresh_cumuls(cache, user_id):
+    """Cumuls journaliers : relit le dernier jour en cache (il a pu grossir) et les jours suivants."""
+    cumuls = cache["cumuls"]
+    after = None
+    if not cumuls.empty:
+        dernier_jour = cumuls["Jour"].max()
+        cumuls = cumuls[cumuls["Jour"] < dernier_jour]
+        after = (dernier_jour - pd.Timedelta(days=1)).strftime("%Y-%m-%d")
+    nouveaux = fetch_par_jour(
+        lambda: supabase.table("Cumul_Quotidien").select(", ".join(CUMUL_COLONNES)).eq("Users_Id", user_id),
+        CUMUL_COLONNES,
+        CUMUL_DTYPES,
+        after=after,
+    )
+    nouveaux["Jour"] = pd.to_datetime(nouveaux["Jour"], errors="coerce")
+    cache["cumuls"] = pd.concat([cumuls, nouveaux], ignore_index=True) if not cumuls.empty else nouveaux
+
+def _typer_observations(obs, entr_df, catalog):
+    """Colonnes dérivées de l'historique : Type_Operation (catalogue), Date (entraînement), ok."""
+    type_by_pid = {pid: p.get("Type_Operation") for pid, p in catalog["by_id"].items()}
+    obs = obs.merge(entr_df.rename(columns={"id": "Entrainement_Id"}), on="Entrainement_Id", how="left")
+    obs["Type_Operation"] = obs["Parcours_Id"].map(type_by_pid).fillna("Inconnu")
+    obs["Score"] = obs["Score"].fillna(0)
+    obs["ok"] = (obs["Etat"] == "VRAI").astype(int)
+    return obs
+
+def _refresh_brut(brut, user_id):
+    """Ajoute les entraînements et observations d'id supérieur à ceux déjà vus."""
+    new_entr = fetch_keyset(
+        lambda: supabase.table("Entrainement").select("id, Date").eq("Users_Id", user_id),
+        ["id", "Date"],
+        {"id": "int64"},
+        after=brut["max_entr_id"],
+    )
+    if new_entr.empty:
+        return
+    new_entr["Date"] = pd.to_datetime(new_entr["Date"], errors="coerce")
+    new_obs = fetch_observations(new_entr["id"].tolist(), HISTORIQUE_COLONNES, after=brut["max_obs_id"])
+    if not new_obs.empty:
+        new_obs = _typer_observations(new_obs, new_entr, get_parcours_catalog())
+        brut["obs"] = pd.concat([brut["obs"], new_obs], ignore_index=True) if not brut["obs"].empty else new_obs
+        brut["max_obs_id"] = int(new_obs["id"].max())
+    brut["max_entr_id"] = int(new_entr["id"].max())
+
+def _version_historique(user_id: int):
+    """
+    Version serveur de l'historique : dernier "Maj" des cumuls de l'utilisateur (posé par le trigger
+    de sql/006 et par la reconstruction). Voit les écritures des autres process, des scripts et
+    des fonctions de reconstruction, que le registre local ignore.
+    """
+    rows = (
+        supabase.table("Cumul_Quotidien")
+        .select("Maj")
         .eq("Users_Id", user_id)
-        .order("id", desc=True)
-        .limit(20)
+        .order("Maj", desc=True)
+        .limit(1)
         .execute()
-        .data or []
+        .data
     )
-    if not last_suivi:
-        return None
+    return rows[0]["Maj"] if rows else None
 
-    for s in last_suivi:
-        p = (
-            supabase.table("Parcours")
-            .select("*")
-            .eq("id", s["Parcours_Id"])
-            .limit(1)
-            .execute()
-            .data
-        )
-        if p and p[0].get("Type_Operation") == type_operation:
-            return p[0]
+def get_historique(user_id: int, brut: bool = False):
+    """
+    Historique de l'utilisateur gardé dans la session : cumuls journaliers (Cumul_Quotidien),
+    calendrier d'activité et, si `brut`, les observations une à une (chargées à la première demande).
+    Deux clés :
+    - locale : id de la dernière observation enregistrée par ce process pour l'utilisateur
+      (cf. _run_submission) ; si elle bouge, seules les lignes nouvelles sont lues et ajoutées ;
+    - serveur : _version_historique, relue au plus toutes les HISTORIQUE_VERIFICATION_TTL secondes ;
+      si elle bouge sans la clé locale (autre process, reconstruction), tout est relu.
+    Entre deux vérifications, changer un filtre de la page ne fait aucune requête.
+    """
+    cache = st.session_state.get("historique")
+    if cache is None or cache["user_id"] != user_id:
+        cache = {"user_id": user_id, "version": None, "serveur": None, "verifie": None,
+                 "cumuls": pd.DataFrame(), "activite": None, "brut": None}
+        st.session_state.historique = cache
+
+    registry = _submission_registry()
+    with registry["lock"]:
+        version = registry["last_observation"].get(user_id, 0)
+    local = cache["version"] is None or version > cache["version"]
+    maintenant = time.monotonic()
+    serveur = cache["serveur"]
+    if local or maintenant - cache["verifie"] >= HISTORIQUE_VERIFICATION_TTL:
+        # Lue avant les données : une écriture concurrente sera vue à la prochaine vérification
+        serveur = _version_historique(user_id)
+        cache["verifie"] = maintenant
+    if not local and serveur != cache["serveur"]:
+        cache["cumuls"] = pd.DataFrame()
+        if cache["brut"] is not None:
+            cache["brut"] = {"max_entr_id": None, "max_obs_id": None, "obs": pd.DataFrame()}
+    if local or serveur != cache["serveur"]:
+        _refresh_cumuls(cache, user_id)
+        cache["activite"] = get_user_activity(user_id, "Debut, Jours")
+        if cache["brut"] is not None:
+            _refresh_brut(cache["brut"], user_id)
+        cache["version"] = version
+        cache["serveur"] = serveur
+    if brut and cache["brut"] is None:
+        cache["brut"] = {"max_entr_id": None, "max_obs_id": None, "obs": pd.DataFrame()}
+        _refresh_brut(cache["brut"], user_id)
+    return cache
 
-    return None
+# --------------------- STATS & CLASSEMENT ---------------------
 
-def get_user_streak(user_id):
-    entrainements = supabase.table("Entrainement").select("Date").eq("Users_Id", user_id).order("Date", desc=True).execute().data or []
-    dates = [datetime.strptime(e["Date"], "%Y-%m-%d").date() for e in entrainements]
-    if not dates:
-        return 0
-    streak = 1
-    today = datetime.now().date()
-    for i in range(1, len(dates)):
-        if (dates[i-1] - dates[i]).days == 1:
-            streak += 1
-        elif i == 1 and (today - dates[0]).days == 1:
-            streak = 1
-        else:
-            break
-    return streak
+# Suivis initiaux : une ligne Suivi_Parcours par type (premier niveau) est créée à l'inscription.
+# Les comptes qui n'en ont pas (antérieurs, inscription interrompue) sont complétés au premier
+# passage sur l'accueil, une seule fois par process : ensuite l'accueil ne fait plus aucune
+# requête de provisionnement pour cet utilisateur.
 
-def get_user_total_score(user_id: int) -> int:
-    """Retourne le score total cumulé de l'utilisateur via ses observations."""
+@st.cache_resource
+def _provisioned_users():
+    """Utilisateurs dont les 3 suivis initiaux existent (partagé par toutes les sessions du process)."""
+    return {"lock": threading.Lock(), "users": set()}
 
-    # 1️⃣ Récupérer tous les entraînements de l'utilisateur
-    entrainements = (
-        supabase.table("Entrainement")
-        .select("id")
+def provision_initial_suivi(user_id: int, deja=()):
+    """
+    Insère en une requête le suivi initial des types absents de `deja`.
+    Retourne True si les 3 types ont désormais un suivi.
+    """
+    premiers = get_parcours_catalog()["premiers"]
+    today = datetime.now().strftime("%Y-%m-%d")
+    # Position_Actuelle est indexée par le Type_Operation du Parcours (symbole historique possible)
+    manquants = [t for t in TYPES_OPERATION
+                 if t not in deja and (t not in premiers or premiers[t].get("Type_Operation") not in deja)]
+    rows = [{
+        "Users_Id": user_id,
+        "Parcours_Id": premiers[t]["id"],
+        "Date": today,
+        "Taux_Reussite": 0,
+        "Type_Evolution": "initialisation",
+        "Derniere_Observation_Id": None
+    } for t in manquants if t in premiers]
+    if rows:
+        supabase.table("Suivi_Parcours").insert(rows).execute()
+        logger.info("Suivis initiaux créés pour l'utilisateur %s : %s", user_id, [r["Parcours_Id"] for r in rows])
+
+    sans_parcours = [t for t in manquants if t not in premiers]
+    for type_op in sans_parcours:
+        st.error(f"❌ Aucun Parcours disponible pour {type_op}. Vérifie Type_Operation/Niveau.")
+    if not sans_parcours:
+        registry = _provisioned_users()
+        with registry["lock"]:
+            registry["users"].add(user_id)
+    return not sans_parcours
+
+def ensure_initial_suivi(user_id: int):
+    """
+    S'assure qu'il existe une ligne de Suivi_Parcours pour chacun des 3 types : sans requête si
+    c'est déjà vérifié dans ce process, sinon une lecture de Position_Actuelle et au plus une insertion.
+    """
+    if user_id in _provisioned_users()["users"]:
+        return
+    provision_initial_suivi(user_id, set(get_suivis_courants(user_id)))
+
+def get_suivis_courants(user_id: int):
+    """
+    Dernier suivi par type, lu dans la table dénormalisée Position_Actuelle
+    (maintenue par trigger à chaque insertion dans Suivi_Parcours, cf. sql/001_position_actuelle.sql).
+    Retourne {Type_Operation: {"id", "Parcours_Id", "Derniere_Observation_Id"}} en une seule requête.
+    """
+    rows = (
+        supabase.table("Position_Actuelle")
+        .select("Type_Operation, Parcours_Id, Suivi_Id, Derniere_Observation_Id")
         .eq("Users_Id", user_id)
         .execute()
-        .data
+        .data or []
     )
+    return {
+        r["Type_Operation"]: {
+            "id": r["Suivi_Id"],
+            "Parcours_Id": r["Parcours_Id"],
+            "Derniere_Observation_Id": r.get("Derniere_Observation_Id"),
+        }
+        for r in rows
+    }
 
-    if not entrainements:
-        return 0
+def get_positions_actuelles(user_id: int, suivis=None):
+    """
+    Retourne {Type_Operation: ligne Parcours} pour les 3 types en un seul appel.
+    Un type sans suivi est absent du dictionnaire.
+    """
+    if suivis is None:
+        suivis = get_suivis_courants(user_id)
+    catalog = get_parcours_catalog()
+    positions = {}
+    for type_op, s in suivis.items():
+        p = get_parcours(s["Parcours_Id"], catalog)
+        if p:
+            positions[type_op] = p
+    return positions
 
-    entrainement_ids = [e["id"] for e in entrainements]
+def get_position_actuelle(user_id: int, type_operation: str):
+    """
+    Retourne la ligne Parcours correspondant AU DERNIER suivi de l'utilisateur
+    pour le type demandé (Addition / Soustraction / Multiplication).
+    Si aucun suivi pour ce type, retourne None.
+    """
+    return get_positions_actuelles(user_id).get(type_operation)
+
+def get_user_activity(user_id: int, colonnes: str = "Dernier_Jour, Serie_Courante, Serie_Max"):
+    """Ligne Activite_Utilisateur de l'utilisateur (calendrier tenu à jour par trigger, sql/005), ou None."""
+    rows = supabase.table("Activite_Utilisateur").select(colonnes).eq("Users_Id", user_id).limit(1).execute().data
+    return rows[0] if rows else None
 
-    # 2️⃣ Récupérer les scores dans Observation
-    observations = (
-        supabase.table("Observations")
-        .select("Score")
-        .in_("Entrainement_Id", entrainement_ids)
+def get_user_streak(user_id):
+    """(série en cours, record) en jours actifs consécutifs, lus sur le calendrier d'activité."""
+    ligne = get_user_activity(user_id)
+    return activite.serie_actuelle(ligne), (ligne or {}).get("Serie_Max", 0)
+
+def get_user_total_score(user_id: int):
+    """Retourne le score total cumulé de l'utilisateur (compteur Score_Utilisateur, maintenu par trigger)."""
+    rows = (
+        supabase.table("Score_Utilisateur")
+        .select("Score_Total")
+        .eq("Users_Id", user_id)
+        .limit(1)
         .execute()
         .data
     )
+    return rows[0]["Score_Total"] if rows else 0
 
-    if not observations:
-        return 0
-
-    # 3️⃣ Somme des scores
-    return sum(obs.get("Score", 0) for obs in observations)
+def get_fenetres(user_id: int):
+    """Fenêtres de réussite de l'utilisateur, {Parcours_Id: fenêtre} (Fenetre_Reussite, cf. progression.py)."""
+    rows = (
+        supabase.table("Fenetre_Reussite")
+        .select("Parcours_Id, Critere, Depuis_Observation_Id, Nb, Nb_Bonnes, Serie_Bonnes, Etats")
+        .eq("Users_Id", user_id)
+        .execute().data or []
+    )
+    return {
+        r["Parcours_Id"]: {**r, "Etats": json.loads(r["Etats"]) if isinstance(r["Etats"], str) else r["Etats"]}
+        for r in rows
+    }
 
-def analyser_progression(user_id, last_obs_id=None, parcours_id=None, type_operation=None):
+def analyser_progression(user_id, last_obs_id=None, parcours_id=None, type_operation=None, suivi_match=None):
     """
     Analyse et met à jour la progression POUR UN TYPE d'opération donné,
     en ne considérant que les observations rattachées au Parcours_Id courant.
@@ -347,65 +726,33 @@ def analyser_progression(user_id, last_obs_id=None, parcours_id=None, type_opera
     - last_obs_id: int | None  -> id max de l'observation après l'entraînement (peut être None)
     - parcours_id: int | None  -> parcours courant pour ce type (si None, on init niveau 1)
     - type_operation: str      -> "Addition" | "Soustraction" | "Multiplication"
+    - suivi_match: dict | None -> suivi courant de ce type (cf. get_suivis_courants), relu si None
+    Le Suivi_Parcours inséré met à jour Position_Actuelle dans la même transaction (trigger).
+    Les sessions d'entraînement passent par enregistrer_entrainement (sql/004), qui applique les mêmes
+    règles (progression.py) dans sa transaction ; cette version client sert aux analyses hors session.
+    Sans appel st.* (lève en cas d'erreur).
     """
     import math
     from datetime import datetime
 
     if type_operation not in ("Addition", "Soustraction", "Multiplication"):
-        st.error("❌ analyser_progression(): 'type_operation' doit être Addition/Soustraction/Multiplication")
-        return
+        raise ValueError("analyser_progression(): 'type_operation' doit être Addition/Soustraction/Multiplication")
 
-    st.write(f"[DEBUG] Analyse progression pour {type_operation}")
+    logger.debug("Analyse progression pour %s", type_operation)
 
-    # 1) Récupérer le dernier suivi EXISTANT pour CE TYPE (via Parcours -> Type_Operation)
-    last_suivis = (
-        supabase.table("Suivi_Parcours")
-        .select("Parcours_Id,Derniere_Observation_Id,id")
-        .eq("Users_Id", user_id)
-        .order("id", desc=True)
-        .limit(50)
-        .execute().data or []
-    )
-
-    suivi_match = None
-    for s in last_suivis:
-        p = (
-            supabase.table("Parcours")
-            .select("id,Type_Operation")
-            .eq("id", s["Parcours_Id"])
-            .limit(1)
-            .execute().data
-        )
-        if p and p[0]["Type_Operation"] == type_operation:
-            suivi_match = s
-            break
+    # 1) Récupérer le dernier suivi EXISTANT pour CE TYPE (Position_Actuelle)
+    catalog = get_parcours_catalog()
+    if suivi_match is None:
+        suivi_match = get_suivis_courants(user_id).get(type_operation)
 
     # 2) CAS INITIAL: pas de suivi pour ce type -> on pointe sur le 1er niveau de ce type et on insère "initialisation"
     if not suivi_match:
-        st.write(f"[DEBUG] Aucun suivi pour {type_operation} — initialisation")
+        logger.debug("Aucun suivi pour %s — initialisation", type_operation)
         if not parcours_id:
-            first_parcours = (
-                supabase.table("Parcours")
-                .select("id")
-                .eq("Type_Operation", type_operation)
-                .order("Niveau")         # utilise la colonne Niveau si dispo
-                .limit(1)
-                .execute().data
-            )
-            if not first_parcours:
-                # fallback si pas de Niveau/valeurs
-                first_parcours = (
-                    supabase.table("Parcours")
-                    .select("id")
-                    .eq("Type_Operation", type_operation)
-                    .order("id")
-                    .limit(1)
-                    .execute().data
-                )
+            first_parcours = catalog["premiers"].get(type_operation)
             if not first_parcours:
-                st.error(f"❌ Aucun parcours disponible pour {type_operation}")
-                return
-            parcours_id = first_parcours[0]["id"]
+                raise LookupError(f"Aucun parcours disponible pour {type_operation}")
+            parcours_id = first_parcours["id"]
 
         # Première observation existante (si tu veux stocker une référence)
         first_obs = (
@@ -426,7 +773,7 @@ def analyser_progression(user_id, last_obs_id=None, parcours_id=None, type_opera
             "Derniere_Observation_Id": first_obs_id
         }).execute()
 
-        st.write(f"[DEBUG] {type_operation}: suivi initialisé (Parcours {parcours_id})")
+        logger.debug("%s: suivi initialisé (Parcours %s)", type_operation, parcours_id)
         return
 
     # 3) CAS NORMAL: analyser depuis la dernière observation prise en compte pour CE TYPE
@@ -434,74 +781,26 @@ def analyser_progression(user_id, last_obs_id=None, parcours_id=None, type_opera
     last_obs_used = suivi_match["Derniere_Observation_Id"] or 0
 
     # 3.1 Critère du niveau courant
-    parcours_row = (
-        supabase.table("Parcours")
-        .select("Critere, Type_Operation")
-        .eq("id", parcours_id)
-        .limit(1)
-        .execute().data
-    )
+    parcours_row = get_parcours(parcours_id, catalog)
     if not parcours_row:
-        st.error("❌ Parcours introuvable pour l'analyse")
-        return
-    critere = parcours_row[0]["Critere"]
-
-    # 3.2 Nouvelles observations de CE PARCOURS (clé !)
-    # On ne prend que les Observations rattachées à ce Parcours_Id et postérieures au last_obs_used.
-    observations = (
-        supabase.table("Observations")
-        .select("id, Etat")
-        .eq("Parcours_Id", parcours_id)
-        .gt("id", last_obs_used)
-        .order("id")
-        .limit(10000)
-        .execute().data or []
-    )
+        raise LookupError(f"Parcours {parcours_id} introuvable pour l'analyse")
+    critere = parcours_row["Critere"]
 
-    total_obs = len(observations)
-    st.write(f"[DEBUG] {type_operation}: nouvelles obs pour Parcours {parcours_id} = {total_obs}")
+    # 3.2 Fenêtre glissante de CE PARCOURS pour CET utilisateur depuis la dernière décision
+    fenetre = fenetre_courante(get_fenetres(user_id).get(parcours_id), critere, last_obs_used)
+    logger.debug("%s: nouvelles obs pour Parcours %s = %s", type_operation, parcours_id, fenetre["Nb"])
 
-    if total_obs < critere:
-        st.write(f"[DEBUG] {type_operation}: pas assez de données ({total_obs}/{critere}).")
+    # 3.3 Taux sur les 'critere' dernières obs, sans relire l'historique (règles partagées : progression.py)
+    taux = fenetre_taux(fenetre)
+    if taux is None:
+        logger.debug("%s: pas assez de données (%s/%s).", type_operation, fenetre["Nb"], critere)
         return
-
-    # 3.3 Calcul du taux sur les 'critere' dernières obs
-    selection = observations[-critere:]
-    nb_bonnes = sum(1 for obs in selection if obs["Etat"] == "VRAI")
-    taux = round(nb_bonnes / critere, 2)
-    st.write(f"[DEBUG] {type_operation}: taux={taux} sur {critere} obs")
+    logger.debug("%s: taux=%s sur %s obs", type_operation, taux, critere)
 
     # 3.4 Déterminer l'évolution et le prochain parcours (toujours DANS LE MÊME TYPE)
-    evolution = "stagnation"
-    next_parcours_id = parcours_id
-
-    if taux >= 0.95:
-        evolution = "progression"
-        next_row = (
-            supabase.table("Parcours")
-            .select("id")
-            .eq("Type_Operation", type_operation)
-            .gt("id", parcours_id)
-            .order("id")
-            .limit(1)
-            .execute().data
-        )
-        if next_row:
-            next_parcours_id = next_row[0]["id"]
-
-    elif taux < 0.5:
-        evolution = "régression"
-        prev_row = (
-            supabase.table("Parcours")
-            .select("id")
-            .eq("Type_Operation", type_operation)
-            .lt("id", parcours_id)
-            .order("id", desc=True)
-            .limit(1)
-            .execute().data
-        )
-        if prev_row:
-            next_parcours_id = prev_row[0]["id"]
+    evolution = decider_evolution(taux)
+    next_parcours_id = parcours_cible(evolution, parcours_id, catalog["chaines"].get(type_operation),
+                                      niveaux_franchis(fenetre, get_saut_max()))
 
     # 3.5 Enregistrer un nouveau Suivi_Parcours pour CE TYPE
     supabase.table("Suivi_Parcours").insert({
@@ -513,24 +812,27 @@ def analyser_progression(user_id, last_obs_id=None, parcours_id=None, type_opera
         "Derniere_Observation_Id": last_obs_id  # id max observé lors de CET entraînement
     }).execute()
 
-    st.write(f"[DEBUG] {type_operation}: suivi enregistré ({evolution}) — nouveau parcours {next_parcours_id}")
+    logger.debug("%s: suivi enregistré (%s) — nouveau parcours %s", type_operation, evolution, next_parcours_id)
 
 def get_classement(limit=None):
-    users = supabase.table("Users").select("id,name").execute().data or []
-    if not users:
-        return []
-    entrainements = supabase.table("Entrainement").select("id,Users_Id").execute().data or []
-    observations = supabase.table("Observations").select("Score,Entrainement_Id").execute().data or []
-    # Mapping Entrainement -> User
-    e_to_u = {e["id"]: e["Users_Id"] for e in entrainements}
-    scores = {u["id"]: 0 for u in users}
-    for obs in observations:
-        uid = e_to_u.get(obs["Entrainement_Id"])
-        if uid in scores:
-            scores[uid] += obs["Score"]
-    classement = [(u["id"], u["name"], scores[u["id"]]) for u in users]
-    classement.sort(key=lambda x: x[2], reverse=True)
-    return classement[:limit] if limit else classement
+    """
+    Classement lu dans la vue Classement (agrégat Score_Utilisateur maintenu par trigger,
+    cf. sql/002_score_utilisateur.sql). Retourne [(user_id, name, score_total)].
+    """
+    query = (
+        supabase.table("Classement")
+        .select("Users_Id, name, Score_Total")
+        .order("Score_Total", desc=True)
+        .order("Users_Id")
+    )
+    if limit:
+        query = query.limit(limit)
+    rows = query.execute().data or []
+    return [(r["Users_Id"], r["name"], r["Score_Total"]) for r in rows]
+
+def reconcilier_classement() -> int:
+    """Reconstruit Score_Utilisateur depuis les Observations brutes. Retourne le nb de lignes corrigées."""
+    return supabase.rpc("reconcilier_scores_utilisateurs", {}).execute().data or 0
 
 def _infer_type_from_operation(op_str: str) -> str:
     if " + " in op_str or "+" in op_str: return "Addition"
@@ -547,73 +849,276 @@ def load_monstre_mask(path="monstre.png", grid_size=333):
     binary_mask = (arr < 200).astype(np.uint8)
     return binary_mask
 
+MONSTRE_OFF = (30, 30, 30)     # pixel éteint
+MONSTRE_ON = (180, 0, 255)     # pixel allumé
+MONSTRE_SEED = 42
+
+def monstre_mask_key(mask) -> str:
+    """Empreinte du masque, utilisée comme clé des caches de rendu."""
+    return hashlib.sha1(mask.tobytes() + str(mask.shape).encode()).hexdigest()
+
+@st.cache_resource(show_spinner=False)
+def _monstre_activation_order(mask_key: str, _mask):
+    """
+    Ordre d'allumage des pixels (indices linéaires int32), calculé une seule fois par masque.
+    Même ordre que l'ancien argwhere + np.random.seed(42) + shuffle.
+    """
+    order = np.flatnonzero(_mask == 1)
+    order = order[np.random.RandomState(MONSTRE_SEED).permutation(order.size)]
+    return order.astype(np.int32)
+
+@st.cache_resource(show_spinner=False)
+def _monstre_background(mask_key: str, grid_size: int):
+    """Fond pré-alloué (pixels éteints), aplati en (N, 3), copié à chaque rendu."""
+    base = np.empty((grid_size * grid_size, 3), dtype=np.uint8)
+    base[:] = MONSTRE_OFF
+    return base
+
+# Images PIL pleine taille (~1,3 Mo chacune) : quelques-unes seulement ; le cache d'octets
+# encodés (_encoded_monstre_frame) fait l'essentiel, et l'ordre d'allumage suffit à reconstruire une frame.
+MONSTRE_FRAME_CACHE_MAX = 16
+
+@st.cache_resource(show_spinner=False, max_entries=MONSTRE_FRAME_CACHE_MAX)
+def _render_monstre_frame(mask_key: str, score: int, _mask):
+    grid_size = _mask.shape[0]
+    order = _monstre_activation_order(mask_key, _mask)
+    frame = _monstre_background(mask_key, grid_size).copy()
+    frame[order[:score]] = MONSTRE_ON                       # une seule affectation vectorisée
+    img = Image.fromarray(frame.reshape(grid_size, grid_size, 3))
+    return img.resize((grid_size*2, grid_size*2), Image.NEAREST)
+
 def render_monstre_progress(score, mask):
-    grid_size = mask.shape[0]
-    total_pixels = int(mask.sum())
-    score = min(score, total_pixels)
-    coords = np.argwhere(mask == 1)
-    np.random.seed(42)
-    np.random.shuffle(coords)
-    activated = coords[:score]
-    img = np.zeros((grid_size, grid_size, 3), dtype=np.uint8)
-    img[:, :] = [30, 30, 30]
-    for y, x in activated:
-        img[y, x] = [180, 0, 255]
-    img = Image.fromarray(img).resize((grid_size*2, grid_size*2), Image.NEAREST)
-    return img
+    """Image du monstre avec `score` pixels allumés (frames mises en cache par (masque, score))."""
+    mask_key = monstre_mask_key(mask)
+    total_pixels = _monstre_activation_order(mask_key, mask).size
+    score = max(0, min(int(score), total_pixels))
+    return _render_monstre_frame(mask_key, score, mask)
+
+THUMB_SIZE = 50   # vignettes du classement (px)
+
+@st.cache_resource(show_spinner=False)
+def _monstre_block_index(mask_key: str, size: int, _mask):
+    """
+    Pour une vignette de `size` x `size` px : le pixel (y, x) du masque tombe dans le bloc
+    (y * size // hauteur, x * size // largeur), donc size blocs par côté, de 1 px d'écart au plus.
+    Retourne (bloc de chaque pixel du masque dans l'ordre d'allumage, nombre de pixels de chaque bloc).
+    """
+    height, width = _mask.shape
+    rows = np.arange(height) * size // height
+    cols = np.arange(width) * size // width
+    block_of_pixel = (rows[:, None] * size + cols[None, :]).ravel().astype(np.int32)
+    area = np.bincount(block_of_pixel, minlength=size * size)
+    order = _monstre_activation_order(mask_key, _mask)
+    return block_of_pixel[order], area
+
+def _render_monstre_thumbnail(mask_key: str, score: int, size: int, _mask):
+    """
+    Vignette rendue directement à la taille cible par agrégation par blocs :
+    la couleur d'un bloc est la moyenne de ses pixels (équivalent d'un box filter).
+    """
+    block_of_rank, area = _monstre_block_index(mask_key, size, _mask)
+    lit = np.bincount(block_of_rank[:score], minlength=size * size)
+    alpha = (lit / np.maximum(area, 1))[:, None]
+    off = np.array(MONSTRE_OFF, dtype=np.float32)
+    on = np.array(MONSTRE_ON, dtype=np.float32)
+    rgb = (off + alpha * (on - off)).round().astype(np.uint8).reshape(size, size, 3)
+    return Image.fromarray(rgb)
+
+# --------------------- CACHE D'IMAGES MONSTRE ---------------------
+
+# Frames encodées une seule fois : LRU mémoire (st.cache_resource) + disque dans static/monstres,
+# servi par Streamlit sur app/static/... (server.enableStaticServing, cf. .streamlit/config.toml).
+# Les noms de fichiers sont dérivés du contenu : une URL ne change jamais de contenu, le navigateur
+# peut garder l'image en cache (ETag/Last-Modified ; voir la config pour Cache-Control immutable).
+# Le disque est borné : au-delà de FRAME_DISK_MAX_FILES fichiers, les moins récemment utilisés
+# (mtime, rafraîchi à chaque relecture) sont supprimés ; une URL disparue retombe sur les octets.
+FRAME_CACHE_MAX = 256
+FRAME_DISK_MAX_FILES = 2000     # fichiers gardés dans static/monstres
+FRAME_SWEEP_EVERY = 50          # écritures entre deux balayages du dossier
+FRAME_DISK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "monstres")
+FRAME_STATIC_URL = "app/static/monstres"
+# Sprites du classement : un nouveau fichier à chaque changement de score du top 10, dossier
+# à part avec son propre plafond pour ne pas chasser les frames
+SPRITE_DISK_MAX_FILES = 200
+FRAME_FORMATS = {"PNG": "png", "WEBP": "webp"}
+
+def monstre_frame_key(mask_key: str, score, size: int, fmt: str, mode: str = "full") -> str:
+    """Clé de contenu d'une frame : (empreinte du masque, score, taille, format, mode de rendu)."""
+    return hashlib.sha1(f"{mask_key}:{score}:{size}:{fmt}:{mode}".encode()).hexdigest()[:24]
+
+def _frame_disk_path(frame_key: str, fmt: str, subdir: str = "") -> str:
+    return os.path.join(FRAME_DISK_DIR, subdir, f"{frame_key}.{FRAME_FORMATS[fmt]}")
+
+@st.cache_resource
+def _disk_writes():
+    """Écritures par dossier depuis le dernier balayage (partagé par tout le process)."""
+    return {"lock": threading.Lock(), "count": {}}
+
+def _sweep_disk(directory: str, max_files: int):
+    """Ne garde que les `max_files` fichiers les plus récemment utilisés (10 % de marge sous le plafond)."""
+    try:
+        entries = [e for e in os.scandir(directory) if e.is_file() and not e.name.endswith(".tmp")]
+        if len(entries) <= max_files:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+    except OSError:
+        return
+    for entry in entries[:len(entries) - max_files * 9 // 10]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass  # déjà supprimé par un autre process
+
+def _encode_and_store(img, path: str, fmt: str, max_files: int = FRAME_DISK_MAX_FILES) -> bytes:
+    buf = io.BytesIO()
+    img.save(buf, format=fmt, **({"lossless": True} if fmt == "WEBP" else {}))
+    data = buf.getvalue()
+
+    # Écriture atomique : un autre process peut servir le fichier en même temps
+    directory = os.path.dirname(path)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except OSError:
+        return data  # le tier disque est optionnel
+
+    writes = _disk_writes()
+    with writes["lock"]:
+        n = writes["count"][directory] = writes["count"].get(directory, 0) + 1
+        if n >= FRAME_SWEEP_EVERY:
+            writes["count"][directory] = 0
+    if n >= FRAME_SWEEP_EVERY:
+        _sweep_disk(directory, max_files)
+    return data
+
+def _read_stored(path: str):
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        os.utime(path)             # utilisé : reste en tête de l'ordre LRU du balayage
+        return data
+    except OSError:
+        return None
+
+def _static_url(path: str):
+    relative = os.path.relpath(path, FRAME_DISK_DIR).replace(os.sep, "/")
+    return f"{FRAME_STATIC_URL}/{relative}" if os.path.exists(path) else None
+
+def _clamp_score(score, mask_key: str, mask) -> int:
+    total_pixels = _monstre_activation_order(mask_key, mask).size
+    return max(0, min(int(score), total_pixels))
+
+@st.cache_resource(show_spinner=False, max_entries=FRAME_CACHE_MAX)
+def _encoded_monstre_frame(frame_key: str, fmt: str, size: int, score: int, mode: str, mask_key: str, _mask) -> bytes:
+    path = _frame_disk_path(frame_key, fmt)
+    data = _read_stored(path)
+    if data is not None:
+        return data
+
+    if mode == "thumb":
+        img = _render_monstre_thumbnail(mask_key, score, size, _mask)
+    else:
+        img = _render_monstre_frame(mask_key, score, _mask)
+        if img.size != (size, size):
+            img = img.resize((size, size), Image.NEAREST)
+    return _encode_and_store(img, path, fmt)
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def _encoded_monstre_sprite(sprite_key: str, fmt: str, size: int, scores: tuple, mask_key: str, _mask) -> bytes:
+    path = _frame_disk_path(sprite_key, fmt, "sprites")
+    data = _read_stored(path)
+    if data is not None:
+        return data
+
+    sprite = Image.new("RGB", (size, size * max(1, len(scores))), MONSTRE_OFF)
+    for i, score in enumerate(scores):
+        sprite.paste(_render_monstre_thumbnail(mask_key, score, size, _mask), (0, i * size))
+    return _encode_and_store(sprite, path, fmt, SPRITE_DISK_MAX_FILES)
+
+def _check_format(fmt: str) -> str:
+    fmt = fmt.upper()
+    if fmt not in FRAME_FORMATS:
+        raise ValueError(f"Format d'image non supporté : {fmt}")
+    return fmt
+
+@traced("render")
+def get_monstre_frame(score, mask, size=None, fmt="PNG", mode="full"):
+    """
+    Frame encodée du monstre. Retourne (bytes, url) ; url vaut None si le fichier
+    n'a pas pu être écrit sur disque.
+    mode="thumb" rend directement à `size` px par agrégation par blocs (vignettes).
+    """
+    fmt = _check_format(fmt)
+    mask_key = monstre_mask_key(mask)
+    score = _clamp_score(score, mask_key, mask)
+    size = int(size or (THUMB_SIZE if mode == "thumb" else mask.shape[0] * 2))
+
+    frame_key = monstre_frame_key(mask_key, score, size, fmt, mode)
+    data = _encoded_monstre_frame(frame_key, fmt, size, score, mode, mask_key, mask)
+    return data, _static_url(_frame_disk_path(frame_key, fmt))
+
+@traced("render")
+def get_monstre_sprite(scores, mask, size=THUMB_SIZE, fmt="PNG"):
+    """
+    Toutes les vignettes en une seule image (empilées verticalement, `size` px chacune),
+    donc un seul encodage pour tout le classement. Retourne (bytes, url).
+    """
+    fmt = _check_format(fmt)
+    mask_key = monstre_mask_key(mask)
+    scores = tuple(_clamp_score(score, mask_key, mask) for score in scores)
+
+    sprite_key = monstre_frame_key(mask_key, ",".join(map(str, scores)), size, fmt, "sprite")
+    data = _encoded_monstre_sprite(sprite_key, fmt, size, scores, mask_key, mask)
+    return data, _static_url(_frame_disk_path(sprite_key, fmt, "sprites"))
+
+def show_monstre(score, mask, caption=None, width=None, size=None, fmt="PNG", mode="full"):
+    """
+    Affiche le monstre depuis le cache d'images. Avec le static serving activé, l'image est
+    référencée par URL (le navigateur réutilise sa copie) ; sinon on passe les octets déjà
+    encodés à st.image, sans ré-encodage.
+    """
+    data, url = get_monstre_frame(score, mask, size=size, fmt=fmt, mode=mode)
+    if url and st.get_option("server.enableStaticServing"):
+        style = f"width:{width}px" if width else "width:100%"
+        legend = f'<figcaption style="text-align:center;font-size:0.8em;opacity:0.7">{caption}</figcaption>' if caption else ""
+        st.markdown(
+            f'<figure style="margin:0"><img src="{url}" style="{style};image-rendering:pixelated">{legend}</figure>',
+            unsafe_allow_html=True,
+        )
+    elif width:
+        st.image(data, caption=caption, width=width)
+    else:
+        st.image(data, caption=caption, use_container_width=True)
 
 # --------------------- GPT QCM ---------------------
 
-def generate_mental_calculation(user_id: int, nb_questions_per_type: int):
+def generate_mental_calculation(user_id: int, nb_questions_per_type: int, seed=None, positions=None):
     """
     Génère nb_questions_per_type additions, soustractions et multiplications
     en fonction du parcours actuel de l'utilisateur pour chaque type d'opération.
-    Retourne une liste mélangée de questions, chaque question = {operation, solution}.
+    Retourne un jeu de questions mélangées, en colonnes (cf. questions.py) ;
+    lire une question avec question(jeu, i). La graine est conservée dans le jeu.
+    positions: {type: ligne Parcours} déjà connues (sinon relues via Position_Actuelle).
     """
-    all_questions = []
+    if positions is None:
+        positions = get_positions_actuelles(user_id)
 
-    # On gère les 3 types séparément
-    for type_op in ["Addition", "Soustraction", "Multiplication"]:
-        # Récupère la position actuelle pour ce type
-        parcours_info = get_position_actuelle(user_id, type_op)
+    bornes_par_type = {}
+    for type_op in TYPES_OPERATION:
+        parcours_info = positions.get(type_op)
         if not parcours_info:
-            st.error(f"❌ Aucun parcours disponible pour {type_op}")
+            logger.error("Aucun parcours disponible pour %s (utilisateur %s)", type_op, user_id)
             continue
+        bornes_par_type[type_op] = bornes_parcours(parcours_info)
 
-        op1_min = parcours_info.get("Operateur1_Min", 0)
-        op1_max = parcours_info.get("Operateur1_Max", 10)
-        op2_min = parcours_info.get("Operateur2_Min", 0)
-        op2_max = parcours_info.get("Operateur2_Max", 10)
-
-        # Génération des N questions pour ce type
-        for _ in range(nb_questions_per_type):
-            a = random.randint(op1_min, op1_max)
-            b = random.randint(op2_min, op2_max)
-
-            if type_op == "Addition":
-                op_str = f"{a} + {b}"
-                sol = a + b
-            elif type_op == "Soustraction":
-                if a < b:
-                    a, b = b, a
-                op_str = f"{a} - {b}"
-                sol = a - b
-            elif type_op == "Multiplication":
-                op_str = f"{a} * {b}"
-                sol = a * b
-            else:
-                continue
-
-            all_questions.append({
-                "operation": op_str,
-                "solution": sol,
-                "type_operation": type_op
-            })
-
-    # Mélanger toutes les questions pour ne pas grouper par type
-    random.shuffle(all_questions)
-    st.write(f"DEBUG: Total questions générées = {len(all_questions)}")
-    return all_questions
+    jeu = generer_questions(bornes_par_type, nb_questions_per_type,
+                            seed=nouvelle_graine() if seed is None else seed)
+    jeu["types_absents"] = [t for t in TYPES_OPERATION if t not in bornes_par_type]
+    logger.debug("Total questions générées = %s (graine %s)", nb_questions(jeu), jeu["seed"])
+    return jeu
 
 def save_mental_exercise(exo, parcours_id):
     """
@@ -643,135 +1148,320 @@ def _infer_type_from_operation(op_str: str) -> str:
     if " * " in op_str or "*" in op_str: return "Multiplication"
     return "Addition"
 
-def log_responses_to_supabase():
-    st.write("DEBUG: log_responses_to_supabase appelée")
-    if st.session_state.get("responses_logged", False):
-        return
+# --------------------- ENREGISTREMENT EN ARRIÈRE-PLAN ---------------------
 
-    now = datetime.now()
-    user_id = st.session_state.user["id"]
-    answers = st.session_state.answers
+SUBMISSION_WORKERS = 4          # enregistrements traités en parallèle par process
+SUBMISSION_MAX_ATTEMPTS = 3     # tentatives de l'appel enregistrer_entrainement
+SUBMISSION_RETRY_DELAY = 0.5    # secondes, doublé à chaque nouvelle tentative
+SUBMISSION_HISTORY = 500        # nb de statuts terminés conservés
 
-    # 1) Regrouper les réponses par type d'opération
-    grouped_entries = {"Addition": [], "Soustraction": [], "Multiplication": []}
-    for entry in answers:
-        op_str = entry["question"]
-        t = entry.get("type_operation") or _infer_type_from_operation(op_str)
-        if t in grouped_entries:
-            grouped_entries[t].append(entry)
-
-    # 2) Récupérer la position courante (Parcours_Id) par type
-    parcours_by_type = {}
-    for t in ["Addition", "Soustraction", "Multiplication"]:
-        pos = get_position_actuelle(user_id, t)
-        parcours_by_type[t] = pos["id"] if pos else None
-
-    # 3) Créer un Entrainement par type (avec le bon Parcours_Id + Volume du type)
-    entrainement_ids_by_type = {}
-    for t, entries in grouped_entries.items():
-        if not entries:
-            continue
-
-        pid = parcours_by_type.get(t)
-        if not pid:
-            st.warning(f"⚠️ Aucun Parcours_Id trouvé pour {t}, entraînement non créé pour ce type.")
-            continue
+@st.cache_resource
+def _submission_pool():
+    """Pool partagé par tout le process : une session enregistrée par worker."""
+    return ThreadPoolExecutor(max_workers=SUBMISSION_WORKERS, thread_name_prefix="pixel-submit")
 
-        resp = supabase.table("Entrainement").insert({
-            "Users_Id": user_id,
-            "Date": now.strftime("%Y-%m-%d"),
-            "Time": now.strftime("%H:%M"),
-            "Volume": len(entries),     # volume spécifique à ce type
-            "Parcours_Id": pid          # ✅ toujours renseigné
-        }).execute()
+@st.cache_resource
+def _submission_registry():
+    """
+    Statuts des enregistrements, indexés par clé d'idempotence (une par session d'entraînement),
+    et id de la dernière observation enregistrée par utilisateur (invalide get_historique).
+    """
+    return {"lock": threading.Lock(), "jobs": {}, "last_observation": {}}
 
-        if not resp.data:
-            st.error(f"❌ Impossible de créer un entraînement {t} dans Supabase")
-            continue
+def _group_answers_by_type(answers):
+    grouped = {"Addition": [], "Soustraction": [], "Multiplication": []}
+    for entry in answers:
+        t = entry.get("type_operation") or _infer_type_from_operation(entry["question"])
+        if t in grouped:
+            grouped[t].append(entry)
+    return grouped
+
+def _build_observation_rows(entries):
+    """Observations d'un type ; Entrainement_Id et Parcours_Id sont fixés côté serveur."""
+    rows = []
+    for entry in entries:
+        op_str = entry["question"]
+        is_correct = entry["is_correct"]
+        first_try_correction = entry.get("first_try_correction", False)
 
-        entrainement_ids_by_type[t] = resp.data[0]["id"]
+        score = 1 if (is_correct or first_try_correction) else -1
+        etat = "VRAI" if (is_correct or first_try_correction) else "FAUX"
+        correction = "OUI" if entry.get("corrected", False) else "NON"
 
-    # Si aucun entraînement n'a été créé (ex: pas de réponses), on sort
-    if not entrainement_ids_by_type:
-        st.warning("⚠️ Aucun entraînement créé (pas de réponses ou pas de parcours).")
-        return
+        temps_seconds = int(entry.get("elapsed", 0))
+        marge_erreur = int(entry.get("error_margin", 0))
 
-    # 4) Construire et insérer les Observations en les rattachant au bon Entrainement_Id et Parcours_Id
-    observations_data = []
-    for t, entries in grouped_entries.items():
-        if not entries or t not in entrainement_ids_by_type:
-            continue
+        try:
+            parts = op_str.split()
+            operateur_un = int(parts[0]); operateur_deux = int(parts[2])
+        except Exception:
+            operateur_un = None; operateur_deux = None
+
+        rows.append({
+            "Operateur_Un": operateur_un,
+            "Operateur_Deux": operateur_deux,
+            "Operation": op_str,
+            "Etat": etat,
+            "Correction": correction,
+            "Score": score,
+            "Temps_Seconds": temps_seconds,
+            "Marge_Erreur": marge_erreur
+        })
+    return rows
 
-        entrainement_id = entrainement_ids_by_type[t]
-        parcours_id_for_obs = parcours_by_type.get(t)
+def _with_retries(step, description):
+    """Exécute step() avec SUBMISSION_MAX_ATTEMPTS tentatives et un délai exponentiel."""
+    for attempt in range(1, SUBMISSION_MAX_ATTEMPTS + 1):
+        try:
+            return step()
+        except Exception:
+            if attempt == SUBMISSION_MAX_ATTEMPTS:
+                raise
+            logger.warning("%s : tentative %s/%s échouée", description, attempt, SUBMISSION_MAX_ATTEMPTS, exc_info=True)
+            time.sleep(SUBMISSION_RETRY_DELAY * 2 ** (attempt - 1))
+
+@traced_job("submission")
+def _run_submission(job, user_id, grouped_entries, now, saut_max=SAUT_MAX):
+    """
+    Un seul aller-retour : enregistrer_entrainement (sql/004) écrit Entrainement, Observations et
+    Suivi_Parcours de tous les types dans UNE transaction. Tout ou rien ; la clé d'idempotence
+    rend les nouvelles tentatives sans risque (un résultat déjà enregistré est simplement renvoyé).
+    """
+    job["state"] = "running"
+    for status in job["types"].values():
+        status["state"] = "running"
+    payload = {
+        "p_user_id": user_id,
+        "p_cle": job["key"],
+        "p_date": now.strftime("%Y-%m-%d"),
+        "p_heure": now.strftime("%H:%M"),
+        "p_observations": {t: _build_observation_rows(entries) for t, entries in grouped_entries.items() if entries},
+    }
+    if saut_max > 1:
+        payload["p_saut_max"] = saut_max            # paramètre de sql/004 depuis sql/008
+    try:
+        resultat = _with_retries(
+            lambda: supabase.rpc("enregistrer_entrainement", payload).execute().data,
+            f"Enregistrement {job['key']}",
+        )
+        job["warnings"].extend(resultat.get("avertissements") or [])
+        for t, status in job["types"].items():
+            detail = (resultat.get("types") or {}).get(t)
+            if detail is None:
+                status["state"] = "skipped"
+                continue
+            status.update(
+                state="done",
+                entrainement_id=detail["entrainement_id"],
+                last_obs_id=max(detail["observation_ids"] or [0]) or None,
+                evolution=detail["evolution"],
+                parcours_id=detail["nouveau_parcours_id"],
+            )
+        derniere = max((i for d in (resultat.get("types") or {}).values() for i in d["observation_ids"] or []), default=0)
+        registry = _submission_registry()
+        with registry["lock"]:
+            registry["last_observation"][user_id] = max(registry["last_observation"].get(user_id, 0), derniere)
+        job["state"] = "done"
+    except Exception as e:
+        logger.exception("Enregistrement %s impossible", job["key"])
+        job["state"] = "failed"
+        job["error"] = str(e)
+        for status in job["types"].values():
+            status["state"] = "failed"
+    finally:
+        job["finished_at"] = time.time()
+
+def submit_responses(user_id, answers, submission_key):
+    """
+    Confie l'enregistrement d'une session aux workers et rend la main immédiatement.
+    Idempotent : une même clé (double clic, rerun) ne lance qu'un seul enregistrement.
+    """
+    registry = _submission_registry()
+    with registry["lock"]:
+        job = registry["jobs"].get(submission_key)
+        if job is not None:
+            return job
+
+        grouped_entries = _group_answers_by_type(answers)
+        job = {
+            "key": submission_key,
+            "user_id": user_id,
+            "state": "pending",
+            "error": None,
+            "warnings": [],
+            "types": {t: {"state": "pending"} for t, entries in grouped_entries.items() if entries},
+            "submitted_at": time.time(),
+            "finished_at": None,
+        }
+        if not job["types"]:
+            job["state"] = "done"
+            job["warnings"].append("Aucun entraînement créé (pas de réponses).")
+            job["finished_at"] = time.time()
+        registry["jobs"][submission_key] = job
+
+        finished = [k for k, j in registry["jobs"].items() if j["finished_at"]]
+        for k in finished[:max(0, len(finished) - SUBMISSION_HISTORY)]:
+            registry["jobs"].pop(k, None)
+
+    if job["state"] == "pending":
+        _submission_pool().submit(_run_submission, job, user_id, grouped_entries, datetime.now(), get_saut_max())
+    return job
+
+def get_submission_status(submission_key):
+    """Statut d'un enregistrement (copie) : state = pending | running | done | failed, ou None si inconnu."""
+    job = _submission_registry()["jobs"].get(submission_key)
+    if job is None:
+        return None
+    return {**job, "types": {t: dict(s) for t, s in job["types"].items()}, "warnings": list(job["warnings"])}
 
-        for entry in entries:
-            op_str = entry["question"]
-            is_correct = entry["is_correct"]
-            first_try_correction = entry.get("first_try_correction", False)
+def wait_for_submission(submission_key, timeout=30.0):
+    """Attend la fin d'un enregistrement (au plus `timeout` secondes) et retourne son statut."""
+    deadline = time.time() + timeout
+    status = get_submission_status(submission_key)
+    while status and status["state"] in ("pending", "running") and time.time() < deadline:
+        time.sleep(0.1)
+        status = get_submission_status(submission_key)
+    return status
 
-            score = 1 if (is_correct or first_try_correction) else -1
-            etat = "VRAI" if (is_correct or first_try_correction) else "FAUX"
-            correction = "OUI" if entry.get("corrected", False) else "NON"
+def log_responses_to_supabase():
+    """Enregistre la session courante en arrière-plan (non bloquant, une seule fois par session)."""
+    if st.session_state.get("responses_logged", False):
+        return
 
-            temps_seconds = int(entry.get("elapsed", 0))
-            marge_erreur = int(entry.get("error_margin", 0))
+    user_id = st.session_state.user["id"]
+    answers = [dict(a) for a in st.session_state.get("answers", [])]
+    submission_key = st.session_state.get("submission_key") or uuid.uuid4().hex
 
-            try:
-                parts = op_str.split()
-                operateur_un = int(parts[0]); operateur_deux = int(parts[2])
-            except Exception:
-                operateur_un = None; operateur_deux = None
-
-            observations_data.append({
-                "Entrainement_Id": entrainement_id,   # ✅ clé vers le bon entraînement (par type)
-                "Parcours_Id": parcours_id_for_obs,   # ✅ niveau de ce type
-                "Operateur_Un": operateur_un,
-                "Operateur_Deux": operateur_deux,
-                "Operation": op_str,
-                "Etat": etat,
-                "Correction": correction,
-                "Score": score,
-                "Temps_Seconds": temps_seconds,
-                "Marge_Erreur": marge_erreur
-            })
+    submit_responses(user_id, answers, submission_key)
+    st.session_state.pending_submission = submission_key
+    st.session_state.responses_logged = True
 
-    if observations_data:
-        supabase.table("Observations").insert(observations_data).execute()
-    else:
-        st.warning("⚠️ Aucune observation à insérer")
+@st.fragment(run_every=1.0)
+def submission_status_panel():
+    """Affiche l'état de l'enregistrement en cours ; relance la page entière quand il est terminé."""
+    key = st.session_state.get("pending_submission")
+    status = get_submission_status(key) if key else None
+    if status is None:
+        st.session_state.pop("pending_submission", None)
         return
 
-    # 5) Progression par type : on récupère l'ID max des observations du type (via l'Entrainement_Id du type)
-    for t, entrainement_id in entrainement_ids_by_type.items():
-        # Sanity: s'il n'y a pas eu d'observations pour ce type, on skip
-        if not grouped_entries.get(t):
-            continue
-
-        last_obs_row = (
-            supabase.table("Observations")
-            .select("id")
-            .eq("Entrainement_Id", entrainement_id)
-            .order("id", desc=True)
-            .limit(1)
-            .execute().data
-        )
-        last_obs_id = last_obs_row[0]["id"] if last_obs_row else None
+    if status["state"] in ("pending", "running"):
+        st.caption("⏳ Enregistrement de l'entraînement en cours…")
+        return
 
-        # Parcours courant pour ce type (peut avoir évolué entre temps mais on garde la cohérence)
-        p = get_position_actuelle(user_id, t)
-        parcours_id = p["id"] if p else parcours_by_type.get(t)
+    st.session_state.pop("pending_submission", None)
+    st.session_state.submission_report = status
+    st.rerun()
 
-        try:
-            analyser_progression(user_id, last_obs_id, parcours_id, t)
-        except Exception as e:
-            st.warning(f"⚠️ Analyse de progression impossible pour {t} : {e}")
+def show_submission_report():
+    """Avertissements / erreurs du dernier enregistrement terminé (affichés une fois)."""
+    status = st.session_state.pop("submission_report", None)
+    if not status:
+        return
+    for warning in status["warnings"]:
+        st.warning(f"⚠️ {warning}")
+    if status["state"] == "failed":
+        errors = [f"{t} : {s['error']}" for t, s in status["types"].items() if s.get("error")]
+        if status.get("error"):
+            errors.append(status["error"])
+        st.error("❌ Enregistrement de l'entraînement impossible — " + " ; ".join(errors))
+
+# --------------------- PRÉPARATION DE LA SESSION SUIVANTE ---------------------
+# Pendant que l'utilisateur lit ses résultats / ses corrections, la session suivante est
+# préparée en arrière-plan, sur les niveaux qu'enregistrer_entrainement va écrire (prédits
+# avec les mêmes règles, cf. progression.py). Au lancement suivant, les niveaux réellement
+# écrits (statut de l'enregistrement, en mémoire) valident la préparation : aucun aller-retour.
+
+PREFETCH_WORKERS = 2
+
+@st.cache_resource
+def _prefetch_pool():
+    return ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="pixel-prefetch")
+
+def _predire_positions(user_id, grouped_entries, suivis, catalog, saut_max=SAUT_MAX):
+    """Niveaux {type: Parcours_Id} après enregistrement de la session (mêmes règles que sql/004)."""
+    positions = {}
+    fenetres = get_fenetres(user_id) if any(grouped_entries.values()) else {}
+    for type_op, suivi in suivis.items():
+        parcours_id = suivi["Parcours_Id"]
+        entries = grouped_entries.get(type_op) or []
+        parcours_row = get_parcours(parcours_id, catalog)
+        if entries and parcours_row:
+            fenetre = fenetre_courante(fenetres.get(parcours_id), parcours_row["Critere"], suivi["Derniere_Observation_Id"])
+            for row in _build_observation_rows(entries):
+                fenetre_ajouter(fenetre, row["Etat"])
+            taux = fenetre_taux(fenetre)
+            if taux is not None:
+                parcours_id = parcours_cible(decider_evolution(taux), parcours_id, catalog["chaines"].get(type_op),
+                                             niveaux_franchis(fenetre, saut_max))
+        positions[type_op] = parcours_id
+    return positions
+
+def _positions_rows(parcours_ids, catalog):
+    return {t: row for t, pid in parcours_ids.items() if (row := get_parcours(pid, catalog))}
+
+@traced_job("prefetch")
+def _prepare_next_session(user_id, answers, nb_par_type, version, saut_max=SAUT_MAX):
+    catalog = get_parcours_catalog()
+    suivis = get_suivis_courants(user_id)
+    positions = _predire_positions(user_id, _group_answers_by_type(answers), suivis, catalog, saut_max)
+    return {
+        "version": version,
+        "avant": {t: s["Parcours_Id"] for t, s in suivis.items()},
+        "positions": positions,
+        "jeu": generate_mental_calculation(user_id, nb_par_type, positions=_positions_rows(positions, catalog)),
+    }
+
+def prepare_next_session():
+    """Lance (une fois par session d'entraînement) la préparation de la session suivante."""
+    submission_key = st.session_state.get("submission_key")
+    prepared = st.session_state.get("prepared_session")
+    if not submission_key or (prepared and prepared["submission_key"] == submission_key):
+        return
+    if st.session_state.get("responses_logged", False):
+        return  # déjà enregistrée : les niveaux lus ne seraient plus ceux d'avant la session
+    user_id = st.session_state.user["id"]
+    st.session_state.prepared_session = {
+        "submission_key": submission_key,
+        "user_id": user_id,
+        "future": _prefetch_pool().submit(
+            _prepare_next_session, user_id, [dict(a) for a in st.session_state.get("answers", [])],
+            st.session_state.get("nb_questions", 5), _parcours_catalog_version()["version"], get_saut_max(),
+        ),
+    }
+
+def take_prepared_session(user_id, nb_par_type):
+    """
+    Jeu de questions préparé, si les niveaux prédits sont ceux réellement enregistrés ; sinon None.
+    Si seuls le nombre de questions ou un niveau diffèrent, le jeu est régénéré localement
+    (catalogue en cache, niveaux connus par le statut d'enregistrement) : toujours sans aller-retour.
+    """
+    prepared = st.session_state.pop("prepared_session", None)
+    if not prepared or prepared["user_id"] != user_id or not prepared["future"].done():
+        return None
+    try:
+        result = prepared["future"].result()
+    except Exception:
+        logger.warning("Préparation de la session suivante impossible", exc_info=True)
+        return None
+    if result["version"] != _parcours_catalog_version()["version"]:
+        return None  # catalogue modifié depuis : niveaux à relire
 
-    st.session_state.responses_logged = True
+    status = get_submission_status(prepared["submission_key"])
+    if not status or status["state"] != "done":
+        return None
+    positions = dict(result["avant"])
+    positions.update({t: s["parcours_id"] for t, s in status["types"].items() if s.get("state") == "done"})
 
+    jeu = result["jeu"]
+    if positions == result["positions"] and nb_questions(jeu) == nb_par_type * (len(TYPES_OPERATION) - len(jeu["types_absents"])):
+        return jeu
+    logger.debug("Session préparée invalidée (niveaux %s, prédits %s)", positions, result["positions"])
+    return generate_mental_calculation(user_id, nb_par_type, positions=_positions_rows(positions, get_parcours_catalog()))
 
 # --------------------- PAGES ---------------------
 
+@traced("page")
 def home_page():
     user = st.session_state.get("user")
     if not user:
@@ -791,16 +1481,20 @@ def home_page():
 
     # Stats globales
     total_score = get_user_total_score(user_id)
-    streak = get_user_streak(user_id)
+    streak, record = get_user_streak(user_id)
 
     # Header
     st.title(f"Bienvenue, {user.get('name','Utilisateur')} 👋")
 
+    # Enregistrement du dernier entraînement (en arrière-plan)
+    show_submission_report()
+    if st.session_state.get("pending_submission"):
+        submission_status_panel()
+
     # Pixel en haut
     try:
         mask = load_monstre_mask("monstre.png")
-        pixel_image = render_monstre_progress(int(total_score), mask)
-        st.image(pixel_image, caption=f"{total_score} / {mask.sum()} pixels allumés", use_container_width=True)
+        show_monstre(int(total_score), mask, caption=f"{total_score} / {mask.sum()} pixels allumés")
     except Exception as e:
         st.warning(f"Impossible d'afficher le monstre : {e}")
 
@@ -825,66 +1519,43 @@ def home_page():
     # Petit pied de page
     st.markdown("### ")
     c1, c2 = st.columns(2)
-    c1.metric("🔥 Série (jours)", streak)
+    c1.metric("🔥 Série (jours)", streak, help=f"Record : {record} jour(s)")
     c2.metric("🏆 Score cumulé", total_score)
 
     st.markdown("---")
     if st.button("Se déconnecter"):
+        close_session()
         st.session_state.clear()
         st.session_state.page = "login"
 
 def _get_scores_by_type(user_id: int):
     """
-    Additionne Observations.Score par type d'opération pour l'utilisateur.
+    Score par type d'opération pour l'utilisateur, lu dans les compteurs Score_Type_Utilisateur
+    (maintenus à l'insertion des Observations, cf. sql/003_score_type_utilisateur.sql).
     Ne compte QUE les observations rattachées à un Parcours_Id (donc typées).
     """
-    # 1) Tous les entraînements de l'utilisateur
-    entr_rows = (
-        supabase.table("Entrainement")
-        .select("id")
+    rows = (
+        supabase.table("Score_Type_Utilisateur")
+        .select("Type_Operation, Score_Total")
         .eq("Users_Id", user_id)
         .execute()
         .data or []
     )
-    if not entr_rows:
-        return {"Addition": 0, "Soustraction": 0, "Multiplication": 0}
-    entr_ids = [e["id"] for e in entr_rows]
-
-    # 2) Observations avec leurs Parcours_Id
-    obs_rows = (
-        supabase.table("Observations")
-        .select("Score,Parcours_Id")
-        .in_("Entrainement_Id", entr_ids)
-        .execute()
-        .data or []
-    )
-
-    # Filtrer celles qui n'ont pas (encore) de Parcours_Id
-    obs_rows = [o for o in obs_rows if o.get("Parcours_Id")]
-
-    if not obs_rows:
-        return {"Addition": 0, "Soustraction": 0, "Multiplication": 0}
-
-    # 3) Charger les types pour ces Parcours_Id
-    pids = sorted({o["Parcours_Id"] for o in obs_rows})
-    p_rows = (
-        supabase.table("Parcours")
-        .select("id,Type_Operation")
-        .in_("id", pids)
-        .execute()
-        .data or []
-    )
-    type_by_pid = {p["id"]: p["Type_Operation"] for p in p_rows}
-
-    # 4) Agréger par type
     out = {"Addition": 0, "Soustraction": 0, "Multiplication": 0}
-    for o in obs_rows:
-        t = type_by_pid.get(o["Parcours_Id"])
-        if t in out:
-            out[t] += o.get("Score", 0)
-
+    for r in rows:
+        if r["Type_Operation"] in out:
+            out[r["Type_Operation"]] = r["Score_Total"]
     return out
 
+def verifier_scores_par_type():
+    """Lignes dont les compteurs divergent des Observations brutes (liste vide si tout est cohérent)."""
+    return supabase.rpc("verifier_scores_par_type", {}).execute().data or []
+
+def reconcilier_scores_par_type() -> int:
+    """Reconstruit Score_Type_Utilisateur depuis les Observations. Retourne le nb de lignes corrigées."""
+    return supabase.rpc("reconcilier_scores_par_type", {}).execute().data or 0
+
+@traced("page")
 def training_lobby_page():
     user = st.session_state.get("user")
     if not user:
@@ -895,9 +1566,10 @@ def training_lobby_page():
     st.title("Préparer l'entraînement")
 
     # Positions actuelles par type
-    pos_add = get_position_actuelle(user_id, "Addition")
-    pos_sou = get_position_actuelle(user_id, "Soustraction")
-    pos_mul = get_position_actuelle(user_id, "Multiplication")
+    positions = get_positions_actuelles(user_id)
+    pos_add = positions.get("Addition")
+    pos_sou = positions.get("Soustraction")
+    pos_mul = positions.get("Multiplication")
 
     niveau_add = pos_add.get("Niveau") if pos_add else "—"
     niveau_sou = pos_sou.get("Niveau") if pos_sou else "—"
@@ -933,6 +1605,7 @@ def training_lobby_page():
         st.session_state.page = "home"
         st.rerun()
 
+@traced("page")
 def mental_calc_page():
     st.title("Entraînement de calcul mental 🔢")
 
@@ -942,29 +1615,53 @@ def mental_calc_page():
         st.session_state.page = "login"
         st.stop()
 
-    nb_questions = st.session_state.get("nb_questions", 5)
+    nb_par_type = st.session_state.get("nb_questions", 5)
 
     # 1) Init de la session d'entraînement
-    if "questions" not in st.session_state or not st.session_state.questions:
-        questions = generate_mental_calculation(user_id, nb_questions)
+    if not nb_questions(st.session_state.get("questions")):
+        # Les niveaux dépendent de l'entraînement précédent : on attend qu'il soit enregistré
+        pending = st.session_state.get("pending_submission")
+        if pending:
+            with st.spinner("Enregistrement de l'entraînement précédent…"):
+                st.session_state.submission_report = wait_for_submission(pending)
+            st.session_state.pop("pending_submission", None)
+        questions = take_prepared_session(user_id, nb_par_type)
+        if questions is None:
+            questions = generate_mental_calculation(user_id, nb_par_type)
+        for type_op in questions["types_absents"]:
+            st.error(f"❌ Aucun parcours disponible pour {type_op}")
         st.session_state.questions = questions
         st.session_state.current_q = 0
         st.session_state.answers = []
         st.session_state.correct = 0
         st.session_state.score = 0
         st.session_state.q_start = time.time()  # ← départ chrono
+        st.session_state.setdefault("submission_key", uuid.uuid4().hex)
 
     questions = st.session_state.questions
+    total = nb_questions(questions)
     q_index = st.session_state.current_q
 
     # 2) Fin → page résultats
-    if q_index >= len(questions):
+    if q_index >= total:
         st.session_state.page = "result"
         st.rerun()
         return
 
-    q = questions[q_index]
-    st.subheader(f"Question {q_index + 1} / {len(questions)}")
+    # 3) Session jouée dans le navigateur : une seule interaction serveur à la fin
+    if st.secrets.get("QUIZ_RUNNER", "component") == "component":
+        answers = quiz_runner(questions, nonce=st.session_state.submission_key,
+                              key=f"quiz_{st.session_state.submission_key}")
+        if answers is not None:
+            st.session_state.answers = answers
+            st.session_state.current_q = total
+            st.session_state.page = "result"
+            st.rerun()
+        return
+
+    # 3 bis) Mode classique (QUIZ_RUNNER = "classic") : un rerun par réponse
+    q = question(questions, q_index)
+    st.subheader(f"Question {q_index + 1} / {total}")
     st.markdown(f"**{q['operation']} = ?**")
 
     # 3) Chronomètre (se met à jour à chaque re-run)
@@ -1002,8 +1699,10 @@ def mental_calc_page():
         st.session_state.q_start = time.time()     # ← reset chrono
         st.rerun()
 
+@traced("page")
 def result_page():
     import math
+    prepare_next_session()
     st.markdown("""
     <style>
       .wrap {max-width: 640px; margin: 0 auto;}
@@ -1157,8 +1856,10 @@ def result_page():
 
     st.markdown('</div>', unsafe_allow_html=True)
 
+@traced("page")
 def correction_page():
     st.title("Correction interactive des erreurs 🛠️")
+    prepare_next_session()
 
     # 1️⃣ Initialisation de l'état de correction
     if "correction_index" not in st.session_state:
@@ -1232,6 +1933,7 @@ def correction_page():
             st.session_state.page = "home"
             st.rerun()
 
+@traced("page")
 def progression_page():
     import pandas as pd
 
@@ -1256,69 +1958,19 @@ def progression_page():
     with c3:
         kpi = st.selectbox("KPI", ["Score net", "Taux de Réussite", "Marge d'erreur", "Temps par op."], index=0)
 
-    # ----------------- Chargement data -----------------
-    entr_rows = (
-        supabase.table("Entrainement")
-        .select("id, Date")
-        .eq("Users_Id", user_id)
-        .order("id")
-        .execute().data or []
-    )
-    if not entr_rows:
-        st.info("Aucun entraînement à analyser.")
-        return
-
-    entr_df = pd.DataFrame(entr_rows)
-    entr_df["Date"] = pd.to_datetime(entr_df["Date"], errors="coerce")
-    entr_ids = entr_df["id"].tolist()
-
-    obs_rows = (
-        supabase.table("Observations")
-        .select("Entrainement_Id, Etat, Score, Temps_Seconds, Marge_Erreur, Parcours_Id, Operation")
-        .in_("Entrainement_Id", entr_ids)
-        .execute().data or []
-    )
-    if not obs_rows:
-        st.info("Aucune observation pour ces entraînements.")
+    # ----------------- Chargement data (cache de session, cf. get_historique) -----------------
+    historique = get_historique(user_id, brut=(axe == "Observations"))
+    cumuls = historique["cumuls"]
+    if cumuls.empty:
+        st.info("Aucune observation à analyser.")
         return
 
-    obs_all = pd.DataFrame(obs_rows)
-
-    # Typage via Parcours
-    if "Parcours_Id" in obs_all.columns:
-        pids = sorted({pid for pid in pd.Series(obs_all["Parcours_Id"]).dropna().tolist() if pid is not None})
-    else:
-        pids = []
-    type_by_pid = {}
-    if pids:
-        p_rows = (
-            supabase.table("Parcours")
-            .select("id, Type_Operation")
-            .in_("id", pids)
-            .execute().data or []
-        )
-        type_by_pid = {p["id"]: p["Type_Operation"] for p in p_rows}
-    obs_all["Type_Operation"] = obs_all["Parcours_Id"].map(type_by_pid).fillna("Inconnu")
-
-    # Merge dates d'entraînement
-    obs_all = obs_all.merge(entr_df.rename(columns={"id": "Entrainement_Id"}), on="Entrainement_Id", how="left")
-
-    # Cast numeric / flags
-    obs_all["Temps_Seconds"] = pd.to_numeric(obs_all["Temps_Seconds"], errors="coerce")
-    obs_all["Marge_Erreur"]  = pd.to_numeric(obs_all["Marge_Erreur"],  errors="coerce")
-    obs_all["Score"]         = pd.to_numeric(obs_all["Score"],         errors="coerce").fillna(0)
-    obs_all["ok"]            = (obs_all["Etat"] == "VRAI").astype(int)
-    obs_all["Date"]          = pd.to_datetime(obs_all["Date"], errors="coerce")
-
-    # ✅ Historique GLOBAL pour le tableau du bas (indépendant des filtres)
-    obs_all_full = obs_all.copy()
-
     # ----------------- Filtre opération & fenêtre (pour graph + régularité uniquement) -----------------
     # Filtre opération
     if op_choice != "Mixte":
-        obs_op = obs_all_full[obs_all_full["Type_Operation"] == op_choice]
+        cumuls_op = cumuls[cumuls["Type_Operation"] == op_choice]
     else:
-        obs_op = obs_all_full
+        cumuls_op = cumuls
 
     # Fenêtre temporelle
     today = pd.Timestamp.today().normalize()
@@ -1329,43 +1981,48 @@ def progression_page():
     elif fenetre_label == "Ce mois-ci":
         start = today.replace(day=1)
     else:  # "Max"
-        start = entr_df["Date"].min().normalize()
+        start = cumuls["Jour"].min().normalize()
 
-    # Données de la FENÊTRE (pour le graphique + régularité)
-    obs = obs_op[(obs_op["Date"] >= start) & (obs_op["Date"] <= today)]
+    # Cumuls journaliers de la FENÊTRE (pour le graphique + régularité)
+    fenetre = cumuls_op[(cumuls_op["Jour"] >= start) & (cumuls_op["Jour"] <= today)]
 
     # ----------------- Axe & KPI cumulées (sur la fenêtre) -----------------
-    if not obs.empty:
-        if axe == "Entraînements":
-            base = (
-                obs.groupby(["Entrainement_Id", "Date"])
-                .agg(
-                    score=("Score", "sum"),
-                    bonnes=("ok", "sum"),
-                    total=("ok", "count"),
-                    temps=("Temps_Seconds", "mean"),
-                    marge=("Marge_Erreur", "mean"),
-                )
-                .reset_index()
-                .sort_values("Date")
+    if axe == "Entraînements":
+        # Un point par jour d'entraînement, depuis les cumuls journaliers
+        base = (
+            fenetre.groupby("Jour")
+            .agg(
+                score=("Score_Total", "sum"),
+                bonnes=("Nb_Bonnes", "sum"),
+                total=("Nb_Observations", "sum"),
+                temps=("Temps_Total", "sum"),
+                marge=("Marge_Total", "sum"),
             )
-            score_col = "score"
-        else:
-            base = obs[["Date", "Score", "ok", "Temps_Seconds", "Marge_Erreur"]].copy()
-            base = base.rename(columns={"ok": "bonnes", "Temps_Seconds": "temps", "Marge_Erreur": "marge"})
-            base["total"] = 1
-            base = base.sort_values("Date").reset_index(drop=True)
-            score_col = "Score"
-
-        # Cumuls
-        base["cum_score"]  = base[score_col].cumsum()
+            .sort_index()
+            .reset_index(drop=True)
+        )
+    else:
+        # Un point par observation : seul cas qui lit les lignes brutes
+        obs = historique["brut"]["obs"]
+        if not obs.empty:
+            if op_choice != "Mixte":
+                obs = obs[obs["Type_Operation"] == op_choice]
+            obs = obs[(obs["Date"] >= start) & (obs["Date"] <= today)]
+        base = (
+            obs.reindex(columns=["Score", "ok", "Temps_Seconds", "Marge_Erreur"])
+            .rename(columns={"Score": "score", "ok": "bonnes", "Temps_Seconds": "temps", "Marge_Erreur": "marge"})
+            .reset_index(drop=True)
+        )
+        base["total"] = 1
+
+    if not base.empty:
+        # Cumuls (temps et marge : moyennes par observation depuis le début de la fenêtre)
+        base["cum_score"]  = base["score"].cumsum()
         base["cum_bonnes"] = base["bonnes"].cumsum()
         base["cum_total"]  = base["total"].cumsum()
         base["cum_taux"]   = (base["cum_bonnes"] / base["cum_total"] * 100)
-
-        idx = pd.Series(range(1, len(base) + 1), index=base.index).astype(float)
-        base["cum_temps"]  = (pd.to_numeric(base.get("temps", 0), errors="coerce").fillna(0).cumsum() / idx)
-        base["cum_marge"]  = (pd.to_numeric(base.get("marge", 0), errors="coerce").fillna(0).cumsum() / idx)
+        base["cum_temps"]  = pd.to_numeric(base["temps"], errors="coerce").fillna(0).cumsum() / base["cum_total"]
+        base["cum_marge"]  = pd.to_numeric(base["marge"], errors="coerce").fillna(0).cumsum() / base["cum_total"]
 
         # Choix KPI (cumulée)
         if kpi == "Score net":
@@ -1382,6 +2039,8 @@ def progression_page():
         chart_df = base[["Point", "KPI"]].set_index("Point")
 
         st.subheader(f"Évolution — {kpi} (axe: {axe}, fenêtre: {fenetre_label})")
+        if axe == "Entraînements":
+            st.caption("Un point par jour d'entraînement.")
         if chart_df.shape[0] >= 2:
             st.line_chart(chart_df, height=260)
         elif chart_df.shape[0] == 1:
@@ -1405,27 +2064,18 @@ def progression_page():
     st.subheader("Régularité")
     days = pd.date_range(start, today, freq="D")
 
-    if not obs.empty:
-        obs_per_day = (
-            obs.groupby(obs["Date"].dt.normalize())
-            .size()
-            .reindex(days, fill_value=0)
-            .rename("Observations")
-        )
+    if op_choice == "Mixte":
+        # Tranche du calendrier d'activité ; la série tient compte des jours avant la fenêtre
+        compteurs, series = activite.fenetre(historique["activite"], start.date(), today.date())
     else:
-        obs_per_day = pd.Series(0, index=days, name="Observations")
+        compteurs = fenetre.groupby("Jour")["Nb_Observations"].sum().reindex(days, fill_value=0).to_numpy()
+        series = activite.series(compteurs)
+    obs_per_day = pd.Series(compteurs, index=days, name="Observations")
 
     st.caption("Observations par jour")
     st.bar_chart(obs_per_day, height=160)
 
-    streak_vals, cur = [], 0
-    for v in obs_per_day.values:
-        if v > 0:
-            cur += 1
-        else:
-            cur = 0
-        streak_vals.append(cur)
-    streak = pd.Series(streak_vals, index=days, name="Streak")
+    streak = pd.Series(series, index=days, name="Streak")
     st.caption("Évolution de la série (jours consécutifs actifs)")
     st.line_chart(streak.to_frame(), height=160)
 
@@ -1434,62 +2084,60 @@ def progression_page():
     # ----------------- État actuel par niveau (GLOBAL, indépendant des filtres) -----------------
     st.subheader("État actuel par niveau")
 
-    if obs_all_full.empty:
-        st.info("Aucune observation enregistrée pour l’instant.")
-    else:
-        # 1) Agréger toutes les observations par niveau (Parcours_Id)
-        per_pid = (
-            obs_all_full
-            .dropna(subset=["Parcours_Id"])
-            .groupby("Parcours_Id")
-            .agg(
-                Volume=("ok", "count"),                     # nb d'observations
-                Taux_reussite=("ok", "mean"),               # % de VRAI
-                Temps_s=("Temps_Seconds", "mean"),          # temps moyen (s)
-                Marge=("Marge_Erreur", "mean"),             # marge moyenne
-            )
-            .reset_index()
+    # 1) Agréger les cumuls par niveau (Parcours_Id 0 : observations non rattachées)
+    per_pid = (
+        cumuls[cumuls["Parcours_Id"] != 0]
+        .groupby("Parcours_Id")
+        .agg(
+            Volume=("Nb_Observations", "sum"),               # nb d'observations
+            Bonnes=("Nb_Bonnes", "sum"),
+            Temps=("Temps_Total", "sum"),
+            Marge_Totale=("Marge_Total", "sum"),
         )
+        .reset_index()
+    )
 
-        if per_pid.empty:
-            st.info("Aucune observation rattachée à un niveau.")
-        else:
-            # 2) Récupérer les métadonnées des niveaux
-            pids = per_pid["Parcours_Id"].tolist()
-            pmeta = (
-                supabase.table("Parcours")
-                .select("id, Niveau, Type_Operation")
-                .in_("id", pids)
-                .execute().data or []
-            )
-            import pandas as pd
-            pmeta_df = pd.DataFrame(pmeta)
-
-            # 3) Merge et formatage final
-            df_state = (
-                per_pid.merge(pmeta_df, left_on="Parcours_Id", right_on="id", how="left")
-                .rename(columns={
-                    "Type_Operation": "Opération",
-                    "Niveau": "Niveau",
-                    "Taux_reussite": "Taux de Réussite",
-                    "Temps_s": "Temps (s)",
-                    "Marge": "Marge d'erreur",
-                })
-            )
+    if per_pid.empty:
+        st.info("Aucune observation rattachée à un niveau.")
+    else:
+        per_pid["Taux_reussite"] = per_pid["Bonnes"] / per_pid["Volume"]     # % de VRAI
+        per_pid["Temps_s"] = per_pid["Temps"] / per_pid["Volume"]            # temps moyen (s)
+        per_pid["Marge"] = per_pid["Marge_Totale"] / per_pid["Volume"]       # marge moyenne
+
+        # 2) Récupérer les métadonnées des niveaux
+        pids = per_pid["Parcours_Id"].tolist()
+        pmeta = [
+            {"id": pid, "Niveau": p.get("Niveau"), "Type_Operation": p.get("Type_Operation")}
+            for pid in pids if (p := get_parcours(pid))
+        ]
+        pmeta_df = pd.DataFrame(pmeta, columns=["id", "Niveau", "Type_Operation"])
+
+        # 3) Merge et formatage final
+        df_state = (
+            per_pid.merge(pmeta_df, left_on="Parcours_Id", right_on="id", how="left")
+            .rename(columns={
+                "Type_Operation": "Opération",
+                "Niveau": "Niveau",
+                "Taux_reussite": "Taux de Réussite",
+                "Temps_s": "Temps (s)",
+                "Marge": "Marge d'erreur",
+            })
+        )
 
-            # Arrondis / formats
-            df_state["Taux de Réussite"] = (df_state["Taux de Réussite"] * 100).round(0).astype("Int64")
-            df_state["Temps (s)"] = pd.to_numeric(df_state["Temps (s)"], errors="coerce").round(2)
-            df_state["Marge d'erreur"] = pd.to_numeric(df_state["Marge d'erreur"], errors="coerce").round(2)
+        # Arrondis / formats
+        df_state["Taux de Réussite"] = (df_state["Taux de Réussite"] * 100).round(0).astype("Int64")
+        df_state["Temps (s)"] = pd.to_numeric(df_state["Temps (s)"], errors="coerce").round(2)
+        df_state["Marge d'erreur"] = pd.to_numeric(df_state["Marge d'erreur"], errors="coerce").round(2)
 
-            # Colonnes et tri (comme sur ta maquette)
-            df_state = df_state[["Niveau", "Opération", "Volume", "Taux de Réussite", "Temps (s)", "Marge d'erreur"]]
-            # (si Niveau est numérique, le tri sera correct ; sinon on peut caster en numeric)
-            df_state = df_state.sort_values(["Opération", "Niveau"], ascending=[True, True])
+        # Colonnes et tri (comme sur ta maquette)
+        df_state = df_state[["Niveau", "Opération", "Volume", "Taux de Réussite", "Temps (s)", "Marge d'erreur"]]
+        # (si Niveau est numérique, le tri sera correct ; sinon on peut caster en numeric)
+        df_state = df_state.sort_values(["Opération", "Niveau"], ascending=[True, True])
 
-            # 4) Affichage
-            st.dataframe(df_state, use_container_width=True, hide_index=True)
+        # 4) Affichage
+        st.dataframe(df_state, use_container_width=True, hide_index=True)
 
+@traced("page")
 def classement_page():
     st.title("🏆 Classement des Pixel-Monstres")
     top_players = get_classement(limit=10)
@@ -1497,6 +2145,18 @@ def classement_page():
         st.info("Aucun joueur pour le moment.")
         return
 
+    # Vignettes : une seule image (sprite) pour tout le top si le static serving est actif
+    try:
+        mask = load_monstre_mask("monstre.png")
+    except Exception:
+        mask = None
+    sprite_url = None
+    if mask is not None and st.get_option("server.enableStaticServing"):
+        try:
+            _, sprite_url = get_monstre_sprite([score for _, _, score in top_players], mask, size=THUMB_SIZE)
+        except Exception:
+            sprite_url = None
+
     for i, (user_id, name, total_score) in enumerate(top_players, start=1):
         col1, col2, col3, col4 = st.columns([1, 3, 2, 2])
         with col1:
@@ -1506,30 +2166,68 @@ def classement_page():
         with col3:
             st.markdown(f"{total_score} pts")
         with col4:
+            if sprite_url:
+                st.markdown(
+                    f'<div style="width:{THUMB_SIZE}px;height:{THUMB_SIZE}px;'
+                    f'background:url({sprite_url}) 0 -{(i - 1) * THUMB_SIZE}px no-repeat"></div>',
+                    unsafe_allow_html=True,
+                )
+                continue
             try:
-                mask = load_monstre_mask("monstre.png")
-                pixel_image = render_monstre_progress(int(total_score), mask)
-                st.image(pixel_image, width=50)
+                show_monstre(int(total_score), mask, width=THUMB_SIZE, mode="thumb")
             except Exception:
                 st.text("❌")
 
+# --------------------- PANNEAU DÉVELOPPEUR ---------------------
+
+TRACE_HISTORY = 10   # traces de reruns conservées pour le panneau
+
+def _remember_trace(root):
+    traces = st.session_state.setdefault("_traces", [])
+    traces.append(root)
+    del traces[:-TRACE_HISTORY]
+
+def dev_overlay():
+    """Traces des derniers reruns, pools HTTP et santé des services (DEV_OVERLAY = true dans les secrets)."""
+    with st.sidebar.expander("🛠️ Traces", expanded=False):
+        for root in reversed(st.session_state.get("_traces", [])):
+            st.markdown(f"**{root.name}** — {root.duration_ms} ms, {root.round_trips()} aller(s)-retour(s)"
+                        + (f" _(interrompu : {root.attrs['interrupted']})_" if root.attrs.get("interrupted") else ""))
+            st.dataframe(pd.DataFrame([
+                {"span": "  " * depth + s.name, "kind": s.kind, "ms": s.duration_ms,
+                 "détail": ", ".join(f"{k}={v}" for k, v in s.attrs.items() if k != "interrupted")}
+                for depth, s in root.flatten() if depth
+            ]), hide_index=True, width="stretch")
+        st.json({"pools": client_pool_metrics(), "santé": check_clients_health(include_openai=True)}, expanded=False)
+
 # --------------------- NAVIGATION ---------------------
 
-if st.session_state.page == "login":
-    login_page()
-elif st.session_state.page == "signup":
-    signup_page()
-elif st.session_state.page == "home":
-    home_page()
-elif st.session_state.page == "mental_calc":
-    mental_calc_page()
-elif st.session_state.page == "result":
-    result_page()
-elif st.session_state.page == "correction":
-    correction_page()
-elif st.session_state.page == "classement":
-    classement_page()
-elif st.session_state.page == "training_lobby":
-    training_lobby_page()
-elif st.session_state.page == "progression":
-    progression_page()
+if st.session_state.user is None:
+    restore_session()
+
+rerun_trace = trace_root(f"rerun:{st.session_state.page}", user_id=st.session_state.get("user_id"))
+try:
+    with rerun_trace:
+        if st.session_state.page == "login":
+            login_page()
+        elif st.session_state.page == "signup":
+            signup_page()
+        elif st.session_state.page == "home":
+            home_page()
+        elif st.session_state.page == "mental_calc":
+            mental_calc_page()
+        elif st.session_state.page == "result":
+            result_page()
+        elif st.session_state.page == "correction":
+            correction_page()
+        elif st.session_state.page == "classement":
+            classement_page()
+        elif st.session_state.page == "training_lobby":
+            training_lobby_page()
+        elif st.session_state.page == "progression":
+            progression_page()
+finally:
+    _remember_trace(rerun_trace.span)
+
+if st.secrets.get("DEV_OVERLAY", False):
+    dev_overlay()
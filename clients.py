@@ -0,0 +1,91 @@
+"""
+Clients HTTP partagés (Supabase, OpenAI) : un pool de connexions keep-alive par service.
+
+Streamlit relance le script à chaque interaction : recréer les clients à chaque rerun coûtait
+une poignée de main TCP + TLS par requête. Les clients sont construits ici une fois par process
+(cf. get_supabase_client / get_openai_client dans calcul_pixel.py, sous st.cache_resource) et
+partagent un transport qui compte les connexions ouvertes et réutilisées.
+"""
+
+import threading
+import time
+
+import httpx
+
+from tracing import span
+
+HTTP_TIMEOUT = httpx.Timeout(10.0, connect=5.0)   # lecture/écriture/pool : 10 s, connexion : 5 s
+OPENAI_TIMEOUT = httpx.Timeout(60.0, connect=5.0)  # les complétions sont plus longues
+HTTP_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60.0)
+HTTP_RETRIES = 1                                   # nouvelle tentative de connexion (pas de requête)
+
+
+class MeteredTransport(httpx.HTTPTransport):
+    """Transport httpx standard qui compte requêtes et connexions créées (taux de réutilisation)."""
+
+    def __init__(self, trace_kind="http", **kwargs):
+        super().__init__(**kwargs)
+        self.trace_kind = trace_kind
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections_created = 0
+        create_connection = self._pool.create_connection
+
+        def counting_create_connection(origin):
+            with self._lock:
+                self.connections_created += 1
+            return create_connection(origin)
+
+        self._pool.create_connection = counting_create_connection
+
+    def handle_request(self, request):
+        with self._lock:
+            self.requests += 1
+        with span(f"{request.method} {request.url.host}", self.trace_kind, path=request.url.path) as s:
+            response = super().handle_request(request)
+            s.attrs["status"] = response.status_code
+            return response
+
+    def metrics(self) -> dict:
+        connections = list(self._pool.connections)
+        idle = sum(1 for c in connections if c.is_idle())
+        with self._lock:
+            requests, created = self.requests, self.connections_created
+        return {
+            "requests": requests,
+            "connections_created": created,
+            "in_use": len(connections) - idle,
+            "idle": idle,
+            "reuse_rate": round(1 - created / requests, 3) if requests else None,
+        }
+
+
+def create_http_client(timeout=HTTP_TIMEOUT, limits=HTTP_LIMITS, headers=None, trace_kind="http") -> httpx.Client:
+    """Client httpx keep-alive, avec timeouts et limites de pool explicites (appels tracés en `trace_kind`)."""
+    return httpx.Client(
+        transport=MeteredTransport(trace_kind=trace_kind, limits=limits, retries=HTTP_RETRIES),
+        timeout=timeout,
+        headers=headers,
+        follow_redirects=True,
+    )
+
+
+def pool_metrics(http_client: httpx.Client) -> dict:
+    transport = getattr(http_client, "_transport", None)
+    return transport.metrics() if isinstance(transport, MeteredTransport) else {}
+
+
+def check_health(name: str, probe) -> dict:
+    """Exécute probe() et mesure sa latence ; ne lève jamais."""
+    start = time.perf_counter()
+    try:
+        probe()
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return {
+        "service": name,
+        "ok": error is None,
+        "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+        "error": error,
+    }
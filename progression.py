@@ -0,0 +1,133 @@
+"""
+Règles de progression dans le parcours (sans accès aux données).
+
+Partagées par analyser_progression (calcul_pixel.py) et par l'équivalent SQLite
+de la fonction serveur enregistrer_entrainement (storage.py) ; la version
+plpgsql (sql/004_enregistrer_entrainement.sql) applique les mêmes seuils.
+
+Fenêtre glissante (table Fenetre_Reussite, sql/007) : pour un (utilisateur, Parcours), les
+`Critere` derniers états depuis la dernière décision, dans un tampon circulaire, et le nombre
+de bonnes réponses parmi eux. Ajouter un état et lire le taux sont en O(1), sans relire
+l'historique ; fenetre_taux(f) == taux_reussite(états depuis la décision, critere).
+"Serie_Bonnes" compte les bonnes réponses consécutives en cours depuis la décision.
+
+Chaîne de niveaux : pour chaque Type_Operation, les Parcours triés par Niveau (puis id), avec
+le rang de chaque id. Construite une fois avec le catalogue ; niveau suivant, précédent ou
+premier en O(1), sans requête Parcours. Mode saut (saut_max > 1) : une progression franchit
+un niveau par fenêtre complète sans erreur dans la série en cours, au plus saut_max.
+Vérification sur historiques aléatoires : python -m bench.check_fenetre
+"""
+
+SEUIL_PROGRESSION = 0.95   # taux >= seuil -> niveau suivant
+SEUIL_REGRESSION = 0.5     # taux <  seuil -> niveau précédent
+SAUT_MAX = 1               # niveaux franchis au plus par progression (1 : mode saut désactivé)
+
+
+def cle_niveau(p: dict):
+    """Clé de tri équivalente à .order("Niveau") (valeurs manquantes en dernier, puis id)."""
+    niveau = p.get("Niveau")
+    try:
+        return (0, float(niveau), "", p["id"])
+    except (TypeError, ValueError):
+        return (1 if niveau is not None else 2, 0.0, str(niveau or ""), p["id"])
+
+
+def chaine_niveaux(parcours) -> dict:
+    """{Type_Operation: {"ids": [ids triés par Niveau], "rang": {id: position}}} depuis les lignes Parcours."""
+    par_type = {}
+    for p in sorted(parcours, key=cle_niveau):
+        par_type.setdefault(p.get("Type_Operation"), []).append(p["id"])
+    return {t: {"ids": ids, "rang": {pid: i for i, pid in enumerate(ids)}} for t, ids in par_type.items()}
+
+
+def premier_niveau(chaine):
+    """Premier Parcours de la chaîne d'un type (None si le type n'a aucun niveau)."""
+    return chaine["ids"][0] if chaine and chaine["ids"] else None
+
+
+def niveau_voisin(chaine, parcours_id, pas: int):
+    """Parcours `pas` rangs plus loin (négatif : plus bas), borné aux extrémités de la chaîne."""
+    if not chaine or parcours_id not in chaine["rang"]:
+        return parcours_id
+    rang = min(max(chaine["rang"][parcours_id] + pas, 0), len(chaine["ids"]) - 1)
+    return chaine["ids"][rang]
+
+
+def taux_reussite(etats, critere: int):
+    """
+    Taux de réussite sur les `critere` derniers états ("VRAI"/"FAUX"), arrondi à 2 décimales.
+    None s'il y a moins de `critere` observations.
+    """
+    if critere <= 0 or len(etats) < critere:
+        return None
+    selection = etats[-critere:]
+    nb_bonnes = sum(1 for etat in selection if etat == "VRAI")
+    return round(nb_bonnes / critere, 2)
+
+
+def decider_evolution(taux: float) -> str:
+    if taux >= SEUIL_PROGRESSION:
+        return "progression"
+    if taux < SEUIL_REGRESSION:
+        return "régression"
+    return "stagnation"
+
+
+def niveaux_franchis(fenetre: dict, saut_max: int = SAUT_MAX) -> int:
+    """
+    Niveaux franchis par une progression : 1, ou en mode saut une fenêtre complète par tranche
+    de `Critere` bonnes réponses consécutives (Serie_Bonnes), au plus saut_max.
+    """
+    critere = fenetre["Critere"]
+    if saut_max <= 1 or critere <= 0:
+        return 1
+    return max(1, min(saut_max, fenetre["Serie_Bonnes"] // critere))
+
+
+def parcours_cible(evolution: str, parcours_id, chaine, sauts: int = 1):
+    """Parcours après l'évolution dans la chaîne du type : `sauts` niveaux au-dessus, ou un en dessous."""
+    if evolution == "progression":
+        return niveau_voisin(chaine, parcours_id, sauts)
+    if evolution == "régression":
+        return niveau_voisin(chaine, parcours_id, -1)
+    return parcours_id
+
+
+def fenetre_vide(critere: int, depuis_observation_id=0) -> dict:
+    """Fenêtre sans état, ouverte après l'observation `depuis_observation_id` (dernière décision)."""
+    return {"Critere": critere, "Depuis_Observation_Id": depuis_observation_id or 0,
+            "Nb": 0, "Nb_Bonnes": 0, "Serie_Bonnes": 0, "Etats": [0] * max(critere, 0)}
+
+
+def fenetre_ajouter(fenetre: dict, etat: str) -> dict:
+    """Ajoute un état ("VRAI"/"FAUX") : il remplace le plus ancien des `Critere` derniers."""
+    critere = fenetre["Critere"]
+    if critere > 0:
+        i = fenetre["Nb"] % critere
+        nouveau = 1 if etat == "VRAI" else 0
+        if fenetre["Nb"] >= critere:
+            fenetre["Nb_Bonnes"] -= fenetre["Etats"][i]
+        fenetre["Etats"][i] = nouveau
+        fenetre["Nb_Bonnes"] += nouveau
+    fenetre["Serie_Bonnes"] = fenetre["Serie_Bonnes"] + 1 if etat == "VRAI" else 0
+    fenetre["Nb"] += 1
+    return fenetre
+
+
+def fenetre_taux(fenetre: dict):
+    """Même résultat que taux_reussite sur les états ajoutés depuis l'ouverture de la fenêtre."""
+    critere = fenetre["Critere"]
+    if critere <= 0 or fenetre["Nb"] < critere:
+        return None
+    return round(fenetre["Nb_Bonnes"] / critere, 2)
+
+
+def fenetre_courante(fenetre, critere: int, depuis_observation_id) -> dict:
+    """
+    Fenêtre à utiliser pour la position actuelle : la fenêtre stockée si elle a été ouverte
+    après la même décision (même Derniere_Observation_Id), sinon une fenêtre vide.
+    """
+    depuis = depuis_observation_id or 0
+    if fenetre and fenetre["Depuis_Observation_Id"] == depuis and fenetre["Critere"] == critere:
+        return {**fenetre, "Etats": list(fenetre["Etats"])}
+    return fenetre_vide(critere, depuis)
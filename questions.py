@@ -0,0 +1,132 @@
+"""
+Génération vectorisée des questions de calcul mental (sans accès aux données).
+
+Un jeu de questions est stocké en colonnes (tableaux NumPy) plutôt qu'en liste de dicts :
+tous les opérandes d'une session sont tirés en un seul appel à un numpy.random.Generator,
+et le texte d'une question n'est formaté qu'à son affichage (cf. question()).
+Une même graine redonne exactement le même jeu de questions.
+
+Microbenchmark : python questions.py bench
+"""
+
+import random
+import sys
+import time
+
+import numpy as np
+
+TYPES_OPERATION = ("Addition", "Soustraction", "Multiplication")
+SYMBOLES = {"Addition": "+", "Soustraction": "-", "Multiplication": "*"}
+BORNES_PAR_DEFAUT = (0, 10, 0, 10)   # Operateur1_Min, Operateur1_Max, Operateur2_Min, Operateur2_Max
+
+
+def bornes_parcours(parcours: dict):
+    """(a_min, a_max, b_min, b_max) d'une ligne Parcours."""
+    defaut = dict(zip(("Operateur1_Min", "Operateur1_Max", "Operateur2_Min", "Operateur2_Max"), BORNES_PAR_DEFAUT))
+    return tuple(
+        int(parcours[c]) if parcours.get(c) is not None else v
+        for c, v in defaut.items()
+    )
+
+
+def nouvelle_graine() -> int:
+    """Graine aléatoire à mémoriser avec la session (pour la rejouer à l'identique)."""
+    return int(np.random.SeedSequence().generate_state(1, np.uint64)[0])
+
+
+def generer_questions(bornes_par_type: dict, nb_par_type: int, seed=None):
+    """
+    Génère nb_par_type questions pour chaque type de bornes_par_type ({type: (a_min, a_max, b_min, b_max)}),
+    mélangées. Retourne un jeu en colonnes :
+    {"seed", "type" (indices dans TYPES_OPERATION), "a", "b", "solution"}.
+    """
+    types = [t for t in TYPES_OPERATION if t in bornes_par_type]
+    n = nb_par_type * len(types)
+    rng = np.random.default_rng(seed)
+
+    codes = np.repeat(np.array([TYPES_OPERATION.index(t) for t in types], dtype=np.int8), nb_par_type)
+    bornes = np.array([bornes_par_type[t] for t in types], dtype=np.int64).reshape(-1, 4)
+    bornes = np.repeat(bornes, nb_par_type, axis=0)
+
+    # Un seul tirage pour tous les opérandes : bornes par ligne, incluses (comme random.randint)
+    operandes = rng.integers(bornes[:, [0, 2]], bornes[:, [1, 3]], endpoint=True, size=(n, 2))
+    a, b = operandes[:, 0], operandes[:, 1]
+
+    # Soustraction : jamais de résultat négatif (on échange a et b si a < b)
+    soustraction = codes == TYPES_OPERATION.index("Soustraction")
+    a, b = (np.where(soustraction, np.maximum(a, b), a),
+            np.where(soustraction, np.minimum(a, b), b))
+
+    solution = np.select(
+        [codes == TYPES_OPERATION.index("Addition"), soustraction],
+        [a + b, a - b],
+        default=a * b,
+    )
+
+    # Mélanger toutes les questions pour ne pas grouper par type
+    ordre = rng.permutation(n)
+    return {
+        "seed": seed,
+        "type": codes[ordre],
+        "a": a[ordre],
+        "b": b[ordre],
+        "solution": solution[ordre],
+    }
+
+
+def nb_questions(jeu) -> int:
+    return 0 if not jeu else int(jeu["type"].size)
+
+
+def question(jeu, i: int) -> dict:
+    """Question i au format attendu par les pages : {operation, solution, type_operation}."""
+    type_op = TYPES_OPERATION[jeu["type"][i]]
+    a, b = int(jeu["a"][i]), int(jeu["b"][i])
+    return {
+        "operation": f"{a} {SYMBOLES[type_op]} {b}",
+        "solution": int(jeu["solution"][i]),
+        "type_operation": type_op,
+    }
+
+
+# --------------------- MICROBENCHMARK ---------------------
+
+def _generer_boucle(bornes_par_type: dict, nb_par_type: int):
+    """Ancienne génération (random.randint + f-string par question), pour comparaison."""
+    questions = []
+    for type_op, (a_min, a_max, b_min, b_max) in bornes_par_type.items():
+        for _ in range(nb_par_type):
+            a = random.randint(a_min, a_max)
+            b = random.randint(b_min, b_max)
+            if type_op == "Soustraction" and a < b:
+                a, b = b, a
+            sol = a + b if type_op == "Addition" else a - b if type_op == "Soustraction" else a * b
+            questions.append({"operation": f"{a} {SYMBOLES[type_op]} {b}", "solution": sol, "type_operation": type_op})
+    random.shuffle(questions)
+    return questions
+
+
+def _chrono(fonction, repetitions: int) -> float:
+    debut = time.perf_counter()
+    for _ in range(repetitions):
+        fonction()
+    return (time.perf_counter() - debut) / repetitions
+
+
+def bench(tailles=(10, 100, 10_000)):
+    """Coût de génération pour chaque taille, en questions PAR TYPE (nb_par_type de generer_questions)."""
+    bornes = {"Addition": (0, 100, 0, 100), "Soustraction": (0, 100, 0, 100), "Multiplication": (0, 12, 0, 12)}
+    print(f"{'par type':>9} {'total':>7} {'boucle (µs)':>12} {'numpy (µs)':>12} {'numpy + 1re question (µs)':>27}")
+    for par_type in tailles:
+        total = par_type * len(bornes)
+        repetitions = max(5, 20_000 // total)
+        boucle = _chrono(lambda: _generer_boucle(bornes, par_type), repetitions)
+        vecteur = _chrono(lambda: generer_questions(bornes, par_type, seed=0), repetitions)
+        premiere = _chrono(lambda: question(generer_questions(bornes, par_type, seed=0), 0), repetitions)
+        print(f"{par_type:>9} {total:>7} {boucle * 1e6:>12.1f} {vecteur * 1e6:>12.1f} {premiere * 1e6:>27.1f}")
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["bench"]:
+        bench()
+    else:
+        print("Usage : python questions.py bench")
@@ -0,0 +1,68 @@
+"""
+Composant Streamlit bidirectionnel : une session de calcul mental jouée dans le navigateur.
+
+Le jeu de questions complet est envoyé au composant (components/quiz_runner/index.html) ;
+saisie, chronomètre et vérification se font côté navigateur, et toutes les réponses reviennent
+en un seul setComponentValue : une interaction serveur par session au lieu d'une par question.
+"""
+
+import os
+
+import streamlit.components.v1 as components
+
+from questions import nb_questions, question
+
+_quiz_runner = components.declare_component(
+    "quiz_runner", path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "components", "quiz_runner")
+)
+
+
+def quiz_runner(jeu, nonce: str, key=None, height=620):
+    """
+    Affiche la session `jeu` (cf. questions.py). `nonce` identifie la session : une nouvelle valeur
+    redémarre le quiz côté navigateur. Retourne None tant que la session n'est pas terminée,
+    puis la liste des réponses (cf. build_answers).
+    """
+    n = nb_questions(jeu)
+    questions = [question(jeu, i) for i in range(n)]
+    value = _quiz_runner(
+        nonce=nonce,
+        operations=[q["operation"] for q in questions],
+        solutions=[q["solution"] for q in questions],
+        types=[q["type_operation"] for q in questions],
+        key=key,
+        default=None,
+        height=height,
+    )
+    if not value or value.get("nonce") != nonce:
+        return None  # valeur d'une session précédente
+    return build_answers(jeu, value.get("answers") or [])
+
+
+def build_answers(jeu, reponses):
+    """
+    Réponses du navigateur -> entrées au format de st.session_state.answers.
+    Correction et marge d'erreur sont recalculées ici : le navigateur ne fournit que la saisie et le temps.
+    """
+    answers = []
+    n = nb_questions(jeu)
+    for r in reponses:
+        i = int(r["index"])
+        if not 0 <= i < n:
+            continue
+        q = question(jeu, i)
+        try:
+            ua = int(r["answer"])
+        except (TypeError, ValueError):
+            continue
+        answers.append({
+            "question": q["operation"],
+            "user_answer": str(r["answer"]),
+            "correct_answer": q["solution"],
+            "is_correct": ua == q["solution"],
+            "corrected": False,
+            "elapsed": max(0, int(r.get("elapsed", 0))),
+            "error_margin": abs(ua - q["solution"]),
+            "type_operation": q["type_operation"],
+        })
+    return answers
@@ -0,0 +1,46 @@
+-- Position courante dénormalisée : (utilisateur, type d'opération) -> dernier Suivi_Parcours.
+-- Maintenue par trigger dans la même transaction que l'insertion du Suivi_Parcours,
+-- donc toujours cohérente avec l'historique, quelle que soit sa longueur.
+
+create table if not exists "Position_Actuelle" (
+    "Users_Id"                bigint not null references "Users"(id) on delete cascade,
+    "Type_Operation"          text   not null,
+    "Parcours_Id"             bigint not null references "Parcours"(id),
+    "Suivi_Id"                bigint not null references "Suivi_Parcours"(id) on delete cascade,
+    "Derniere_Observation_Id" bigint,
+    "Date"                    date,
+    primary key ("Users_Id", "Type_Operation")
+);
+
+create or replace function maj_position_actuelle() returns trigger
+language plpgsql as $$
+begin
+    insert into "Position_Actuelle"
+        ("Users_Id", "Type_Operation", "Parcours_Id", "Suivi_Id", "Derniere_Observation_Id", "Date")
+    select new."Users_Id", p."Type_Operation", new."Parcours_Id", new.id, new."Derniere_Observation_Id", new."Date"
+    from "Parcours" p
+    where p.id = new."Parcours_Id"
+    on conflict ("Users_Id", "Type_Operation") do update
+        set "Parcours_Id"             = excluded."Parcours_Id",
+            "Suivi_Id"                = excluded."Suivi_Id",
+            "Derniere_Observation_Id" = excluded."Derniere_Observation_Id",
+            "Date"                    = excluded."Date"
+        where "Position_Actuelle"."Suivi_Id" < excluded."Suivi_Id";
+    return new;
+end;
+$$;
+
+drop trigger if exists trg_position_actuelle on "Suivi_Parcours";
+create trigger trg_position_actuelle
+    after insert on "Suivi_Parcours"
+    for each row execute function maj_position_actuelle();
+
+-- Reprise de l'existant : dernier suivi par (utilisateur, type)
+insert into "Position_Actuelle"
+    ("Users_Id", "Type_Operation", "Parcours_Id", "Suivi_Id", "Derniere_Observation_Id", "Date")
+select distinct on (s."Users_Id", p."Type_Operation")
+       s."Users_Id", p."Type_Operation", s."Parcours_Id", s.id, s."Derniere_Observation_Id", s."Date"
+from "Suivi_Parcours" s
+join "Parcours" p on p.id = s."Parcours_Id"
+order by s."Users_Id", p."Type_Operation", s.id desc
+on conflict ("Users_Id", "Type_Operation") do nothing;
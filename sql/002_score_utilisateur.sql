@@ -0,0 +1,94 @@
+-- Classement maintenu incrémentalement : un agrégat de score par utilisateur,
+-- mis à jour par trigger à chaque insertion dans Observations (même transaction).
+-- Le top-K est servi par l'index sur "Score_Total" : la latence ne dépend plus
+-- du volume d'Observations.
+
+create table if not exists "Score_Utilisateur" (
+    "Users_Id"        bigint primary key references "Users"(id) on delete cascade,
+    "Score_Total"     numeric     not null default 0,   -- scores historiques fractionnaires (0.5)
+    "Nb_Observations" bigint      not null default 0,
+    "Maj"             timestamptz not null default now()
+);
+
+-- Tables créées avant le passage en numeric (le bigint arrondissait les scores 0.5) ;
+-- la vue Classement dépend de la colonne : supprimée ici, recréée plus bas
+drop view if exists "Classement";
+alter table "Score_Utilisateur" alter column "Score_Total" type numeric;
+
+create index if not exists idx_score_utilisateur_top
+    on "Score_Utilisateur" ("Score_Total" desc, "Users_Id");
+
+-- Une ligne à 0 dès l'inscription : un nouveau joueur apparaît dans le classement
+create or replace function init_score_utilisateur() returns trigger
+language plpgsql as $$
+begin
+    insert into "Score_Utilisateur" ("Users_Id") values (new.id)
+    on conflict ("Users_Id") do nothing;
+    return new;
+end;
+$$;
+
+drop trigger if exists trg_init_score_utilisateur on "Users";
+create trigger trg_init_score_utilisateur
+    after insert on "Users"
+    for each row execute function init_score_utilisateur();
+
+-- Un seul upsert par utilisateur et par INSERT groupé d'Observations
+create or replace function maj_score_utilisateur() returns trigger
+language plpgsql as $$
+begin
+    insert into "Score_Utilisateur" ("Users_Id", "Score_Total", "Nb_Observations", "Maj")
+    select e."Users_Id", sum(n."Score"), count(*), now()
+    from nouvelles n
+    join "Entrainement" e on e.id = n."Entrainement_Id"
+    group by e."Users_Id"
+    on conflict ("Users_Id") do update
+        set "Score_Total"     = "Score_Utilisateur"."Score_Total" + excluded."Score_Total",
+            "Nb_Observations" = "Score_Utilisateur"."Nb_Observations" + excluded."Nb_Observations",
+            "Maj"             = now();
+    return null;
+end;
+$$;
+
+drop trigger if exists trg_score_utilisateur on "Observations";
+create trigger trg_score_utilisateur
+    after insert on "Observations"
+    referencing new table as nouvelles
+    for each statement execute function maj_score_utilisateur();
+
+-- Vue lue par get_classement() : Score_Utilisateur + nom du joueur
+create or replace view "Classement" as
+select s."Users_Id", u.name, s."Score_Total", s."Nb_Observations"
+from "Score_Utilisateur" s
+join "Users" u on u.id = s."Users_Id";
+
+-- Job de réconciliation : reconstruit les agrégats depuis les Observations brutes.
+-- Retourne le nombre de lignes corrigées (0 si tout était cohérent).
+-- À planifier par ex. avec pg_cron : select cron.schedule('0 4 * * *', 'select reconcilier_scores_utilisateurs()');
+create or replace function reconcilier_scores_utilisateurs() returns integer
+language plpgsql as $$
+declare
+    nb_corrigees integer;
+begin
+    -- Bloque les triggers d'écriture le temps de la reconstruction
+    lock table "Score_Utilisateur" in share row exclusive mode;
+
+    insert into "Score_Utilisateur" ("Users_Id", "Score_Total", "Nb_Observations", "Maj")
+    select u.id, coalesce(sum(o."Score"), 0), count(o.id), now()
+    from "Users" u
+    left join "Entrainement" e on e."Users_Id" = u.id
+    left join "Observations" o on o."Entrainement_Id" = e.id
+    group by u.id
+    on conflict ("Users_Id") do update
+        set "Score_Total"     = excluded."Score_Total",
+            "Nb_Observations" = excluded."Nb_Observations",
+            "Maj"             = now()
+        where "Score_Utilisateur"."Score_Total" is distinct from excluded."Score_Total"
+           or "Score_Utilisateur"."Nb_Observations" is distinct from excluded."Nb_Observations";
+
+    get diagnostics nb_corrigees = row_count;
+    return nb_corrigees;
+end;
+$$;
+
+select reconcilier_scores_utilisateurs();
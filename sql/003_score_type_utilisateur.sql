@@ -0,0 +1,96 @@
+-- Compteurs de score par (utilisateur, type d'opération), maintenus par trigger
+-- dans la même transaction que l'INSERT groupé d'Observations.
+-- Seules les observations rattachées à un Parcours_Id sont typées (comme _get_scores_by_type).
+
+create table if not exists "Score_Type_Utilisateur" (
+    "Users_Id"        bigint not null references "Users"(id) on delete cascade,
+    "Type_Operation"  text   not null,
+    "Score_Total"     numeric not null default 0,   -- scores historiques fractionnaires (0.5)
+    "Nb_Observations" bigint  not null default 0,
+    "Maj"             timestamptz not null default now(),
+    primary key ("Users_Id", "Type_Operation")
+);
+
+-- Tables créées avant le passage en numeric (le bigint arrondissait chaque INSERT groupé)
+alter table "Score_Type_Utilisateur" alter column "Score_Total" type numeric;
+
+create or replace function maj_score_type_utilisateur() returns trigger
+language plpgsql as $$
+begin
+    insert into "Score_Type_Utilisateur" ("Users_Id", "Type_Operation", "Score_Total", "Nb_Observations", "Maj")
+    select e."Users_Id", p."Type_Operation", sum(n."Score"), count(*), now()
+    from nouvelles n
+    join "Entrainement" e on e.id = n."Entrainement_Id"
+    join "Parcours" p on p.id = n."Parcours_Id"
+    group by e."Users_Id", p."Type_Operation"
+    on conflict ("Users_Id", "Type_Operation") do update
+        set "Score_Total"     = "Score_Type_Utilisateur"."Score_Total" + excluded."Score_Total",
+            "Nb_Observations" = "Score_Type_Utilisateur"."Nb_Observations" + excluded."Nb_Observations",
+            "Maj"             = now();
+    return null;
+end;
+$$;
+
+drop trigger if exists trg_score_type_utilisateur on "Observations";
+create trigger trg_score_type_utilisateur
+    after insert on "Observations"
+    referencing new table as nouvelles
+    for each statement execute function maj_score_type_utilisateur();
+
+-- Valeurs attendues, recalculées depuis les Observations brutes
+-- (drop : create or replace view ne peut pas changer le type de Score_Total)
+drop view if exists "Score_Type_Utilisateur_Attendu";
+create view "Score_Type_Utilisateur_Attendu" as
+select e."Users_Id", p."Type_Operation", sum(o."Score")::numeric as "Score_Total", count(*)::bigint as "Nb_Observations"
+from "Observations" o
+join "Entrainement" e on e.id = o."Entrainement_Id"
+join "Parcours" p on p.id = o."Parcours_Id"
+group by e."Users_Id", p."Type_Operation";
+
+-- Vérification : lignes dont le compteur diverge des Observations (vide si tout est cohérent)
+-- (drop : create or replace function ne peut pas changer le type de retour)
+drop function if exists verifier_scores_par_type();
+create function verifier_scores_par_type()
+returns table ("Users_Id" bigint, "Type_Operation" text, "Score_Compteur" numeric, "Score_Attendu" numeric)
+language sql stable as $$
+    select coalesce(c."Users_Id", a."Users_Id"), coalesce(c."Type_Operation", a."Type_Operation"),
+           c."Score_Total", a."Score_Total"
+    from "Score_Type_Utilisateur" c
+    full join "Score_Type_Utilisateur_Attendu" a
+           on a."Users_Id" = c."Users_Id" and a."Type_Operation" = c."Type_Operation"
+    where c."Score_Total" is distinct from a."Score_Total"
+       or c."Nb_Observations" is distinct from a."Nb_Observations";
+$$;
+
+-- Reconstruction : retourne le nombre de lignes corrigées
+create or replace function reconcilier_scores_par_type() returns integer
+language plpgsql as $$
+declare
+    nb_corrigees integer;
+    nb_supprimees integer;
+begin
+    lock table "Score_Type_Utilisateur" in share row exclusive mode;
+
+    insert into "Score_Type_Utilisateur" ("Users_Id", "Type_Operation", "Score_Total", "Nb_Observations", "Maj")
+    select a."Users_Id", a."Type_Operation", a."Score_Total", a."Nb_Observations", now()
+    from "Score_Type_Utilisateur_Attendu" a
+    on conflict ("Users_Id", "Type_Operation") do update
+        set "Score_Total"     = excluded."Score_Total",
+            "Nb_Observations" = excluded."Nb_Observations",
+            "Maj"             = now()
+        where "Score_Type_Utilisateur"."Score_Total" is distinct from excluded."Score_Total"
+           or "Score_Type_Utilisateur"."Nb_Observations" is distinct from excluded."Nb_Observations";
+    get diagnostics nb_corrigees = row_count;
+
+    delete from "Score_Type_Utilisateur" c
+    where not exists (
+        select 1 from "Score_Type_Utilisateur_Attendu" a
+        where a."Users_Id" = c."Users_Id" and a."Type_Operation" = c."Type_Operation"
+    );
+    get diagnostics nb_supprimees = row_count;
+
+    return nb_corrigees + nb_supprimees;
+end;
+$$;
+
+select reconcilier_scores_par_type();
@@ -0,0 +1,135 @@
+-- Enregistrement d'une session d'entraînement en UN aller-retour et UNE transaction :
+-- Entrainement + Observations par type, puis progression de niveau (Suivi_Parcours).
+-- Les triggers de sql/001-003, 005 et 006 (Position_Actuelle, scores, calendrier d'activité, cumuls)
+-- s'exécutent dans la même transaction, ainsi que la mise à jour de la fenêtre de réussite du niveau
+-- (sql/007) ; sql/007 et la chaîne de niveaux (sql/008) sont à appliquer avant celui-ci.
+--
+-- Appel : supabase.rpc("enregistrer_entrainement", {
+--     "p_user_id": 1, "p_cle": "<clé d'idempotence>", "p_date": "2026-10-17", "p_heure": "14:05",
+--     "p_observations": {"Addition": [{"Operation": "3 + 4", "Etat": "VRAI", "Score": 1, ...}], ...},
+--     "p_saut_max": 1     -- facultatif : niveaux franchis au plus par progression (mode saut si > 1)
+-- })
+-- Une clé déjà enregistrée renvoie le résultat mémorisé sans rien réécrire (double clic, rerun, retry).
+
+create table if not exists "Enregistrement_Session" (
+    "Cle"       text primary key,
+    "Users_Id"  bigint not null references "Users"(id) on delete cascade,
+    "Resultat"  jsonb  not null,
+    "Cree"      timestamptz not null default now()
+);
+
+-- Nouvelle signature (p_saut_max) : l'ancienne version rendrait l'appel ambigu
+drop function if exists enregistrer_entrainement(bigint, text, date, text, jsonb);
+
+create or replace function enregistrer_entrainement(
+    p_user_id      bigint,
+    p_cle          text,
+    p_date         date,
+    p_heure        text,
+    p_observations jsonb,
+    p_saut_max     integer default 1
+) returns jsonb
+language plpgsql as $$
+declare
+    v_resultat        jsonb;
+    v_type            text;
+    v_rows            jsonb;
+    v_pos             "Position_Actuelle"%rowtype;
+    v_entrainement_id bigint;
+    v_obs_ids         bigint[];
+    v_critere         integer;
+    v_fenetre         "Fenetre_Reussite"%rowtype;
+    v_taux            numeric;
+    v_evolution       text;
+    v_cible           bigint;
+    v_types           jsonb := '{}'::jsonb;
+    v_avertissements  jsonb := '[]'::jsonb;
+begin
+    -- Idempotence : une seule exécution par clé, même en concurrence
+    perform pg_advisory_xact_lock(hashtext(p_cle));
+    select "Resultat" into v_resultat from "Enregistrement_Session" where "Cle" = p_cle;
+    if found then
+        return v_resultat;
+    end if;
+
+    for v_type, v_rows in select key, value from jsonb_each(p_observations) loop
+        if jsonb_array_length(v_rows) = 0 then
+            continue;
+        end if;
+
+        select * into v_pos
+        from "Position_Actuelle"
+        where "Users_Id" = p_user_id and "Type_Operation" = v_type
+        for update;
+        if not found then
+            v_avertissements := v_avertissements || to_jsonb(
+                format('Aucun Parcours_Id trouvé pour %s, entraînement non créé pour ce type.', v_type));
+            continue;
+        end if;
+
+        insert into "Entrainement" ("Users_Id", "Date", "Time", "Volume", "Parcours_Id")
+        values (p_user_id, p_date, p_heure, jsonb_array_length(v_rows), v_pos."Parcours_Id")
+        returning id into v_entrainement_id;
+
+        with inserees as (
+            insert into "Observations" ("Entrainement_Id", "Parcours_Id", "Operateur_Un", "Operateur_Deux",
+                                        "Operation", "Etat", "Correction", "Score", "Temps_Seconds", "Marge_Erreur")
+            select v_entrainement_id, v_pos."Parcours_Id",
+                   (o->>'Operateur_Un')::integer, (o->>'Operateur_Deux')::integer,
+                   o->>'Operation', o->>'Etat', coalesce(o->>'Correction', 'NON'),
+                   (o->>'Score')::integer, (o->>'Temps_Seconds')::integer, (o->>'Marge_Erreur')::integer
+            from jsonb_array_elements(v_rows) with ordinality as t(o, rang)
+            order by rang
+            returning id
+        )
+        select array_agg(id order by id) into v_obs_ids from inserees;
+
+        -- Progression : fenêtre glissante des `Critere` derniers états de CET utilisateur sur ce
+        -- niveau depuis la dernière décision (sql/007), complétée avec la session (cf. progression.py)
+        select "Critere" into v_critere from "Parcours" where id = v_pos."Parcours_Id";
+        v_fenetre := maj_fenetre_reussite(
+            p_user_id, v_pos."Parcours_Id", v_critere, coalesce(v_pos."Derniere_Observation_Id", 0),
+            array(select o->>'Etat' from jsonb_array_elements(v_rows) with ordinality as t(o, rang) order by rang)
+        );
+
+        v_evolution := null;
+        v_taux := null;
+        v_cible := v_pos."Parcours_Id";
+        if v_critere > 0 and v_fenetre."Nb" >= v_critere then
+            v_taux := round(v_fenetre."Nb_Bonnes"::numeric / v_critere, 2);
+            -- Niveau suivant / précédent dans la chaîne du type, triée par Niveau (sql/008) ; en mode
+            -- saut, un niveau par fenêtre complète sans erreur dans la série en cours (niveaux_franchis)
+            if v_taux >= 0.95 then
+                v_evolution := 'progression';
+                v_cible := niveau_voisin(v_pos."Parcours_Id", case
+                    when coalesce(p_saut_max, 1) <= 1 then 1
+                    else greatest(1, least(p_saut_max, v_fenetre."Serie_Bonnes" / v_critere))
+                end);
+            elsif v_taux < 0.5 then
+                v_evolution := 'régression';
+                v_cible := niveau_voisin(v_pos."Parcours_Id", -1);
+            else
+                v_evolution := 'stagnation';
+            end if;
+
+            -- Le trigger trg_position_actuelle met à jour Position_Actuelle
+            insert into "Suivi_Parcours" ("Users_Id", "Parcours_Id", "Date", "Taux_Reussite",
+                                          "Type_Evolution", "Derniere_Observation_Id")
+            values (p_user_id, v_cible, p_date, v_taux, v_evolution, v_obs_ids[array_length(v_obs_ids, 1)]);
+        end if;
+
+        v_types := v_types || jsonb_build_object(v_type, jsonb_build_object(
+            'entrainement_id', v_entrainement_id,
+            'observation_ids', to_jsonb(v_obs_ids),
+            'parcours_id', v_pos."Parcours_Id",
+            'evolution', v_evolution,
+            'taux', v_taux,
+            'nouveau_parcours_id', v_cible
+        ));
+    end loop;
+
+    v_resultat := jsonb_build_object('cle', p_cle, 'types', v_types, 'avertissements', v_avertissements);
+    insert into "Enregistrement_Session" ("Cle", "Users_Id", "Resultat") values (p_cle, p_user_id, v_resultat);
+    return v_resultat;
+end;
+$$;
@@ -0,0 +1,149 @@
+-- Calendrier d'activité par utilisateur : observations par jour dans un tableau indexé par jour
+-- depuis le premier jour actif, plus la série en cours et le record (cf. activite.py).
+-- Maintenu par trigger (une fois par INSERT groupé d'Observations, comme sql/006) dans la
+-- transaction de la session : la série s'affiche sans relire les Entrainement, et la régularité
+-- d'une fenêtre est une tranche de "Jours". Les écritures directes dans Observations (reprise,
+-- scripts) tiennent donc aussi le calendrier à jour.
+--
+-- Ré-exécuter sql/004 avant celui-ci : son ancienne version appelait aussi maj_activite_utilisateur
+-- (jours comptés deux fois) ; la reconstruction en fin de fichier efface tout écart antérieur.
+
+create table if not exists "Activite_Utilisateur" (
+    "Users_Id"       bigint    primary key references "Users"(id) on delete cascade,
+    "Debut"          date      not null,
+    "Jours"          integer[] not null,             -- "Jours"[i] = observations le jour Debut + i - 1
+    "Dernier_Jour"   date      not null,             -- Debut + array_length(Jours) - 1
+    "Serie_Courante" integer   not null,             -- jours actifs consécutifs jusqu'à Dernier_Jour
+    "Serie_Max"      integer   not null,
+    "Maj"            timestamptz not null default now()
+);
+
+-- (série se terminant au dernier jour, plus longue série) d'un tableau de compteurs
+create or replace function series_activite(p_jours integer[], out courante integer, out record integer)
+language plpgsql immutable as $$
+declare
+    v_nb integer;
+begin
+    courante := 0;
+    record := 0;
+    foreach v_nb in array p_jours loop
+        courante := case when v_nb > 0 then courante + 1 else 0 end;
+        record := greatest(record, courante);
+    end loop;
+end;
+$$;
+
+create or replace function maj_activite_utilisateur(p_user_id bigint, p_jour date, p_nb integer)
+returns void
+language plpgsql as $$
+declare
+    v_act       "Activite_Utilisateur"%rowtype;
+    v_i         integer;
+    v_deja      boolean;
+begin
+    if p_nb <= 0 then
+        return;
+    end if;
+
+    insert into "Activite_Utilisateur" ("Users_Id", "Debut", "Jours", "Dernier_Jour", "Serie_Courante", "Serie_Max")
+    values (p_user_id, p_jour, array[p_nb], p_jour, 1, 1)
+    on conflict ("Users_Id") do nothing;
+    if found then
+        return;
+    end if;
+
+    select * into v_act from "Activite_Utilisateur" where "Users_Id" = p_user_id for update;
+
+    if p_jour < v_act."Debut" then
+        v_act."Jours" := array_fill(0, array[v_act."Debut" - p_jour]) || v_act."Jours";
+        v_act."Debut" := p_jour;
+    end if;
+    v_i := p_jour - v_act."Debut" + 1;
+    if v_i > array_length(v_act."Jours", 1) then
+        v_act."Jours" := v_act."Jours" || array_fill(0, array[v_i - array_length(v_act."Jours", 1)]);
+    end if;
+    v_deja := v_act."Jours"[v_i] > 0;
+    v_act."Jours"[v_i] := v_act."Jours"[v_i] + p_nb;
+
+    if p_jour = v_act."Dernier_Jour" + 1 then
+        v_act."Serie_Courante" := v_act."Serie_Courante" + 1;
+        v_act."Serie_Max" := greatest(v_act."Serie_Max", v_act."Serie_Courante");
+    elsif p_jour > v_act."Dernier_Jour" then
+        v_act."Serie_Courante" := 1;
+    elsif not v_deja then
+        -- Jour passé (session enregistrée en retard) : recalcul complet, rare
+        select courante, record into v_act."Serie_Courante", v_act."Serie_Max" from series_activite(v_act."Jours");
+    end if;
+
+    update "Activite_Utilisateur"
+    set "Debut"          = v_act."Debut",
+        "Jours"          = v_act."Jours",
+        "Dernier_Jour"   = v_act."Debut" + array_length(v_act."Jours", 1) - 1,
+        "Serie_Courante" = v_act."Serie_Courante",
+        "Serie_Max"      = v_act."Serie_Max",
+        "Maj"            = now()
+    where "Users_Id" = p_user_id;
+end;
+$$;
+
+-- Nouvelles observations groupées par (utilisateur, jour) : un appel par calendrier touché,
+-- dans l'ordre des utilisateurs (verrous pris dans le même ordre par les sessions concurrentes)
+create or replace function maj_activite_observations() returns trigger
+language plpgsql as $$
+declare
+    v_jour record;
+begin
+    for v_jour in
+        select e."Users_Id", e."Date"::date as jour, count(*)::integer as nb
+        from nouvelles n
+        join "Entrainement" e on e.id = n."Entrainement_Id"
+        where e."Date" is not null
+        group by 1, 2
+        order by 1, 2
+    loop
+        perform maj_activite_utilisateur(v_jour."Users_Id", v_jour.jour, v_jour.nb);
+    end loop;
+    return null;
+end;
+$$;
+
+drop trigger if exists trg_activite_utilisateur on "Observations";
+create trigger trg_activite_utilisateur
+    after insert on "Observations"
+    referencing new table as nouvelles
+    for each statement execute function maj_activite_observations();
+
+-- Reconstruction depuis les Observations (reprise de l'historique, ou après correction de
+-- données) : retourne le nombre de calendriers écrits
+create or replace function reconstruire_activite_utilisateurs() returns integer
+language plpgsql as $$
+declare
+    nb_lignes integer;
+begin
+    lock table "Activite_Utilisateur" in share row exclusive mode;
+    delete from "Activite_Utilisateur";
+
+    with par_jour as (
+        select e."Users_Id", e."Date"::date as jour, count(*)::integer as nb
+        from "Observations" o
+        join "Entrainement" e on e.id = o."Entrainement_Id"
+        group by e."Users_Id", e."Date"::date
+    ),
+    calendriers as (
+        select b."Users_Id", b.debut, b.fin,
+               array_agg(coalesce(p.nb, 0) order by j.jour) as jours
+        from (select "Users_Id", min(jour) as debut, max(jour) as fin from par_jour group by "Users_Id") b
+        cross join lateral generate_series(b.debut, b.fin, interval '1 day') as j(jour)
+        left join par_jour p on p."Users_Id" = b."Users_Id" and p.jour = j.jour::date
+        group by b."Users_Id", b.debut, b.fin
+    )
+    insert into "Activite_Utilisateur" ("Users_Id", "Debut", "Jours", "Dernier_Jour", "Serie_Courante", "Serie_Max")
+    select c."Users_Id", c.debut, c.jours, c.fin, s.courante, s.record
+    from calendriers c
+    cross join lateral series_activite(c.jours) s;
+    get diagnostics nb_lignes = row_count;
+    return nb_lignes;
+end;
+$$;
+
+select reconstruire_activite_utilisateurs();
@@ -0,0 +1,86 @@
+-- Cumuls journaliers par (utilisateur, type d'opération, niveau, jour), maintenus par trigger
+-- dans la même transaction que l'INSERT groupé d'Observations (comme sql/003).
+-- Les graphiques de progression lisent ces cumuls au lieu des observations brutes.
+-- Observations sans Parcours_Id (historique) : Type_Operation 'Inconnu', Parcours_Id 0.
+
+create table if not exists "Cumul_Quotidien" (
+    "Users_Id"        bigint  not null references "Users"(id) on delete cascade,
+    "Type_Operation"  text    not null,
+    "Parcours_Id"     bigint  not null,          -- 0 : observation non rattachée à un niveau
+    "Jour"            date    not null,          -- Date de l'entraînement
+    "Nb_Observations" integer not null default 0,
+    "Nb_Bonnes"       integer not null default 0,
+    "Score_Total"     numeric not null default 0,   -- scores historiques fractionnaires (0.5)
+    "Temps_Total"     bigint  not null default 0,
+    "Marge_Total"     bigint  not null default 0,
+    "Maj"             timestamptz not null default now(),
+    primary key ("Users_Id", "Type_Operation", "Parcours_Id", "Jour")
+);
+
+-- Tables créées avant le passage en numeric (le bigint arrondissait les scores 0.5)
+alter table "Cumul_Quotidien" alter column "Score_Total" type numeric;
+
+create or replace function maj_cumul_quotidien() returns trigger
+language plpgsql as $$
+begin
+    insert into "Cumul_Quotidien" ("Users_Id", "Type_Operation", "Parcours_Id", "Jour", "Nb_Observations",
+                                   "Nb_Bonnes", "Score_Total", "Temps_Total", "Marge_Total", "Maj")
+    select e."Users_Id", coalesce(p."Type_Operation", 'Inconnu'), coalesce(n."Parcours_Id", 0), e."Date",
+           count(*), count(*) filter (where n."Etat" = 'VRAI'), coalesce(sum(n."Score"), 0),
+           coalesce(sum(n."Temps_Seconds"), 0), coalesce(sum(n."Marge_Erreur"), 0), now()
+    from nouvelles n
+    join "Entrainement" e on e.id = n."Entrainement_Id"
+    left join "Parcours" p on p.id = n."Parcours_Id"
+    where e."Date" is not null
+    group by 1, 2, 3, 4
+    on conflict ("Users_Id", "Type_Operation", "Parcours_Id", "Jour") do update
+        set "Nb_Observations" = "Cumul_Quotidien"."Nb_Observations" + excluded."Nb_Observations",
+            "Nb_Bonnes"       = "Cumul_Quotidien"."Nb_Bonnes" + excluded."Nb_Bonnes",
+            "Score_Total"     = "Cumul_Quotidien"."Score_Total" + excluded."Score_Total",
+            "Temps_Total"     = "Cumul_Quotidien"."Temps_Total" + excluded."Temps_Total",
+            "Marge_Total"     = "Cumul_Quotidien"."Marge_Total" + excluded."Marge_Total",
+            "Maj"             = now();
+    return null;
+end;
+$$;
+
+drop trigger if exists trg_cumul_quotidien on "Observations";
+create trigger trg_cumul_quotidien
+    after insert on "Observations"
+    referencing new table as nouvelles
+    for each statement execute function maj_cumul_quotidien();
+
+-- Valeurs attendues, recalculées depuis les Observations brutes
+-- (drop : create or replace view ne peut pas changer le type de Score_Total)
+drop view if exists "Cumul_Quotidien_Attendu";
+create view "Cumul_Quotidien_Attendu" as
+select e."Users_Id", coalesce(p."Type_Operation", 'Inconnu') as "Type_Operation",
+       coalesce(o."Parcours_Id", 0) as "Parcours_Id", e."Date" as "Jour",
+       count(*)::integer as "Nb_Observations", (count(*) filter (where o."Etat" = 'VRAI'))::integer as "Nb_Bonnes",
+       coalesce(sum(o."Score"), 0)::numeric as "Score_Total", coalesce(sum(o."Temps_Seconds"), 0)::bigint as "Temps_Total",
+       coalesce(sum(o."Marge_Erreur"), 0)::bigint as "Marge_Total"
+from "Observations" o
+join "Entrainement" e on e.id = o."Entrainement_Id"
+left join "Parcours" p on p.id = o."Parcours_Id"
+where e."Date" is not null
+group by 1, 2, 3, 4;
+
+-- Reconstruction hors ligne (reprise, ou après correction de données) : retourne le nombre de lignes
+create or replace function reconstruire_cumuls_quotidiens() returns integer
+language plpgsql as $$
+declare
+    nb_lignes integer;
+begin
+    lock table "Cumul_Quotidien" in share row exclusive mode;
+    delete from "Cumul_Quotidien";
+    insert into "Cumul_Quotidien" ("Users_Id", "Type_Operation", "Parcours_Id", "Jour", "Nb_Observations",
+                                   "Nb_Bonnes", "Score_Total", "Temps_Total", "Marge_Total")
+    select "Users_Id", "Type_Operation", "Parcours_Id", "Jour", "Nb_Observations",
+           "Nb_Bonnes", "Score_Total", "Temps_Total", "Marge_Total"
+    from "Cumul_Quotidien_Attendu";
+    get diagnostics nb_lignes = row_count;
+    return nb_lignes;
+end;
+$$;
+
+select reconstruire_cumuls_quotidiens();
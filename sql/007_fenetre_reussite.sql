@@ -0,0 +1,118 @@
+-- Fenêtre glissante de réussite par (utilisateur, Parcours) : les `Critere` derniers états
+-- depuis la dernière décision de niveau, en tampon circulaire, et le nombre de bonnes réponses
+-- parmi eux (cf. progression.py). enregistrer_entrainement (sql/004) la met à jour avec les
+-- observations de la session et décide du niveau sans relire l'historique.
+--
+-- La fenêtre est ouverte après une décision : "Depuis_Observation_Id" est le
+-- Derniere_Observation_Id de la position au moment de l'ouverture. Si la position a changé
+-- depuis (nouvelle décision), la fenêtre stockée est périmée et repart de zéro.
+-- "Serie_Bonnes" (bonnes réponses consécutives en cours) sert au mode saut de niveaux (sql/008).
+--
+-- À appliquer avant de ré-exécuter sql/004 (enregistrer_entrainement appelle maj_fenetre_reussite).
+
+create table if not exists "Fenetre_Reussite" (
+    "Users_Id"              bigint    not null references "Users"(id) on delete cascade,
+    "Parcours_Id"           bigint    not null references "Parcours"(id) on delete cascade,
+    "Critere"               integer   not null,
+    "Depuis_Observation_Id" bigint    not null default 0,
+    "Nb"                    integer   not null default 0,   -- états ajoutés depuis l'ouverture
+    "Nb_Bonnes"             integer   not null default 0,   -- VRAI parmi les `Critere` derniers
+    "Serie_Bonnes"          integer   not null default 0,   -- VRAI consécutifs jusqu'au dernier état
+    "Etats"                 integer[] not null,             -- tampon : "Etats"[Nb % Critere + 1] = prochain
+    "Maj"                   timestamptz not null default now(),
+    primary key ("Users_Id", "Parcours_Id")
+);
+
+alter table "Fenetre_Reussite" add column if not exists "Serie_Bonnes" integer not null default 0;
+
+create or replace function maj_fenetre_reussite(
+    p_user_id     bigint,
+    p_parcours_id bigint,
+    p_critere     integer,
+    p_depuis      bigint,
+    p_etats       text[]
+) returns "Fenetre_Reussite"
+language plpgsql as $$
+declare
+    v_f       "Fenetre_Reussite"%rowtype;
+    v_etat    text;
+    v_i       integer;
+    v_nouveau integer;
+begin
+    select * into v_f
+    from "Fenetre_Reussite"
+    where "Users_Id" = p_user_id and "Parcours_Id" = p_parcours_id
+    for update;
+    if not found or v_f."Depuis_Observation_Id" <> p_depuis or v_f."Critere" <> p_critere then
+        v_f."Users_Id" := p_user_id;
+        v_f."Parcours_Id" := p_parcours_id;
+        v_f."Critere" := p_critere;
+        v_f."Depuis_Observation_Id" := p_depuis;
+        v_f."Nb" := 0;
+        v_f."Nb_Bonnes" := 0;
+        v_f."Serie_Bonnes" := 0;
+        v_f."Etats" := array_fill(0, array[greatest(p_critere, 0)]);
+    end if;
+
+    foreach v_etat in array coalesce(p_etats, '{}') loop
+        if p_critere > 0 then
+            v_nouveau := case when v_etat = 'VRAI' then 1 else 0 end;
+            v_i := v_f."Nb" % p_critere + 1;
+            if v_f."Nb" >= p_critere then
+                v_f."Nb_Bonnes" := v_f."Nb_Bonnes" - v_f."Etats"[v_i];
+            end if;
+            v_f."Etats"[v_i] := v_nouveau;
+            v_f."Nb_Bonnes" := v_f."Nb_Bonnes" + v_nouveau;
+        end if;
+        v_f."Serie_Bonnes" := case when v_etat = 'VRAI' then v_f."Serie_Bonnes" + 1 else 0 end;
+        v_f."Nb" := v_f."Nb" + 1;
+    end loop;
+
+    insert into "Fenetre_Reussite" ("Users_Id", "Parcours_Id", "Critere", "Depuis_Observation_Id",
+                                    "Nb", "Nb_Bonnes", "Serie_Bonnes", "Etats", "Maj")
+    values (p_user_id, p_parcours_id, p_critere, p_depuis, v_f."Nb", v_f."Nb_Bonnes", v_f."Serie_Bonnes",
+            v_f."Etats", now())
+    on conflict ("Users_Id", "Parcours_Id") do update
+        set "Critere"               = excluded."Critere",
+            "Depuis_Observation_Id" = excluded."Depuis_Observation_Id",
+            "Nb"                    = excluded."Nb",
+            "Nb_Bonnes"             = excluded."Nb_Bonnes",
+            "Serie_Bonnes"          = excluded."Serie_Bonnes",
+            "Etats"                 = excluded."Etats",
+            "Maj"                   = now();
+    return v_f;
+end;
+$$;
+
+-- Reconstruction depuis les Observations : une fenêtre par position actuelle, remplie avec les
+-- observations postérieures à sa dernière décision. Retourne le nombre de fenêtres écrites.
+create or replace function reconstruire_fenetres_reussite() returns integer
+language plpgsql as $$
+declare
+    v_pos     record;
+    nb_lignes integer := 0;
+begin
+    lock table "Fenetre_Reussite" in share row exclusive mode;
+    delete from "Fenetre_Reussite";
+
+    for v_pos in
+        select pa."Users_Id", pa."Parcours_Id", p."Critere", coalesce(pa."Derniere_Observation_Id", 0) as depuis
+        from "Position_Actuelle" pa
+        join "Parcours" p on p.id = pa."Parcours_Id"
+    loop
+        perform maj_fenetre_reussite(v_pos."Users_Id", v_pos."Parcours_Id", v_pos."Critere", v_pos.depuis, array(
+            select o."Etat"
+            from "Observations" o
+            join "Entrainement" e on e.id = o."Entrainement_Id"
+            where e."Users_Id" = v_pos."Users_Id"
+              and o."Parcours_Id" = v_pos."Parcours_Id"
+              and o.id > v_pos.depuis
+            order by o.id
+        ));
+        nb_lignes := nb_lignes + 1;
+    end loop;
+    return nb_lignes;
+end;
+$$;
+
+select reconstruire_fenetres_reussite();
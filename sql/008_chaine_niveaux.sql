@@ -0,0 +1,45 @@
+-- Chaîne de niveaux par type d'opération : les Parcours triés par Niveau (puis id), avec leur
+-- rang dans le type (cf. chaine_niveaux, progression.py). enregistrer_entrainement (sql/004)
+-- passe au niveau suivant / précédent par le rang, et non plus par l'id le plus proche.
+--
+-- À appliquer avant de ré-exécuter sql/004 (enregistrer_entrainement appelle niveau_voisin).
+
+-- Niveau converti en nombre, ou null s'il ne l'est pas (colonne texte dans le schéma historique)
+create or replace function niveau_numerique(p_niveau text) returns numeric
+language plpgsql immutable as $$
+begin
+    return p_niveau::numeric;
+exception when others then
+    return null;
+end;
+$$;
+
+-- Même ordre que progression.cle_niveau : niveaux numériques (par valeur, "2" avant "10"),
+-- puis non numériques (par texte, ordre des codes comme en Python), puis sans niveau ; enfin id
+create or replace view "Chaine_Niveaux" as
+with niveaux as (
+    select id, "Type_Operation", "Niveau", niveau_numerique("Niveau"::text) as valeur
+    from "Parcours"
+)
+select id, "Type_Operation", "Niveau",
+       row_number() over (
+           partition by "Type_Operation"
+           order by case when valeur is not null then 0 when "Niveau" is not null then 1 else 2 end,
+                    valeur,
+                    case when valeur is null then "Niveau"::text end collate "C",
+                    id
+       )::integer as "Rang",
+       count(*) over (partition by "Type_Operation")::integer as "Nb_Niveaux"
+from niveaux;
+
+-- Parcours `p_pas` rangs plus loin dans le même type (négatif : plus bas), borné aux extrémités
+create or replace function niveau_voisin(p_parcours_id bigint, p_pas integer) returns bigint
+language sql stable as $$
+    select coalesce((
+        select v.id
+        from "Chaine_Niveaux" c
+        join "Chaine_Niveaux" v on v."Type_Operation" = c."Type_Operation"
+        where c.id = p_parcours_id
+          and v."Rang" = greatest(1, least(c."Rang" + p_pas, c."Nb_Niveaux"))
+    ), p_parcours_id);
+$$;
@@ -0,0 +1,990 @@
+"""
+Couche de stockage de Pixel.
+
+Toute l'application parle au stockage via le sous-ensemble du query builder
+PostgREST déjà utilisé partout dans calcul_pixel.py :
+
+    client.table("T").select("a, b").eq(...).ilike(...).gt(...).lt(...).in_(...)
+          .order("id", desc=True).limit(n).execute().data
+    client.table("T").insert(row_ou_liste).execute().data
+    client.rpc("fonction", {...}).execute().data
+
+Deux implémentations derrière cette même interface :
+- Supabase : le client officiel (create_client), inchangé ;
+- SQLite   : SQLiteClient ci-dessous, pour un réplica co-localisé, un déploiement
+             mono-nœud ou des benchmarks sans réseau.
+
+Les migrations SQLite (SQLITE_MIGRATIONS) alignent le schéma historique de
+monstro.db sur les noms de colonnes de production et recréent les tables
+dérivées de sql/*.sql (triggers compris). Les fonctions serveur appelées par
+rpc() ont leur équivalent Python dans SQLITE_RPC.
+
+La migration renomme et supprime les tables historiques : elle n'est jamais appliquée à un
+chemin implicite. Pour garder la base d'origine intacte, migrer une copie :
+
+    python storage.py migrate monstro.db pixel.db     # copie monstro.db dans pixel.db, puis migre pixel.db
+    python storage.py migrate pixel.db                # migre pixel.db en place
+
+Contrôle des compteurs de score (sql/002-003) contre les Observations brutes, sur une base
+SQLite donnée ou, sans fichier, sur le backend configuré pour l'app (.streamlit/secrets.toml).
+La base SQLite doit déjà être migrée (erreur sinon, sans y toucher) :
+
+    python storage.py scores verifier [pixel.db]      # écarts par (utilisateur, type) ; code 1 s'il y en a
+    python storage.py scores reconcilier [pixel.db]   # reconstruit Score_Utilisateur et Score_Type_Utilisateur
+"""
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+
+import activite
+from progression import (chaine_niveaux, decider_evolution, fenetre_ajouter, fenetre_courante, fenetre_taux,
+                         niveaux_franchis, parcours_cible)
+
+IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def _quote(identifier: str) -> str:
+    identifier = identifier.strip()
+    if not IDENTIFIER.match(identifier):
+        raise ValueError(f"Identifiant SQL invalide : {identifier!r}")
+    return f'"{identifier}"'
+
+
+class StorageResponse:
+    """Réponse minimale compatible avec postgrest.APIResponse (.data)."""
+
+    def __init__(self, data):
+        self.data = data
+        self.count = None
+
+
+class SQLiteQuery:
+    """Query builder SQLite : même chaînage que postgrest.SyncRequestBuilder."""
+
+    def __init__(self, client, table: str):
+        self._client = client
+        self._table = _quote(table)
+        self._columns = "*"
+        self._where = []
+        self._params = []
+        self._order = []
+        self._limit = None
+        self._insert = None
+
+    # --- Lecture ---
+    def select(self, columns: str = "*", **_options):
+        columns = columns.strip()
+        if columns != "*":
+            columns = ", ".join(_quote(c) for c in columns.split(",") if c.strip())
+        self._columns = columns
+        return self
+
+    def _filter(self, column, operator, value):
+        self._where.append(f"{_quote(column)} {operator} ?")
+        self._params.append(value)
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, "=", value)
+
+    def gt(self, column, value):
+        return self._filter(column, ">", value)
+
+    def lt(self, column, value):
+        return self._filter(column, "<", value)
+
+    def ilike(self, column, pattern):
+        # PostgREST accepte * comme joker ; LIKE SQLite est insensible à la casse (ASCII)
+        return self._filter(column, "LIKE", str(pattern).replace("*", "%"))
+
+    def in_(self, column, values):
+        values = list(values)
+        self._where.append(f"{_quote(column)} IN ({', '.join('?' for _ in values)})")
+        self._params.extend(values)
+        return self
+
+    def order(self, column, desc: bool = False, **_options):
+        # Comme PostgreSQL : NULL en dernier en ASC, en premier en DESC
+        direction = "DESC NULLS FIRST" if desc else "ASC NULLS LAST"
+        self._order.append(f"{_quote(column)} {direction}")
+        return self
+
+    def limit(self, size: int, **_options):
+        self._limit = int(size)
+        return self
+
+    # --- Écriture ---
+    def insert(self, data, **_options):
+        self._insert = data if isinstance(data, list) else [data]
+        return self
+
+    def execute(self) -> StorageResponse:
+        if self._insert is not None:
+            return StorageResponse(self._client._insert(self._table, self._insert))
+
+        sql = f"SELECT {self._columns} FROM {self._table}"
+        if self._where:
+            sql += " WHERE " + " AND ".join(self._where)
+        if self._order:
+            sql += " ORDER BY " + ", ".join(self._order)
+        if self._limit is not None:
+            sql += f" LIMIT {self._limit}"
+        return StorageResponse(self._client._fetch(sql, self._params))
+
+
+class SQLiteRPC:
+    def __init__(self, client, name: str, params: dict):
+        if name not in SQLITE_RPC:
+            raise ValueError(f"Fonction RPC inconnue pour SQLite : {name}")
+        self._client = client
+        self._name = name
+        self._params = params or {}
+
+    def execute(self) -> StorageResponse:
+        return StorageResponse(self._client._call(SQLITE_RPC[self._name], self._params))
+
+
+class SQLiteClient:
+    """
+    Client SQLite compatible avec le sous-ensemble du client Supabase utilisé par l'app.
+    Une connexion par client, partagée entre threads (accès sérialisés par un verrou).
+    Le trigger du calendrier d'activité appelle activite_ajouter, enregistrée sur cette connexion :
+    les insertions dans Observations passent par ce client (pas par l'outil sqlite3).
+    """
+
+    def __init__(self, path: str, migrate: bool = True):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.create_function("activite_ajouter", 6, _activite_ajouter, deterministic=True)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        if migrate:
+            migrate_sqlite(self._conn)
+
+    def table(self, name: str) -> SQLiteQuery:
+        return SQLiteQuery(self, name)
+
+    def rpc(self, name: str, params: dict = None) -> SQLiteRPC:
+        return SQLiteRPC(self, name, params)
+
+    def close(self):
+        self._conn.close()
+
+    def _fetch(self, sql, params):
+        with self._lock:
+            return [dict(r) for r in self._conn.execute(sql, params).fetchall()]
+
+    def _insert(self, table, rows):
+        if not rows:
+            return []
+        inserted = []
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for row in rows:
+                    columns = ", ".join(_quote(c) for c in row)
+                    placeholders = ", ".join("?" for _ in row)
+                    sql = f"INSERT INTO {table} ({columns}) VALUES ({placeholders}) RETURNING *"
+                    inserted.append(dict(self._conn.execute(sql, list(row.values())).fetchone()))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return inserted
+
+    def _call(self, function, params):
+        """Exécute une fonction RPC Python dans une transaction (équivalent d'une fonction plpgsql)."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = function(self._conn, **params)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return result
+
+
+# --------------------- MIGRATIONS SQLITE ---------------------
+
+SCHEMA_PRODUCTION = """
+CREATE TABLE IF NOT EXISTS "Users" (
+    "id"            INTEGER PRIMARY KEY AUTOINCREMENT,
+    "name"          TEXT NOT NULL,
+    "email"         TEXT NOT NULL UNIQUE,
+    "password_hash" TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS "Parcours" (
+    "id"             INTEGER PRIMARY KEY AUTOINCREMENT,
+    "Niveau"         NUMERIC,
+    "Type_Operation" TEXT,
+    "Critere"        INTEGER NOT NULL DEFAULT 10,
+    "Operateur1_Min" INTEGER NOT NULL DEFAULT 0,
+    "Operateur1_Max" INTEGER NOT NULL DEFAULT 10,
+    "Operateur2_Min" INTEGER NOT NULL DEFAULT 0,
+    "Operateur2_Max" INTEGER NOT NULL DEFAULT 10,
+    "Sujet"          TEXT,
+    "Lecon"          TEXT
+);
+CREATE TABLE IF NOT EXISTS "Entrainement" (
+    "id"          INTEGER PRIMARY KEY AUTOINCREMENT,
+    "Users_Id"    INTEGER NOT NULL REFERENCES "Users"("id") ON DELETE CASCADE,
+    "Parcours_Id" INTEGER REFERENCES "Parcours"("id"),
+    "Date"        TEXT NOT NULL,
+    "Time"        TEXT,
+    "Volume"      INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS "Observations" (
+    "id"              INTEGER PRIMARY KEY AUTOINCREMENT,
+    "Entrainement_Id" INTEGER NOT NULL REFERENCES "Entrainement"("id") ON DELETE CASCADE,
+    "Parcours_Id"     INTEGER REFERENCES "Parcours"("id"),
+    "Operateur_Un"    INTEGER,
+    "Operateur_Deux"  INTEGER,
+    "Operation"       TEXT,
+    "Etat"            TEXT NOT NULL,
+    "Correction"      TEXT NOT NULL DEFAULT 'NON',
+    "Score"           INTEGER NOT NULL DEFAULT 0,
+    "Temps_Seconds"   INTEGER,
+    "Marge_Erreur"    INTEGER
+);
+CREATE TABLE IF NOT EXISTS "Suivi_Parcours" (
+    "id"                      INTEGER PRIMARY KEY AUTOINCREMENT,
+    "Users_Id"                INTEGER NOT NULL REFERENCES "Users"("id") ON DELETE CASCADE,
+    "Parcours_Id"             INTEGER NOT NULL REFERENCES "Parcours"("id"),
+    "Date"                    TEXT NOT NULL,
+    "Taux_Reussite"           REAL NOT NULL DEFAULT 0,
+    "Type_Evolution"          TEXT NOT NULL
+        CHECK ("Type_Evolution" IN ('initialisation', 'progression', 'stagnation', 'régression')),
+    "Derniere_Observation_Id" INTEGER
+);
+CREATE TABLE IF NOT EXISTS "Exercices" (
+    "id"           INTEGER PRIMARY KEY AUTOINCREMENT,
+    "Parcours_Id"  INTEGER NOT NULL REFERENCES "Parcours"("id"),
+    "Probleme"     TEXT NOT NULL,
+    "Solution"     TEXT NOT NULL,
+    "Indice_Un"    TEXT,
+    "Indice_Deux"  TEXT,
+    "Origine"      TEXT,
+    "Choix_Un"     TEXT,
+    "Choix_Deux"   TEXT,
+    "Choix_Trois"  TEXT,
+    "Choix_Quatre" TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_entrainement_user ON "Entrainement" ("Users_Id", "id");
+CREATE INDEX IF NOT EXISTS idx_observations_entrainement ON "Observations" ("Entrainement_Id", "id");
+CREATE INDEX IF NOT EXISTS idx_observations_parcours ON "Observations" ("Parcours_Id", "id");
+CREATE INDEX IF NOT EXISTS idx_suivi_user ON "Suivi_Parcours" ("Users_Id", "id");
+"""
+
+# Copie du schéma historique de monstro.db vers les noms de production
+REPRISE_LEGACY = """
+INSERT INTO "Users" ("id", "name", "email", "password_hash")
+    SELECT "Id", "name", "email", "password_hash" FROM "users_legacy";
+INSERT INTO "Parcours" ("id", "Niveau", "Type_Operation", "Critere", "Sujet", "Lecon")
+    SELECT "Id", "Niveau",
+           CASE WHEN trim("Sujet") = 'Opération'
+                 AND trim("Lecon") IN ('Addition', 'Soustraction', 'Multiplication')
+                THEN trim("Lecon") END,
+           "Critere", "Sujet", "Lecon"
+    FROM "Parcours_legacy";
+INSERT INTO "Entrainement" ("id", "Users_Id", "Parcours_Id", "Date", "Time", "Volume")
+    SELECT "Id", "Users_Id", "Parcours_Id", "Date", "Heure", "Volume" FROM "Entrainement_legacy";
+INSERT INTO "Observations" ("id", "Entrainement_Id", "Operation", "Etat", "Correction", "Score")
+    SELECT "Id", "Entrainement_Id", "Question", "Etat", "Correction", "Score" FROM "Observation_legacy";
+INSERT INTO "Suivi_Parcours"
+        ("id", "Users_Id", "Parcours_Id", "Date", "Taux_Reussite", "Type_Evolution", "Derniere_Observation_Id")
+    SELECT "Id", "Users_Id", "Parcours_Id", "Date", "Taux_Reussite", "Type_Evolution", "Derniere_Observation_Id"
+    FROM "Suivi_Parcours_legacy";
+INSERT INTO "Exercices" ("id", "Parcours_Id", "Probleme", "Solution", "Indice_Un", "Indice_Deux", "Origine",
+                         "Choix_Un", "Choix_Deux", "Choix_Trois", "Choix_Quatre")
+    SELECT "Id", "Parcours_Id", "Probleme", "Solution", "Indice_Un", "Indice_Deux", "Origine",
+           "Choix_Un", "Choix_Deux", "Choix_Trois", "Choix_Quatre"
+    FROM "Exercices_legacy";
+"""
+
+LEGACY_TABLES = ["users", "Parcours", "Entrainement", "Observation", "Suivi_Parcours", "Exercices"]
+
+
+def _table_names(conn):
+    return {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def _columns(conn, table):
+    return {r[1] for r in conn.execute(f"PRAGMA table_info({_quote(table)})")}
+
+
+def _migration_schema_production(conn):
+    """Crée le schéma de production ; reprend le schéma historique de monstro.db s'il est présent."""
+    legacy = "Observation" in _table_names(conn) and "Id" in _columns(conn, "users")
+    if legacy:
+        # Les noms de tables SQLite sont insensibles à la casse : users -> Users impose un détour
+        for table in LEGACY_TABLES:
+            conn.execute(f'ALTER TABLE {_quote(table)} RENAME TO {_quote(table + "_legacy")}')
+    for statement in _split(SCHEMA_PRODUCTION):
+        conn.execute(statement)
+    if legacy:
+        for statement in _split(REPRISE_LEGACY):
+            conn.execute(statement)
+        for table in LEGACY_TABLES:
+            conn.execute(f'DROP TABLE {_quote(table + "_legacy")}')
+
+
+POSITION_ACTUELLE = """
+CREATE TABLE IF NOT EXISTS "Position_Actuelle" (
+    "Users_Id"                INTEGER NOT NULL REFERENCES "Users"("id") ON DELETE CASCADE,
+    "Type_Operation"          TEXT    NOT NULL,
+    "Parcours_Id"             INTEGER NOT NULL REFERENCES "Parcours"("id"),
+    "Suivi_Id"                INTEGER NOT NULL,
+    "Derniere_Observation_Id" INTEGER,
+    "Date"                    TEXT,
+    PRIMARY KEY ("Users_Id", "Type_Operation")
+);
+CREATE TRIGGER IF NOT EXISTS trg_position_actuelle AFTER INSERT ON "Suivi_Parcours"
+BEGIN
+    INSERT INTO "Position_Actuelle"
+        ("Users_Id", "Type_Operation", "Parcours_Id", "Suivi_Id", "Derniere_Observation_Id", "Date")
+    SELECT NEW."Users_Id", p."Type_Operation", NEW."Parcours_Id", NEW."id", NEW."Derniere_Observation_Id", NEW."Date"
+    FROM "Parcours" p
+    WHERE p."id" = NEW."Parcours_Id" AND p."Type_Operation" IS NOT NULL
+    ON CONFLICT ("Users_Id", "Type_Operation") DO UPDATE
+        SET "Parcours_Id"             = excluded."Parcours_Id",
+            "Suivi_Id"                = excluded."Suivi_Id",
+            "Derniere_Observation_Id" = excluded."Derniere_Observation_Id",
+            "Date"                    = excluded."Date"
+        WHERE "Position_Actuelle"."Suivi_Id" < excluded."Suivi_Id";
+END;
+INSERT INTO "Position_Actuelle"
+    ("Users_Id", "Type_Operation", "Parcours_Id", "Suivi_Id", "Derniere_Observation_Id", "Date")
+SELECT s."Users_Id", p."Type_Operation", s."Parcours_Id", s."id", s."Derniere_Observation_Id", s."Date"
+FROM "Suivi_Parcours" s
+JOIN "Parcours" p ON p."id" = s."Parcours_Id"
+WHERE p."Type_Operation" IS NOT NULL
+  AND s."id" = (
+      SELECT max(s2."id") FROM "Suivi_Parcours" s2
+      JOIN "Parcours" p2 ON p2."id" = s2."Parcours_Id"
+      WHERE s2."Users_Id" = s."Users_Id" AND p2."Type_Operation" = p."Type_Operation"
+  )
+ON CONFLICT ("Users_Id", "Type_Operation") DO NOTHING;
+"""
+
+SCORE_UTILISATEUR = """
+CREATE TABLE IF NOT EXISTS "Score_Utilisateur" (
+    "Users_Id"        INTEGER PRIMARY KEY REFERENCES "Users"("id") ON DELETE CASCADE,
+    "Score_Total"     INTEGER NOT NULL DEFAULT 0,
+    "Nb_Observations" INTEGER NOT NULL DEFAULT 0,
+    "Maj"             TEXT    NOT NULL DEFAULT (datetime('now'))
+);
+CREATE INDEX IF NOT EXISTS idx_score_utilisateur_top ON "Score_Utilisateur" ("Score_Total" DESC, "Users_Id");
+CREATE TRIGGER IF NOT EXISTS trg_init_score_utilisateur AFTER INSERT ON "Users"
+BEGIN
+    INSERT INTO "Score_Utilisateur" ("Users_Id") VALUES (NEW."id")
+    ON CONFLICT ("Users_Id") DO NOTHING;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_score_utilisateur AFTER INSERT ON "Observations"
+BEGIN
+    INSERT INTO "Score_Utilisateur" ("Users_Id", "Score_Total", "Nb_Observations", "Maj")
+    SELECT e."Users_Id", NEW."Score", 1, datetime('now')
+    FROM "Entrainement" e
+    WHERE e."id" = NEW."Entrainement_Id"
+    ON CONFLICT ("Users_Id") DO UPDATE
+        SET "Score_Total"     = "Score_Utilisateur"."Score_Total" + excluded."Score_Total",
+            "Nb_Observations" = "Score_Utilisateur"."Nb_Observations" + 1,
+            "Maj"             = excluded."Maj";
+END;
+CREATE VIEW IF NOT EXISTS "Classement" AS
+SELECT s."Users_Id", u."name", s."Score_Total", s."Nb_Observations"
+FROM "Score_Utilisateur" s
+JOIN "Users" u ON u."id" = s."Users_Id";
+"""
+
+SCORE_TYPE_UTILISATEUR = """
+CREATE TABLE IF NOT EXISTS "Score_Type_Utilisateur" (
+    "Users_Id"        INTEGER NOT NULL REFERENCES "Users"("id") ON DELETE CASCADE,
+    "Type_Operation"  TEXT    NOT NULL,
+    "Score_Total"     INTEGER NOT NULL DEFAULT 0,
+    "Nb_Observations" INTEGER NOT NULL DEFAULT 0,
+    "Maj"             TEXT    NOT NULL DEFAULT (datetime('now')),
+    PRIMARY KEY ("Users_Id", "Type_Operation")
+);
+CREATE TRIGGER IF NOT EXISTS trg_score_type_utilisateur AFTER INSERT ON "Observations"
+WHEN NEW."Parcours_Id" IS NOT NULL
+BEGIN
+    INSERT INTO "Score_Type_Utilisateur" ("Users_Id", "Type_Operation", "Score_Total", "Nb_Observations", "Maj")
+    SELECT e."Users_Id", p."Type_Operation", NEW."Score", 1, datetime('now')
+    FROM "Entrainement" e
+    JOIN "Parcours" p ON p."id" = NEW."Parcours_Id"
+    WHERE e."id" = NEW."Entrainement_Id" AND p."Type_Operation" IS NOT NULL
+    ON CONFLICT ("Users_Id", "Type_Operation") DO UPDATE
+        SET "Score_Total"     = "Score_Type_Utilisateur"."Score_Total" + excluded."Score_Total",
+            "Nb_Observations" = "Score_Type_Utilisateur"."Nb_Observations" + 1,
+            "Maj"             = excluded."Maj";
+END;
+CREATE VIEW IF NOT EXISTS "Score_Type_Utilisateur_Attendu" AS
+SELECT e."Users_Id", p."Type_Operation", sum(o."Score") AS "Score_Total", count(*) AS "Nb_Observations"
+FROM "Observations" o
+JOIN "Entrainement" e ON e."id" = o."Entrainement_Id"
+JOIN "Parcours" p ON p."id" = o."Parcours_Id"
+WHERE p."Type_Operation" IS NOT NULL
+GROUP BY e."Users_Id", p."Type_Operation";
+"""
+
+ENREGISTREMENT_SESSION = """
+CREATE TABLE IF NOT EXISTS "Enregistrement_Session" (
+    "Cle"      TEXT PRIMARY KEY,
+    "Users_Id" INTEGER NOT NULL REFERENCES "Users"("id") ON DELETE CASCADE,
+    "Resultat" TEXT NOT NULL,
+    "Cree"     TEXT NOT NULL DEFAULT (datetime('now'))
+);
+"""
+
+ACTIVITE_UTILISATEUR = """
+CREATE TABLE IF NOT EXISTS "Activite_Utilisateur" (
+    "Users_Id"       INTEGER PRIMARY KEY REFERENCES "Users"("id") ON DELETE CASCADE,
+    "Debut"          TEXT    NOT NULL,
+    "Jours"          TEXT    NOT NULL,
+    "Dernier_Jour"   TEXT    NOT NULL,
+    "Serie_Courante" INTEGER NOT NULL,
+    "Serie_Max"      INTEGER NOT NULL,
+    "Maj"            TEXT    NOT NULL DEFAULT (datetime('now'))
+);
+CREATE TRIGGER IF NOT EXISTS trg_activite_utilisateur AFTER INSERT ON "Observations"
+BEGIN
+    INSERT INTO "Activite_Utilisateur" ("Users_Id", "Debut", "Jours", "Dernier_Jour", "Serie_Courante",
+                                        "Serie_Max", "Maj")
+    SELECT "Users_Id", json_extract(ligne, '$.Debut'), json_extract(ligne, '$.Jours'),
+           json_extract(ligne, '$.Dernier_Jour'), json_extract(ligne, '$.Serie_Courante'),
+           json_extract(ligne, '$.Serie_Max'), datetime('now')
+    FROM (
+        SELECT "Users_Id", CASE
+            -- Jour déjà actif (le reste de la session) : +1 dans "Jours", séries inchangées
+            WHEN CASE WHEN i >= 0 THEN json_extract("Jours", '$[' || i || ']') END > 0
+            THEN json_object('Debut', "Debut", 'Jours', json_set("Jours", '$[' || i || ']',
+                                                                 json_extract("Jours", '$[' || i || ']') + 1),
+                             'Dernier_Jour', "Dernier_Jour", 'Serie_Courante', "Serie_Courante",
+                             'Serie_Max', "Serie_Max")
+            ELSE activite_ajouter("Debut", "Jours", "Dernier_Jour", "Serie_Courante", "Serie_Max", jour)
+        END AS ligne
+        FROM (
+            SELECT e."Users_Id", e."Date" AS jour, a."Debut", a."Jours", a."Dernier_Jour", a."Serie_Courante",
+                   a."Serie_Max", CAST(julianday(date(e."Date")) - julianday(a."Debut") AS INTEGER) AS i
+            FROM "Entrainement" e
+            LEFT JOIN "Activite_Utilisateur" a ON a."Users_Id" = e."Users_Id"
+            WHERE e."id" = NEW."Entrainement_Id" AND e."Date" IS NOT NULL
+        )
+    ) WHERE true
+    ON CONFLICT ("Users_Id") DO UPDATE
+        SET "Debut"          = excluded."Debut",
+            "Jours"          = excluded."Jours",
+            "Dernier_Jour"   = excluded."Dernier_Jour",
+            "Serie_Courante" = excluded."Serie_Courante",
+            "Serie_Max"      = excluded."Serie_Max",
+            "Maj"            = excluded."Maj";
+END;
+"""
+
+CUMUL_QUOTIDIEN = """
+CREATE TABLE IF NOT EXISTS "Cumul_Quotidien" (
+    "Users_Id"        INTEGER NOT NULL REFERENCES "Users"("id") ON DELETE CASCADE,
+    "Type_Operation"  TEXT    NOT NULL,
+    "Parcours_Id"     INTEGER NOT NULL,
+    "Jour"            TEXT    NOT NULL,
+    "Nb_Observations" INTEGER NOT NULL DEFAULT 0,
+    "Nb_Bonnes"       INTEGER NOT NULL DEFAULT 0,
+    "Score_Total"     INTEGER NOT NULL DEFAULT 0,
+    "Temps_Total"     INTEGER NOT NULL DEFAULT 0,
+    "Marge_Total"     INTEGER NOT NULL DEFAULT 0,
+    "Maj"             TEXT    NOT NULL DEFAULT (datetime('now')),
+    PRIMARY KEY ("Users_Id", "Type_Operation", "Parcours_Id", "Jour")
+);
+CREATE TRIGGER IF NOT EXISTS trg_cumul_quotidien AFTER INSERT ON "Observations"
+BEGIN
+    INSERT INTO "Cumul_Quotidien" ("Users_Id", "Type_Operation", "Parcours_Id", "Jour", "Nb_Observations",
+                                   "Nb_Bonnes", "Score_Total", "Temps_Total", "Marge_Total", "Maj")
+    SELECT e."Users_Id", coalesce(p."Type_Operation", 'Inconnu'), coalesce(NEW."Parcours_Id", 0), e."Date", 1,
+           NEW."Etat" = 'VRAI', coalesce(NEW."Score", 0), coalesce(NEW."Temps_Seconds", 0),
+           coalesce(NEW."Marge_Erreur", 0), datetime('now')
+    FROM "Entrainement" e
+    LEFT JOIN "Parcours" p ON p."id" = NEW."Parcours_Id"
+    WHERE e."id" = NEW."Entrainement_Id" AND e."Date" IS NOT NULL
+    ON CONFLICT ("Users_Id", "Type_Operation", "Parcours_Id", "Jour") DO UPDATE
+        SET "Nb_Observations" = "Cumul_Quotidien"."Nb_Observations" + 1,
+            "Nb_Bonnes"       = "Cumul_Quotidien"."Nb_Bonnes" + excluded."Nb_Bonnes",
+            "Score_Total"     = "Cumul_Quotidien"."Score_Total" + excluded."Score_Total",
+            "Temps_Total"     = "Cumul_Quotidien"."Temps_Total" + excluded."Temps_Total",
+            "Marge_Total"     = "Cumul_Quotidien"."Marge_Total" + excluded."Marge_Total",
+            "Maj"             = excluded."Maj";
+END;
+CREATE VIEW IF NOT EXISTS "Cumul_Quotidien_Attendu" AS
+SELECT e."Users_Id", coalesce(p."Type_Operation", 'Inconnu') AS "Type_Operation",
+       coalesce(o."Parcours_Id", 0) AS "Parcours_Id", e."Date" AS "Jour",
+       count(*) AS "Nb_Observations", sum(o."Etat" = 'VRAI') AS "Nb_Bonnes",
+       coalesce(sum(o."Score"), 0) AS "Score_Total", coalesce(sum(o."Temps_Seconds"), 0) AS "Temps_Total",
+       coalesce(sum(o."Marge_Erreur"), 0) AS "Marge_Total"
+FROM "Observations" o
+JOIN "Entrainement" e ON e."id" = o."Entrainement_Id"
+LEFT JOIN "Parcours" p ON p."id" = o."Parcours_Id"
+WHERE e."Date" IS NOT NULL
+GROUP BY 1, 2, 3, 4;
+"""
+
+FENETRE_REUSSITE = """
+CREATE TABLE IF NOT EXISTS "Fenetre_Reussite" (
+    "Users_Id"              INTEGER NOT NULL REFERENCES "Users"("id") ON DELETE CASCADE,
+    "Parcours_Id"           INTEGER NOT NULL REFERENCES "Parcours"("id") ON DELETE CASCADE,
+    "Critere"               INTEGER NOT NULL,
+    "Depuis_Observation_Id" INTEGER NOT NULL DEFAULT 0,
+    "Nb"                    INTEGER NOT NULL DEFAULT 0,
+    "Nb_Bonnes"             INTEGER NOT NULL DEFAULT 0,
+    "Serie_Bonnes"          INTEGER NOT NULL DEFAULT 0,
+    "Etats"                 TEXT    NOT NULL,
+    "Maj"                   TEXT    NOT NULL DEFAULT (datetime('now')),
+    PRIMARY KEY ("Users_Id", "Parcours_Id")
+);
+"""
+
+
+def _migration_serie_bonnes(conn):
+    """Bases passées en version 8 avant l'ajout de la colonne (créée directement par FENETRE_REUSSITE sinon)."""
+    if "Serie_Bonnes" not in _columns(conn, "Fenetre_Reussite"):
+        conn.execute('ALTER TABLE "Fenetre_Reussite" ADD COLUMN "Serie_Bonnes" INTEGER NOT NULL DEFAULT 0')
+
+
+def _split(script: str):
+    """Découpe un script en instructions, en gardant les corps de triggers (BEGIN ... END;) entiers."""
+    statements, current = [], []
+    for line in script.strip().splitlines():
+        current.append(line)
+        text = "\n".join(current).strip()
+        if text.endswith(";") and sqlite3.complete_statement(text):
+            statements.append(text)
+            current = []
+    if "\n".join(current).strip():
+        statements.append("\n".join(current).strip())
+    return statements
+
+
+def _script(script: str):
+    def step(conn):
+        for statement in _split(script):
+            conn.execute(statement)
+    return step
+
+
+def _backfill(rpc_name: str):
+    def step(conn):
+        SQLITE_RPC[rpc_name](conn)
+    return step
+
+
+# (version, description, étapes) — appliquées dans l'ordre, suivies par PRAGMA user_version
+SQLITE_MIGRATIONS = [
+    (1, "schéma de production (reprise de monstro.db)", [_migration_schema_production]),
+    (2, "Position_Actuelle (sql/001)", [_script(POSITION_ACTUELLE)]),
+    (3, "Score_Utilisateur + Classement (sql/002)",
+        [_script(SCORE_UTILISATEUR), _backfill("reconcilier_scores_utilisateurs")]),
+    (4, "Score_Type_Utilisateur (sql/003)",
+        [_script(SCORE_TYPE_UTILISATEUR), _backfill("reconcilier_scores_par_type")]),
+    (5, "Enregistrement_Session (sql/004)", [_script(ENREGISTREMENT_SESSION)]),
+    (6, "Activite_Utilisateur (sql/005)",
+        [_script(ACTIVITE_UTILISATEUR), _backfill("reconstruire_activite_utilisateurs")]),
+    (7, "Cumul_Quotidien (sql/006)", [_script(CUMUL_QUOTIDIEN), _backfill("reconstruire_cumuls_quotidiens")]),
+    (8, "Fenetre_Reussite (sql/007)", [_script(FENETRE_REUSSITE), _backfill("reconstruire_fenetres_reussite")]),
+    (9, "Fenetre_Reussite.Serie_Bonnes (sql/007, mode saut de sql/008)",
+        [_migration_serie_bonnes, _backfill("reconstruire_fenetres_reussite")]),
+    (10, "Activite_Utilisateur tenu par trigger sur Observations (sql/005)",
+        [_script(ACTIVITE_UTILISATEUR), _backfill("reconstruire_activite_utilisateurs")]),
+]
+
+
+def migrate_sqlite(conn) -> int:
+    """Applique les migrations manquantes, chacune dans sa transaction. Retourne la version finale."""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    foreign_keys = conn.execute("PRAGMA foreign_keys").fetchone()[0]
+    conn.execute("PRAGMA foreign_keys = OFF")      # reprise des tables historiques
+    try:
+        for target, _description, steps in SQLITE_MIGRATIONS:
+            if target <= version:
+                continue
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for step in steps:
+                    step(conn)
+                conn.execute(f"PRAGMA user_version = {int(target)}")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            version = target
+    finally:
+        conn.execute(f"PRAGMA foreign_keys = {'ON' if foreign_keys else 'OFF'}")
+    return version
+
+
+# --------------------- FONCTIONS RPC (équivalents SQLite) ---------------------
+
+SQLITE_RPC = {}
+
+
+def sqlite_rpc(name: str):
+    def register(function):
+        SQLITE_RPC[name] = function
+        return function
+    return register
+
+
+@sqlite_rpc("reconcilier_scores_utilisateurs")
+def _reconcilier_scores_utilisateurs(conn) -> int:
+    before = conn.total_changes
+    conn.execute("""
+        INSERT INTO "Score_Utilisateur" ("Users_Id", "Score_Total", "Nb_Observations", "Maj")
+        SELECT u."id", coalesce(sum(o."Score"), 0), count(o."id"), datetime('now')
+        FROM "Users" u
+        LEFT JOIN "Entrainement" e ON e."Users_Id" = u."id"
+        LEFT JOIN "Observations" o ON o."Entrainement_Id" = e."id"
+        GROUP BY u."id"
+        ON CONFLICT ("Users_Id") DO UPDATE
+            SET "Score_Total"     = excluded."Score_Total",
+                "Nb_Observations" = excluded."Nb_Observations",
+                "Maj"             = excluded."Maj"
+            WHERE "Score_Utilisateur"."Score_Total" IS NOT excluded."Score_Total"
+               OR "Score_Utilisateur"."Nb_Observations" IS NOT excluded."Nb_Observations"
+    """)
+    return conn.total_changes - before
+
+
+@sqlite_rpc("verifier_scores_par_type")
+def _verifier_scores_par_type(conn):
+    rows = conn.execute("""
+        SELECT c."Users_Id", c."Type_Operation", c."Score_Total" AS "Score_Compteur", a."Score_Total" AS "Score_Attendu"
+        FROM "Score_Type_Utilisateur" c
+        LEFT JOIN "Score_Type_Utilisateur_Attendu" a
+               ON a."Users_Id" = c."Users_Id" AND a."Type_Operation" = c."Type_Operation"
+        WHERE c."Score_Total" IS NOT a."Score_Total" OR c."Nb_Observations" IS NOT a."Nb_Observations"
+        UNION ALL
+        SELECT a."Users_Id", a."Type_Operation", NULL, a."Score_Total"
+        FROM "Score_Type_Utilisateur_Attendu" a
+        WHERE NOT EXISTS (
+            SELECT 1 FROM "Score_Type_Utilisateur" c
+            WHERE c."Users_Id" = a."Users_Id" AND c."Type_Operation" = a."Type_Operation"
+        )
+    """).fetchall()
+    return [dict(r) for r in rows]
+
+
+@sqlite_rpc("reconcilier_scores_par_type")
+def _reconcilier_scores_par_type(conn) -> int:
+    before = conn.total_changes
+    conn.execute("""
+        INSERT INTO "Score_Type_Utilisateur" ("Users_Id", "Type_Operation", "Score_Total", "Nb_Observations", "Maj")
+        SELECT "Users_Id", "Type_Operation", "Score_Total", "Nb_Observations", datetime('now')
+        FROM "Score_Type_Utilisateur_Attendu" WHERE true
+        ON CONFLICT ("Users_Id", "Type_Operation") DO UPDATE
+            SET "Score_Total"     = excluded."Score_Total",
+                "Nb_Observations" = excluded."Nb_Observations",
+                "Maj"             = excluded."Maj"
+            WHERE "Score_Type_Utilisateur"."Score_Total" IS NOT excluded."Score_Total"
+               OR "Score_Type_Utilisateur"."Nb_Observations" IS NOT excluded."Nb_Observations"
+    """)
+    conn.execute("""
+        DELETE FROM "Score_Type_Utilisateur"
+        WHERE NOT EXISTS (
+            SELECT 1 FROM "Score_Type_Utilisateur_Attendu" a
+            WHERE a."Users_Id" = "Score_Type_Utilisateur"."Users_Id"
+              AND a."Type_Operation" = "Score_Type_Utilisateur"."Type_Operation"
+        )
+    """)
+    return conn.total_changes - before
+
+
+@sqlite_rpc("reconstruire_cumuls_quotidiens")
+def _reconstruire_cumuls_quotidiens(conn) -> int:
+    conn.execute('DELETE FROM "Cumul_Quotidien"')
+    return conn.execute("""
+        INSERT INTO "Cumul_Quotidien" ("Users_Id", "Type_Operation", "Parcours_Id", "Jour", "Nb_Observations",
+                                       "Nb_Bonnes", "Score_Total", "Temps_Total", "Marge_Total")
+        SELECT "Users_Id", "Type_Operation", "Parcours_Id", "Jour", "Nb_Observations",
+               "Nb_Bonnes", "Score_Total", "Temps_Total", "Marge_Total"
+        FROM "Cumul_Quotidien_Attendu" WHERE true
+    """).rowcount
+
+
+ACTIVITE_COLONNES = ["Debut", "Jours", "Dernier_Jour", "Serie_Courante", "Serie_Max"]
+
+
+def _ecrire_activite(conn, user_id, ligne):
+    colonnes = ", ".join(_quote(c) for c in ACTIVITE_COLONNES)
+    placeholders = ", ".join("?" for _ in ACTIVITE_COLONNES)
+    maj = ", ".join(f"{_quote(c)} = excluded.{_quote(c)}" for c in ACTIVITE_COLONNES)
+    conn.execute(
+        f'INSERT INTO "Activite_Utilisateur" ("Users_Id", {colonnes}) VALUES (?, {placeholders}) '
+        f'ON CONFLICT ("Users_Id") DO UPDATE SET {maj}, "Maj" = datetime(\'now\')',
+        [user_id] + [json.dumps(ligne[c]) if c == "Jours" else ligne[c] for c in ACTIVITE_COLONNES],
+    )
+
+
+def _activite_ajouter(debut, jours, dernier_jour, serie_courante, serie_max, jour):
+    """
+    Fonction SQL activite_ajouter du trigger trg_activite_utilisateur : ligne (JSON) après une
+    observation le `jour`. SQLite n'a que des triggers par ligne : là où sql/005 regroupe l'INSERT
+    par (utilisateur, jour), chaque observation ajoute 1 au jour ; le trigger ne l'appelle que pour
+    la première du jour (les suivantes incrémentent "Jours" en SQL).
+    """
+    ligne = None if debut is None else {"Debut": debut, "Jours": jours, "Dernier_Jour": dernier_jour,
+                                        "Serie_Courante": serie_courante, "Serie_Max": serie_max}
+    return json.dumps(activite.ajouter(ligne, jour, 1))
+
+
+@sqlite_rpc("reconstruire_activite_utilisateurs")
+def _reconstruire_activite_utilisateurs(conn) -> int:
+    par_utilisateur = {}
+    for user_id, jour, nb in conn.execute("""
+        SELECT e."Users_Id", e."Date", count(*)
+        FROM "Observations" o
+        JOIN "Entrainement" e ON e."id" = o."Entrainement_Id"
+        WHERE e."Date" IS NOT NULL
+        GROUP BY e."Users_Id", e."Date"
+    """):
+        par_utilisateur.setdefault(user_id, {})[jour] = nb
+    conn.execute('DELETE FROM "Activite_Utilisateur"')
+    for user_id, par_jour in par_utilisateur.items():
+        _ecrire_activite(conn, user_id, activite.reconstruire(par_jour))
+    return len(par_utilisateur)
+
+
+FENETRE_COLONNES = ["Critere", "Depuis_Observation_Id", "Nb", "Nb_Bonnes", "Serie_Bonnes", "Etats"]
+
+
+def _maj_fenetre_reussite(conn, user_id, parcours_id, critere, depuis, etats):
+    """Équivalent de maj_fenetre_reussite (sql/007) : retourne la fenêtre après ajout des états."""
+    ligne = conn.execute(
+        'SELECT * FROM "Fenetre_Reussite" WHERE "Users_Id" = ? AND "Parcours_Id" = ?', [user_id, parcours_id]
+    ).fetchone()
+    stockee = {**dict(ligne), "Etats": json.loads(ligne["Etats"])} if ligne else None
+    fenetre = fenetre_courante(stockee, critere, depuis)
+    for etat in etats:
+        fenetre_ajouter(fenetre, etat)
+    colonnes = ", ".join(_quote(c) for c in FENETRE_COLONNES)
+    placeholders = ", ".join("?" for _ in range(2 + len(FENETRE_COLONNES)))
+    maj = ", ".join(f"{_quote(c)} = excluded.{_quote(c)}" for c in FENETRE_COLONNES)
+    conn.execute(
+        f'INSERT INTO "Fenetre_Reussite" ("Users_Id", "Parcours_Id", {colonnes}) VALUES ({placeholders}) '
+        f'ON CONFLICT ("Users_Id", "Parcours_Id") DO UPDATE SET {maj}, "Maj" = datetime(\'now\')',
+        [user_id, parcours_id] + [json.dumps(fenetre[c]) if c == "Etats" else fenetre[c] for c in FENETRE_COLONNES],
+    )
+    return fenetre
+
+
+@sqlite_rpc("reconstruire_fenetres_reussite")
+def _reconstruire_fenetres_reussite(conn) -> int:
+    conn.execute('DELETE FROM "Fenetre_Reussite"')
+    positions = conn.execute(
+        'SELECT pa."Users_Id", pa."Parcours_Id", p."Critere", coalesce(pa."Derniere_Observation_Id", 0) AS depuis '
+        'FROM "Position_Actuelle" pa JOIN "Parcours" p ON p."id" = pa."Parcours_Id"'
+    ).fetchall()
+    for pos in positions:
+        etats = [r[0] for r in conn.execute(
+            'SELECT o."Etat" FROM "Observations" o JOIN "Entrainement" e ON e."id" = o."Entrainement_Id" '
+            'WHERE e."Users_Id" = ? AND o."Parcours_Id" = ? AND o."id" > ? ORDER BY o."id"',
+            [pos["Users_Id"], pos["Parcours_Id"], pos["depuis"]],
+        )]
+        _maj_fenetre_reussite(conn, pos["Users_Id"], pos["Parcours_Id"], pos["Critere"] or 0, pos["depuis"], etats)
+    return len(positions)
+
+
+OBSERVATION_COLONNES = ["Operateur_Un", "Operateur_Deux", "Operation", "Etat", "Correction",
+                       "Score", "Temps_Seconds", "Marge_Erreur"]
+
+
+@sqlite_rpc("enregistrer_entrainement")
+def _enregistrer_entrainement(conn, p_user_id, p_cle, p_date, p_heure, p_observations, p_saut_max=1):
+    """Équivalent de sql/004_enregistrer_entrainement.sql (la transaction est ouverte par SQLiteClient._call)."""
+    deja = conn.execute('SELECT "Resultat" FROM "Enregistrement_Session" WHERE "Cle" = ?', [p_cle]).fetchone()
+    if deja:
+        return json.loads(deja[0])
+
+    types, avertissements = {}, []
+    for type_op, rows in p_observations.items():
+        if not rows:
+            continue
+        pos = conn.execute(
+            'SELECT "Parcours_Id", "Derniere_Observation_Id" FROM "Position_Actuelle" '
+            'WHERE "Users_Id" = ? AND "Type_Operation" = ?',
+            [p_user_id, type_op],
+        ).fetchone()
+        if not pos:
+            avertissements.append(f"Aucun Parcours_Id trouvé pour {type_op}, entraînement non créé pour ce type.")
+            continue
+        parcours_id = pos["Parcours_Id"]
+
+        entrainement_id = conn.execute(
+            'INSERT INTO "Entrainement" ("Users_Id", "Date", "Time", "Volume", "Parcours_Id") '
+            'VALUES (?, ?, ?, ?, ?) RETURNING "id"',
+            [p_user_id, p_date, p_heure, len(rows), parcours_id],
+        ).fetchone()[0]
+
+        colonnes = ", ".join(_quote(c) for c in ["Entrainement_Id", "Parcours_Id"] + OBSERVATION_COLONNES)
+        placeholders = ", ".join("?" for _ in range(2 + len(OBSERVATION_COLONNES)))
+        observation_ids = []
+        for row in rows:
+            valeurs = [entrainement_id, parcours_id] + [row.get(c) for c in OBSERVATION_COLONNES]
+            if valeurs[2 + OBSERVATION_COLONNES.index("Correction")] is None:
+                valeurs[2 + OBSERVATION_COLONNES.index("Correction")] = "NON"
+            observation_ids.append(conn.execute(
+                f'INSERT INTO "Observations" ({colonnes}) VALUES ({placeholders}) RETURNING "id"', valeurs
+            ).fetchone()[0])
+
+        # Progression : fenêtre glissante des `Critere` derniers états depuis la dernière décision
+        critere = conn.execute('SELECT "Critere" FROM "Parcours" WHERE "id" = ?', [parcours_id]).fetchone()[0]
+        fenetre = _maj_fenetre_reussite(conn, p_user_id, parcours_id, critere, pos["Derniere_Observation_Id"],
+                                        [row.get("Etat") for row in rows])
+        taux = fenetre_taux(fenetre)
+        evolution, cible = None, parcours_id
+        if taux is not None:
+            evolution = decider_evolution(taux)
+            chaine = chaine_niveaux(dict(r) for r in conn.execute(
+                'SELECT "id", "Type_Operation", "Niveau" FROM "Parcours" WHERE "Type_Operation" = ?', [type_op]))
+            cible = parcours_cible(evolution, parcours_id, chaine.get(type_op),
+                                   niveaux_franchis(fenetre, p_saut_max or 1))
+            conn.execute(
+                'INSERT INTO "Suivi_Parcours" ("Users_Id", "Parcours_Id", "Date", "Taux_Reussite", '
+                '"Type_Evolution", "Derniere_Observation_Id") VALUES (?, ?, ?, ?, ?, ?)',
+                [p_user_id, cible, p_date, taux, evolution, observation_ids[-1]],
+            )
+
+        types[type_op] = {
+            "entrainement_id": entrainement_id,
+            "observation_ids": observation_ids,
+            "parcours_id": parcours_id,
+            "evolution": evolution,
+            "taux": taux,
+            "nouveau_parcours_id": cible,
+        }
+
+    resultat = {"cle": p_cle, "types": types, "avertissements": avertissements}
+    conn.execute(
+        'INSERT INTO "Enregistrement_Session" ("Cle", "Users_Id", "Resultat") VALUES (?, ?, ?)',
+        [p_cle, p_user_id, json.dumps(resultat, ensure_ascii=False)],
+    )
+    return resultat
+
+
+# --------------------- FABRIQUE ---------------------
+
+def create_storage(backend: str = "supabase", **options):
+    """
+    Retourne un client de stockage :
+    - backend="supabase" : options url, key -> client Supabase officiel
+    - backend="sqlite"   : option path (obligatoire) -> SQLiteClient migré en place
+    """
+    if backend == "sqlite":
+        if not options.get("path"):
+            raise ValueError("Backend sqlite : chemin de la base requis (la migration la réécrit)")
+        return SQLiteClient(options["path"])
+    if backend == "supabase":
+        from supabase import create_client
+        return create_client(options["url"], options["key"])
+    raise ValueError(f"Backend de stockage inconnu : {backend}")
+
+
+def copier_base(source: str, cible: str):
+    """Copie cohérente d'une base SQLite (API de sauvegarde : WAL compris), sans modifier la source."""
+    if os.path.exists(cible):
+        raise FileExistsError(f"{cible} existe déjà")
+    src = sqlite3.connect(f"file:{source}?mode=ro", uri=True)
+    dst = sqlite3.connect(cible)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+
+
+# --------------------- LIGNE DE COMMANDE ---------------------
+
+SECRETS_TOML = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".streamlit", "secrets.toml")
+USAGE = """Usage :
+  python storage.py migrate <fichier.db> [<copie.db>]
+  python storage.py scores verifier|reconcilier [<fichier.db>]"""
+
+
+def storage_configure():
+    """Client du backend de l'app (.streamlit/secrets.toml : STORAGE_BACKEND, SQLITE_PATH ou SUPABASE_URL/KEY)."""
+    import tomllib
+    with open(SECRETS_TOML, "rb") as f:
+        secrets = tomllib.load(f)
+    if secrets.get("STORAGE_BACKEND", "supabase") == "sqlite":
+        return ouvrir_base_migree(secrets["SQLITE_PATH"])
+    return create_storage("supabase", url=secrets["SUPABASE_URL"], key=secrets["SUPABASE_KEY"])
+
+
+def ouvrir_base_migree(path: str) -> SQLiteClient:
+    """
+    SQLiteClient sur une base déjà au dernier schéma, sans la migrer (seule la commande `migrate`
+    migre). La version est lue en lecture seule : une base en retard n'est pas touchée.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{path} : base introuvable")
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+    derniere = SQLITE_MIGRATIONS[-1][0]
+    if version < derniere:
+        raise ValueError(f"{path} : schéma en version {version}, {derniere} attendue "
+                         f"(migrer une copie : python storage.py migrate {path} <copie.db>)")
+    return SQLiteClient(path, migrate=False)
+
+
+def verifier_scores(client) -> list:
+    """Lignes de Score_Type_Utilisateur qui divergent des Observations (vide si tout est cohérent)."""
+    return client.rpc("verifier_scores_par_type", {}).execute().data or []
+
+
+def reconcilier_scores(client) -> dict:
+    """Reconstruit les deux compteurs de score ; retourne le nombre de lignes corrigées par table."""
+    return {
+        "Score_Utilisateur": client.rpc("reconcilier_scores_utilisateurs", {}).execute().data or 0,
+        "Score_Type_Utilisateur": client.rpc("reconcilier_scores_par_type", {}).execute().data or 0,
+    }
+
+
+def main(argv) -> int:
+    if len(argv) in (2, 3) and argv[0] == "migrate":
+        chemin = argv[1]
+        if len(argv) == 3:
+            copier_base(chemin, argv[2])
+            chemin = argv[2]
+        client = SQLiteClient(chemin)
+        print(f"{chemin} : schéma en version {client._conn.execute('PRAGMA user_version').fetchone()[0]}")
+        client.close()
+        return 0
+
+    if len(argv) in (2, 3) and argv[0] == "scores" and argv[1] in ("verifier", "reconcilier"):
+        try:
+            client = ouvrir_base_migree(argv[2]) if len(argv) == 3 else storage_configure()
+        except (FileNotFoundError, ValueError) as e:
+            print(e, file=sys.stderr)
+            return 1
+        if argv[1] == "verifier":
+            ecarts = verifier_scores(client)
+            for e in ecarts:
+                print(f"utilisateur {e['Users_Id']}, {e['Type_Operation']} : compteur {e['Score_Compteur']}, "
+                      f"attendu {e['Score_Attendu']}")
+            print(f"{len(ecarts)} écart(s)")
+            return 1 if ecarts else 0
+        for table, nb in reconcilier_scores(client).items():
+            print(f"{table} : {nb} ligne(s) corrigée(s)")
+        return 0
+
+    print(USAGE)
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,222 @@
+"""
+Traces par rerun : arbre de spans (page, requêtes, HTTP, rendus) avec nombre d'allers-retours et durées.
+
+- span(name, kind, **attrs) : mesure un bloc ; imbriqué dans le span courant (contextvars).
+- traced(kind) : décorateur équivalent pour une fonction.
+- trace_root(name, kind) / traced_job : racine d'une trace (un rerun, un job en arrière-plan) ; à sa fermeture
+  la trace est écrite en une ligne JSON dans le fichier de traces (cf. configure_trace_file).
+- Les appels HTTP des clients partagés (clients.py) sont des spans "http" / "openai".
+- TracedClient : enveloppe un client Supabase / SQLiteClient ; chaque .execute() devient un span
+  "query" (table, opérations), signalé dans les logs au-delà de SLOW_QUERY_MS.
+
+Sans appel Streamlit : le panneau développeur est dans calcul_pixel.py.
+"""
+
+import contextvars
+import functools
+import json
+import logging
+import logging.handlers
+import os
+import threading
+import time
+
+logger = logging.getLogger("calcul_pixel.tracing")
+trace_logger = logging.getLogger("calcul_pixel.traces")
+trace_logger.propagate = False
+
+SLOW_QUERY_MS = 300.0      # au-delà : warning "requête lente" (modifiable via set_slow_query_ms)
+ROUND_TRIP_KINDS = ("query", "rpc", "openai")
+
+_current = contextvars.ContextVar("calcul_pixel_span", default=None)
+_config_lock = threading.Lock()
+
+
+class Span:
+    __slots__ = ("name", "kind", "attrs", "start", "duration_ms", "children", "error")
+
+    def __init__(self, name, kind, attrs):
+        self.name = name
+        self.kind = kind
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.duration_ms = None
+        self.children = []
+        self.error = None
+
+    def finish(self):
+        self.duration_ms = round((time.perf_counter() - self.start) * 1000, 2)
+
+    def round_trips(self) -> int:
+        own = 1 if self.kind in ROUND_TRIP_KINDS else 0
+        return own + sum(child.round_trips() for child in self.children)
+
+    def to_dict(self) -> dict:
+        data = {"name": self.name, "kind": self.kind, "ms": self.duration_ms}
+        if self.attrs:
+            data["attrs"] = self.attrs
+        if self.error:
+            data["error"] = self.error
+        if self.children:
+            data["children"] = [child.to_dict() for child in list(self.children)]
+        return data
+
+    def flatten(self, depth=0):
+        """(profondeur, span) en parcours préfixe, pour l'affichage."""
+        yield depth, self
+        for child in list(self.children):
+            yield from child.flatten(depth + 1)
+
+
+def set_slow_query_ms(threshold_ms: float):
+    global SLOW_QUERY_MS
+    SLOW_QUERY_MS = float(threshold_ms)
+
+
+def configure_trace_file(path: str, max_bytes: int = 10_000_000, backups: int = 3):
+    """Écrit les traces terminées (une ligne JSON par trace) dans `path`, avec rotation. Idempotent."""
+    with _config_lock:
+        for handler in trace_logger.handlers:
+            if getattr(handler, "baseFilename", None) == os.path.abspath(path):
+                return
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        trace_logger.addHandler(handler)
+        trace_logger.setLevel(logging.INFO)
+
+
+def current_span():
+    return _current.get()
+
+
+class span:
+    """Context manager : span enfant du span courant (hors trace : mesuré mais non enregistré)."""
+
+    def __init__(self, name, kind="block", **attrs):
+        self.span = Span(name, kind, attrs)
+        self._token = None
+        self._parent = None
+
+    def __enter__(self):
+        self._parent = _current.get()
+        if self._parent is not None:
+            self._parent.children.append(self.span)
+        self._token = _current.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        self.span.finish()
+        if isinstance(exc, Exception):
+            self.span.error = f"{exc_type.__name__}: {exc}"
+        elif exc is not None:
+            self.span.attrs["interrupted"] = exc_type.__name__   # st.rerun() / st.stop()
+        _current.reset(self._token)
+        if self.span.kind in ROUND_TRIP_KINDS and self.span.duration_ms >= SLOW_QUERY_MS:
+            logger.warning("Requête lente (%.0f ms) : %s %s", self.span.duration_ms, self.span.name, self.span.attrs)
+        return False
+
+
+class trace_root(span):
+    """Racine d'une trace : écrite dans le fichier de traces à la fermeture."""
+
+    def __init__(self, name, kind="rerun", **attrs):
+        super().__init__(name, kind, **attrs)
+
+    def __enter__(self):
+        self._token = _current.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        super().__exit__(exc_type, exc, tb)
+        if trace_logger.handlers:
+            record = {"ts": time.time(), "round_trips": self.span.round_trips(), **self.span.to_dict()}
+            trace_logger.info(json.dumps(record, ensure_ascii=False, default=str))
+        return False
+
+
+def traced(kind="function", name=None):
+    """Décorateur : exécute la fonction dans un span."""
+    def decorator(function):
+        span_name = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(span_name, kind):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def traced_job(name=None):
+    """Décorateur pour une tâche en arrière-plan : chaque exécution est une trace à part entière."""
+    def decorator(function):
+        span_name = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with trace_root(span_name, "job"):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def run_in_context(function):
+    """Fonction à passer à un pool de threads : les spans créés dedans restent dans la trace courante."""
+    context = contextvars.copy_context()
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        return context.copy().run(function, *args, **kwargs)
+    return wrapper
+
+
+# --------------------- CLIENT INSTRUMENTÉ ---------------------
+
+class _TracedBuilder:
+    """Proxy d'un query builder : enregistre les opérations chaînées, trace execute()."""
+
+    __slots__ = ("_builder", "_kind", "_name", "_ops")
+
+    def __init__(self, builder, kind, name, ops):
+        self._builder = builder
+        self._kind = kind
+        self._name = name
+        self._ops = ops
+
+    def __getattr__(self, attr):
+        target = getattr(self._builder, attr)
+        if not callable(target):
+            return target
+
+        def call(*args, **kwargs):
+            result = target(*args, **kwargs)
+            if hasattr(result, "execute"):
+                return _TracedBuilder(result, self._kind, self._name, self._ops + (attr,))
+            return result
+        return call
+
+    def execute(self, *args, **kwargs):
+        with span(self._name, self._kind, ops=".".join(self._ops)) as s:
+            response = self._builder.execute(*args, **kwargs)
+            data = getattr(response, "data", None)
+            if isinstance(data, list):
+                s.attrs["rows"] = len(data)
+            return response
+
+
+class TracedClient:
+    """Enveloppe un client (Supabase ou SQLiteClient) : table(...)/rpc(...) tracés, le reste délégué."""
+
+    def __init__(self, client):
+        self._client = client
+
+    def table(self, name):
+        return _TracedBuilder(self._client.table(name), "query", name, ())
+
+    def rpc(self, name, params=None, *args, **kwargs):
+        return _TracedBuilder(self._client.rpc(name, params, *args, **kwargs), "rpc", name, ("rpc",))
+
+    def __getattr__(self, attr):
+        return getattr(self._client, attr)